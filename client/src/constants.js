@@ -4,5 +4,7 @@ export const PORT= "8000";
 export const BATT_VOLTS= "12";
 export const BATT_AH= "250";
 export const KASA_IP= "10.0.0.188";
+export const USB_HUB_VID= "0403";
+export const USB_HUB_PID= "6001";
 export const SYNOLOGY_IP= "10.0.0.10";
 export const SYNOLOGY_MAC= "00:11:32:f9:12:55";
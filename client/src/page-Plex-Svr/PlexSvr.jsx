@@ -87,8 +87,26 @@ const PlexSvr = () => {
     console.log(`Turning ${action} entertainment system outlets: 2 (TV), 3 (Soundbar), 4 (Synology)`);
     
     const outlets = [2, 3, 4];
-    const results = await Promise.all(
-      outlets.map(async (outlet) => {
+    
+    // Read the server's cached strip state and skip outlets that are already in the wanted state
+    let pending = outlets;
+    try {
+      const statusResponse = await fetch(`${getServerUrl()}/api/debug/kasa/status`);
+      if (statusResponse.ok) {
+        const status = await statusResponse.json();
+        pending = outlets.filter((outlet) => {
+          const state = status.outlets && status.outlets[outlet];
+          return !state || state.mock || state.enabled !== (action === 'on');
+        });
+      }
+    } catch (error) {
+      console.error(`Error reading Kasa status: ${error.message}`);
+    }
+    
+    const results = outlets.filter((outlet) => !pending.includes(outlet))
+      .map((outlet) => ({ outlet, success: true }));
+    results.push(...await Promise.all(
+      pending.map(async (outlet) => {
         try {
           const response = await fetch(`${getServerUrl()}/api/debug/kasa/${outlet}`, {
             method: 'POST',
@@ -111,7 +129,7 @@ const PlexSvr = () => {
         }
         return { outlet, success: false };
       })
-    );
+    ));
     
     const successCount = results.filter(r => r.success).length;
     console.log(`Entertainment system power ${action}: ${successCount}/${outlets.length} outlets succeeded`);
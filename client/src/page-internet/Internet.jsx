@@ -16,9 +16,11 @@
  * === HOW IT WORKS ===
  * 1. User selects a connection type via radio buttons
  * 2. System automatically executes a 3-step process:
- *    a) Power Control: Activates the correct USB port and Kasa outlets
- *    b) Initialization Wait: Waits for hardware to initialize (varies by type)
- *    c) Connectivity Test: Pings 8.8.8.8 to verify internet connectivity
+ *    a) Power Control: Activates the correct USB port and Kasa outlets (a server-side
+ *       switch job; its steps are followed over server-sent events)
+ *    b) Initialization Wait + Connectivity Test: one /api/internet/test call; the server polls
+ *       the link (readiness stages and connectivity probes) and answers once it is verified,
+ *       or after at most the per-type wait time
  * 
  * === USB HUB CONTROL ===
  * - Uses a CoolGear USB hub with ASCII command interface
@@ -52,7 +54,7 @@
 import React, { useState, useEffect, useCallback } from 'react';
 import { Form, Button, Message, Card, Header, Icon, Segment, Radio, TextArea, Checkbox } from 'semantic-ui-react';
 import './Internet.css';
-import { fetchFromServer } from '../utils/api';
+import { fetchFromServer, fetchBatch, followInternetJob } from '../utils/api';
 
 const Internet = () => {
   const [selectedOption, setSelectedOption] = useState('none');
@@ -93,24 +95,6 @@ const Internet = () => {
     return () => clearInterval(interval);
   }, [countdown]);
 
-  // Fetch current internet connection status on component mount
-  useEffect(() => {
-    const fetchCurrentStatus = async () => {
-      try {
-        const response = await fetchFromServer('/api/internet/status');
-        if (response.current_connection) {
-          setSelectedOption(response.current_connection);
-          console.log('Loaded current internet connection:', response.current_connection);
-        }
-      } catch (error) {
-        console.error('Failed to fetch current internet status:', error);
-        // Keep default 'none' if fetch fails
-      }
-    };
-
-    fetchCurrentStatus();
-  }, []); // Empty dependency array means this runs once on mount
-
   const handleOptionChange = (e, { value }) => {
     // Always allow changing the selection - this will interrupt any ongoing operations
     setSelectedOption(value);
@@ -162,11 +146,18 @@ const Internet = () => {
 
         if (newAbortController.signal.aborted) return;
 
-        if (response.success) {
+        if (!response.success) {
+          throw new Error(response.message || 'Failed to power off ports');
+        }
+
+        const job = await followInternetJob(response.job_id, null, newAbortController.signal);
+        if (newAbortController.signal.aborted || !job) return;
+
+        if (job.result && job.result.success) {
           setConnectionStatus('info');
           setStatusMessage('🔌 All internet connections powered off');
         } else {
-          throw new Error(response.message || 'Failed to power off ports');
+          throw new Error((job.result && job.result.message) || 'Failed to power off ports');
         }
 
       } catch (error) {
@@ -207,33 +198,36 @@ const Internet = () => {
         throw new Error(powerResponse.message || 'Failed to power on port');
       }
 
-      // Step 2: Wait for the specified time with countdown (but check for abort)
-      setStatusMessage(`Waiting for ${option.text} to initialize...`);
-      setCountdown(option.waitTime);
-      
-      // Use a more granular wait that can be interrupted
-      for (let i = option.waitTime; i > 0; i--) {
-        if (newAbortController.signal.aborted) return;
-        await new Promise(resolve => setTimeout(resolve, 1000));
-        if (newAbortController.signal.aborted) return;
-        setCountdown(i - 1);
+      // The server runs the switch as a job; show its current step until it finishes
+      const powerJob = await followInternetJob(powerResponse.job_id, (job) => {
+        const step = job.steps[job.steps.length - 1];
+        if (step && !job.done) {
+          setStatusMessage(`${option.text}: ${step.message}...`);
+        }
+      }, newAbortController.signal);
+
+      if (newAbortController.signal.aborted || !powerJob) return;
+
+      if (!powerJob.result || !powerJob.result.success) {
+        throw new Error((powerJob.result && powerJob.result.message) || 'Failed to power on port');
       }
 
-      if (newAbortController.signal.aborted) return;
+      // Steps 2 + 3: One test call; the server polls the link and answers as soon as connectivity
+      // is verified, or after at most waitTime seconds (the countdown shows what is left)
+      setStatusMessage(`Waiting for ${option.text} to come online...`);
+      setCountdown(option.waitTime);
 
-      // Step 3: Test internet connectivity
-      setStatusMessage(`Testing internet connectivity...`);
-      setCountdown(0);
-      
       const testResponse = await fetchFromServer('/api/internet/test', {
         method: 'POST',
         body: JSON.stringify({
-          connection_type: selectedValue
+          connection_type: selectedValue,
+          max_wait: option.waitTime
         }),
         signal: newAbortController.signal
       });
 
       if (newAbortController.signal.aborted) return;
+      setCountdown(0);
 
       if (testResponse.success && testResponse.connected) {
         setConnectionStatus('success');
@@ -321,29 +315,43 @@ const Internet = () => {
     }
   };
 
-  // Function to fetch power readings from Kasa power strip
-  const fetchKasaPower = useCallback(async () => {
+  // Fetch current internet connection status and Kasa power readings
+  // in a single batched request
+  const fetchPageState = useCallback(async () => {
     try {
-      // Fetch power from port 1 (cellular amp)
-      const port1Response = await fetchFromServer('/api/kasa/power/1');
-      if (port1Response.success) {
-        setKasaPort1Power(port1Response.power);
+      const results = await fetchBatch([
+        { id: 'status', op: 'internet_status' },
+        { id: 'port1', op: 'kasa_power', params: { outlet_id: 1 } },  // cellular amp
+        { id: 'port6', op: 'kasa_power', params: { outlet_id: 6 } }   // starlink
+      ]);
+
+      const statusResponse = results.status;
+      if (statusResponse && statusResponse.success && statusResponse.data.current_connection) {
+        setSelectedOption(statusResponse.data.current_connection);
+        console.log('Loaded current internet connection:', statusResponse.data.current_connection);
+      } else {
+        // Keep default 'none' if status is unavailable
+        console.error('Failed to fetch current internet status:', statusResponse && statusResponse.error);
+      }
+
+      const port1Response = results.port1;
+      if (port1Response && port1Response.success && port1Response.data.success) {
+        setKasaPort1Power(port1Response.data.power);
       }
 
-      // Fetch power from port 6 (starlink)
-      const port6Response = await fetchFromServer('/api/kasa/power/6');
-      if (port6Response.success) {
-        setKasaPort6Power(port6Response.power);
+      const port6Response = results.port6;
+      if (port6Response && port6Response.success && port6Response.data.success) {
+        setKasaPort6Power(port6Response.data.power);
       }
     } catch (error) {
-      console.error('Failed to fetch Kasa power readings:', error);
+      console.error('Failed to fetch internet page state:', error);
     }
   }, []);
 
-  // Fetch power readings only on component mount (page load/refresh)
+  // Fetch status and power readings only on component mount (page load/refresh)
   useEffect(() => {
-    fetchKasaPower();
-  }, [fetchKasaPower]);
+    fetchPageState();
+  }, [fetchPageState]);
 
   // Function to get power consumption text for each option
   const getPowerText = useCallback((option) => {
@@ -375,7 +383,8 @@ const Internet = () => {
         const testResponse = await fetchFromServer('/api/internet/test', {
           method: 'POST',
           body: JSON.stringify({
-            connection_type: selectedOption
+            connection_type: selectedOption,
+            max_wait: 0  // test the link as it is now
           })
         });
 
@@ -63,13 +63,16 @@ def test_internet_endpoint(connection_type, usb_port, expected_kasa_action):
     
     try:
         response = requests.post(
-            f"{BASE_URL}/api/internet/power",
+            f"{BASE_URL}/api/internet/power?wait=true",  # wait for the switch job to finish
             json=payload,
             timeout=USB_TIMEOUT  # Using USB_TIMEOUT constant for USB hub operations
         )
         
         if response.status_code == 200:
             result = response.json()
+            if not result.get('success', False):
+                print(f"Switch failed: {result.get('message', 'No message')}")
+                return {"status": "failed", "error": result.get('message', 'Switch failed')}
             print(f"Request successful: {result.get('message', 'No message')}")
             
             # Wait longer for USB hub operations to complete
@@ -237,7 +240,7 @@ def main():
         print(f"Calling API: POST {BASE_URL}/api/internet/power with {payload}")
         
         response = requests.post(
-            f"{BASE_URL}/api/internet/power",
+            f"{BASE_URL}/api/internet/power?wait=true",  # wait for the switch job to finish
             json=payload,
             timeout=USB_TIMEOUT  # Using USB_TIMEOUT constant for restoration
         )
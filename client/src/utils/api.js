@@ -43,3 +43,85 @@ export const fetchFromServer = async (endpoint, options = {}) => {
   
   return response.json();
 };
+
+/**
+ * Run several read operations in a single request via /api/batch
+ * @param {Array<{op: string, id?: string, params?: object}>} operations - Batch operations
+ * @param {object} options - Fetch options
+ * @returns {object} Results keyed by operation id (or op name when no id is given)
+ */
+export const fetchBatch = async (operations, options = {}) => {
+  const response = await fetchFromServer('/api/batch', {
+    method: 'POST',
+    body: JSON.stringify({ operations }),
+    ...options
+  });
+
+  const results = {};
+  (response.results || []).forEach((result) => {
+    results[result.id || result.op] = result;
+  });
+  return results;
+};
+
+/**
+ * Follow an internet switch job until it finishes
+ * Uses the job's server-sent event stream; falls back to polling
+ * GET /api/internet/jobs/{id} every second if the stream fails.
+ * @param {string} jobId - Job id returned by POST /api/internet/power
+ * @param {function} onUpdate - Called with every job snapshot (state, steps, result)
+ * @param {AbortSignal} signal - Stops following; the promise then resolves with null
+ * @returns {object|null} The finished job
+ */
+export const followInternetJob = (jobId, onUpdate = () => {}, signal = null) => new Promise((resolve, reject) => {
+  let source = null;
+  let pollTimer = null;
+
+  const cleanup = () => {
+    if (source) source.close();
+    if (pollTimer) clearTimeout(pollTimer);
+    if (signal) signal.removeEventListener('abort', onAbort);
+  };
+  const finish = (job) => {
+    cleanup();
+    resolve(job);
+  };
+  const onAbort = () => finish(null);
+  const handle = (job) => {
+    if (onUpdate) onUpdate(job);
+    if (job.done) finish(job);
+  };
+
+  const poll = async () => {
+    try {
+      const response = await fetchFromServer(`/api/internet/jobs/${jobId}`, { signal });
+      if (!response.success) throw new Error(response.message);
+      handle(response.job);
+      if (!response.job.done) pollTimer = setTimeout(poll, 1000);
+    } catch (error) {
+      if (signal && signal.aborted) return;
+      cleanup();
+      reject(error);
+    }
+  };
+
+  if (signal) {
+    if (signal.aborted) {
+      resolve(null);
+      return;
+    }
+    signal.addEventListener('abort', onAbort);
+  }
+  if (typeof EventSource === 'undefined') {
+    poll();
+    return;
+  }
+  source = new EventSource(`${getServerUrl()}/api/internet/jobs/${jobId}/events`);
+  source.addEventListener('job', (event) => handle(JSON.parse(event.data)));
+  source.onerror = () => {
+    // Stream dropped (or buffered away by a proxy) before the job finished
+    source.close();
+    source = null;
+    poll();
+  };
+});
@@ -0,0 +1,12 @@
+# Shared constants loaded from constants.json (generated from client/src/constants.js)
+# Kept free of heavy imports so server.py can read its settings at startup
+# without pulling in rvglue/MQTT.
+
+import json
+
+try:
+    fp = open("./constants.json", "rt")
+    constants = json.load(fp)
+except:
+    print(" ")
+    exit("constants.json file not found or mal formed")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Connectivity test latency: probes one after another (the old ping -> curl -> socket order,
+each with the full timeout) vs all probes racing in one window (connectivity_probe.race_probes).
+
+Local scenarios, no internet needed:
+  live         - every probe answers (local HTTP server, ICMP to 127.0.0.1)
+  first dead   - the first target is a sinkhole (listener with a full backlog drops SYNs), the
+                 second one answers
+  dead         - every probe goes unanswered (sinkholes; no ICMP, some sandboxes answer any echo)
+--real adds the server's default probes against the real targets.
+
+Run from the server directory:
+    cd server; ../venv/bin/python benchmarks/bench_connectivity.py [--timeout 1.0] [--real]
+"""
+
+import argparse
+import http.server
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from connectivity_probe import race_probes
+
+
+class QuietHandler(http.server.BaseHTTPRequestHandler):
+    def do_HEAD(self):
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def sinkhole():
+    """Port whose SYNs go unanswered: a listener with backlog 0 whose queue is already full."""
+    sink = socket.socket()
+    sink.bind(("127.0.0.1", 0))
+    sink.listen(0)
+    port = sink.getsockname()[1]
+    fillers = []
+    for _ in range(4):
+        filler = socket.socket()
+        filler.setblocking(False)
+        filler.connect_ex(("127.0.0.1", port))
+        fillers.append(filler)
+    time.sleep(0.1)
+    return port, [sink] + fillers
+
+
+def sequential(probes, timeout):
+    """The old structure: one probe at a time, each given the full timeout."""
+    start = time.perf_counter()
+    for spec in probes:
+        if race_probes([spec], timeout).connected:
+            return True, time.perf_counter() - start
+    return False, time.perf_counter() - start
+
+
+def raced(probes, timeout):
+    result = race_probes(probes, timeout)
+    return result.connected, result.elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sequential vs racing connectivity probes")
+    parser.add_argument("--timeout", type=float, default=1.0, help="Per-probe / race timeout in seconds (default: 1.0)")
+    parser.add_argument("--real", action="store_true", help="Also race the default probes against the real targets")
+    args = parser.parse_args()
+
+    server = http.server.HTTPServer(("127.0.0.1", 0), QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    live_port = server.server_address[1]
+    dead_port, keep = sinkhole()
+
+    scenarios = {
+        "live": [("icmp", "127.0.0.1"), ("http", "127.0.0.1", live_port), ("tcp", "127.0.0.1", live_port)],
+        "first dead": [("http", "127.0.0.1", dead_port), ("tcp", "127.0.0.1", dead_port),
+                       ("tcp", "127.0.0.1", live_port)],
+        "dead": [("http", "127.0.0.1", dead_port), ("tcp", "127.0.0.1", dead_port)],
+    }
+    print(f"timeout {args.timeout:g} s per probe (sequential) / per race\n")
+    print(f"{'scenario':<12} {'sequential':>20} {'race':>20}")
+    for name, probes in scenarios.items():
+        seq_ok, seq_time = sequential(probes, args.timeout)
+        race_ok, race_time = raced(probes, args.timeout)
+        print(f"{name:<12} {seq_time * 1000:11.1f} ms {'up' if seq_ok else 'down':>5}   "
+              f"{race_time * 1000:11.1f} ms {'up' if race_ok else 'down':>5}")
+    if args.real:
+        result = race_probes(timeout=args.timeout)
+        print(f"\nreal targets: {'up' if result.connected else 'down'} ({result.describe()})")
+
+    server.shutdown()
+    for sock in keep:
+        sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Before/after benchmark for the /data/* response path.
+
+Drives two FastAPI apps in-process through the ASGI interface (no sockets, so
+only framework cost is measured):
+
+  before - handler builds a pydantic DataResponse with 21 fields; FastAPI
+           validates it against response_model and re-serializes it
+  after  - handler returns cached pre-serialized bytes through a raw
+           response class; the body is only rebuilt when the snapshot changes
+
+Run from the server directory:
+    cd server; ../venv/bin/python benchmarks/bench_data_response.py
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+from pydantic import BaseModel
+from starlette.responses import Response
+
+from telemetry import serialize_page, SerializedPageCache
+
+# Representative POWER page snapshot
+FIELDS = {
+    "var1": "1450 Watts", "var2": "> > >  ", "var3": "121 Volts AC", "var4": "820 Watts",
+    "var5": "312 Watts", "var6": "> > >  ", "var7": "13.4 Volts DC", "var8": "96 Watts",
+    "var9": "0 Watts", "var10": "> > >  ", "var11": "610 Watts", "var12": "540 Watts",
+    "var13": "", "var14": "", "var15": "Est hours to 100%:   3.2", "var16": "Status: Bulk Charging",
+    "var17": "", "var18": "  < < <", "var19": "402 Watts", "var20": "2026-10-19 09:41:07 AM",
+    "battery_percent": 78.5,
+}
+
+
+class DataResponse(BaseModel):
+    var1: str
+    var2: str
+    var3: str
+    var4: str
+    var5: str
+    var6: str
+    var7: str
+    var8: str
+    var9: str
+    var10: str
+    var11: str
+    var12: str
+    var13: str
+    var14: str
+    var15: str
+    var16: str
+    var17: str
+    var18: str
+    var19: str
+    var20: str
+    battery_percent: float
+
+
+class PreSerializedJSONResponse(Response):
+    media_type = "application/json"
+
+
+class FixedSnapshotSource:
+    """Snapshot source whose version only changes every `period` reads."""
+
+    def __init__(self, period):
+        self.period = period
+        self.reads = 0
+
+    def read(self):
+        self.reads += 1
+        return self.reads // self.period, {"power": FIELDS}
+
+
+def build_before_app():
+    app = FastAPI()
+
+    @app.get("/data/power")
+    def data_power() -> DataResponse:
+        return DataResponse(**FIELDS)
+
+    return app
+
+
+def build_after_app(period):
+    app = FastAPI()
+    cache = SerializedPageCache()
+    source = FixedSnapshotSource(period)
+
+    @app.get("/data/power", response_model=DataResponse, response_class=PreSerializedJSONResponse)
+    def data_power():
+        return PreSerializedJSONResponse(cache.get("power", source))
+
+    return app
+
+
+async def call_asgi(app, path):
+    """Send one GET request through the ASGI app and return the response body."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1),
+        "server": ("127.0.0.1", 8000),
+    }
+    body = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return b"".join(body)
+
+
+async def bench(app, iterations):
+    await call_asgi(app, "/data/power")  # Warm up routing and caches
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await call_asgi(app, "/data/power")
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /data/* response serialization")
+    parser.add_argument("--iterations", type=int, default=20000, help="Requests per case (default: 20000)")
+    parser.add_argument("--reads-per-snapshot", type=int, default=4,
+                        help="Requests served per snapshot version in the 'after' case (default: 4)")
+    args = parser.parse_args()
+
+    before_app = build_before_app()
+    after_app = build_after_app(args.reads_per_snapshot)
+
+    # Both paths must produce the same JSON body
+    loop = asyncio.new_event_loop()
+    before_body = loop.run_until_complete(call_asgi(before_app, "/data/power"))
+    after_body = loop.run_until_complete(call_asgi(after_app, "/data/power"))
+    assert before_body == after_body == serialize_page(FIELDS), "response bodies differ"
+
+    before = loop.run_until_complete(bench(before_app, args.iterations))
+    after = loop.run_until_complete(bench(after_app, args.iterations))
+    loop.close()
+
+    print(f"before (pydantic + re-serialize): {before * 1e6:8.1f} us/request")
+    print(f"after  (pre-serialized bytes):    {after * 1e6:8.1f} us/request")
+    print(f"speedup: {before / after:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Kasa HS300 client latency against the local fake strip (no hardware needed).
+
+Cases:
+  native persistent  - one KasaPowerStrip, reused socket (what the server does now)
+  native reconnect   - new TCP connection per command
+  kasa CLI           - one `kasa` subprocess per command (the old path; --cli, needs python-kasa)
+  poll cycle         - full-state poll of --strips fake strips, one after another vs KasaRegistry.poll_all
+
+Run from the server directory:
+    cd server; ../venv/bin/python benchmarks/bench_kasa_client.py [--latency 0.02] [--cli]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kasa_fake_hs300 import FakeHS300Server
+from kasa_power_strip import KasaPowerStrip
+from kasa_discovery import KasaDiscoveryCache
+from kasa_registry import KasaRegistry
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def time_calls(func, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def report(name, samples):
+    print(f"{name:<34} p50 {percentile(samples, 50) * 1000:8.2f} ms   "
+          f"p95 {percentile(samples, 95) * 1000:8.2f} ms   mean {statistics.mean(samples) * 1000:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Kasa client paths against the fake HS300")
+    parser.add_argument("--iterations", type=int, default=200, help="Calls per case (default: 200)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated device latency in seconds")
+    parser.add_argument("--cli", action="store_true", help="Also time the kasa CLI subprocess path")
+    parser.add_argument("--strips", type=int, default=3, help="Fake strips for the poll cycle case (default: 3)")
+    args = parser.parse_args()
+
+    server = FakeHS300Server(port=0, latency=args.latency).start()
+    host, port = "127.0.0.1", server.port
+    print(f"Fake HS300 on {host}:{port}, latency {args.latency * 1000:.0f} ms, {args.iterations} iterations\n")
+
+    strip = KasaPowerStrip(host, port=port)
+    strip.connect(verbose=False)
+    report("native persistent: get_sysinfo", time_calls(strip.test_connectivity, args.iterations))
+    report("native persistent: emeter realtime", time_calls(lambda: strip.get_power_consumption(3), args.iterations))
+    report("native persistent: set relay", time_calls(lambda: strip._set_relay_state(4, True), args.iterations))
+    report("native persistent: status + power",
+           time_calls(strip.get_all_outlet_status_with_power, max(1, args.iterations // 6)))
+
+    # Internet switching: two sequential turn_on/off calls vs one diffed set_outlets
+    targets = [{0: True, 5: False}, {0: False, 5: True}, {0: False, 5: False}]
+    counter = iter(range(10 ** 9))
+
+    def switch_individual():
+        wanted = targets[next(counter) % len(targets)]
+        for outlet_id, on in wanted.items():
+            (strip.turn_on_outlet if on else strip.turn_off_outlet)(outlet_id)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        individual = time_calls(switch_individual, args.iterations)
+        batched = []
+        for i in range(args.iterations):
+            cached = strip.get_strip_state()  # the server diffs against the poller's cached snapshot
+            start = time.perf_counter()
+            strip.set_outlets(targets[i % len(targets)], current=cached)
+            batched.append(time.perf_counter() - start)
+    report("internet switch: 2x turn_on/off", individual)
+    report("internet switch: set_outlets", batched)
+
+    # Poll cycle over several strips: sequential polls vs the registry's concurrent poll_all
+    servers = [FakeHS300Server(port=0, latency=args.latency).start() for _ in range(args.strips)]
+    cache_dir = tempfile.TemporaryDirectory()
+    cache = KasaDiscoveryCache(os.path.join(cache_dir.name, "kasa_devices.json"), target=host, port=1, timeout=0.1)
+    registry = KasaRegistry({f"strip{i}": {"ip": host, "port": fake.port} for i, fake in enumerate(servers)},
+                            cache=cache)
+    with contextlib.redirect_stdout(io.StringIO()):
+        registry.connect_all()
+        cycles = max(1, args.iterations // 20)
+        sequential = time_calls(lambda: [d.poller.snapshot(max_age=0) for d in registry.devices.values()], cycles)
+        concurrent = time_calls(lambda: registry.poll_all(max_age=0), cycles)
+    report(f"poll cycle, {args.strips} strips: sequential", sequential)
+    report(f"poll cycle, {args.strips} strips: poll_all", concurrent)
+    for fake in servers:
+        fake.stop()
+    cache_dir.cleanup()
+
+    def reconnect_sysinfo():
+        strip.close()
+        strip.test_connectivity()
+    report("native reconnect: get_sysinfo", time_calls(reconnect_sysinfo, args.iterations))
+
+    if args.cli:
+        kasa_cmd = shutil.which("kasa")
+        if not kasa_cmd:
+            print("kasa CLI not found - install python-kasa to compare the subprocess path")
+        else:
+            cmd = [kasa_cmd, "--host", host, "--port", str(port), "--json", "state"]
+            run = lambda: subprocess.run(cmd, capture_output=True, timeout=30)
+            report("kasa CLI subprocess: state", time_calls(run, max(1, args.iterations // 20)))
+
+    strip.close()
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Kasa strip state parsing: old `kasa state` text scraping vs the structured KasaStripState.
+
+Uses recorded HS300 responses (benchmarks/kasa_hs300_responses.json). Cases:
+  text scrape     - the old parser; every outlet lookup re-scans the whole CLI output
+  structured      - json.loads of the sysinfo + 6 emeter responses, one KasaStripState parse
+                    (the JSON decode dominates; the protocol client has to do it anyway)
+  lookups         - reading all 6 outlets and the total from an already parsed snapshot
+
+Parsing is not faster: the structured parse costs about the same as the text scrape
+(39.8 vs 38.5 us in the recorded run, 7-11 us of it KasaStripState itself). The gain is
+only in the reads that follow: about 1.3 us for all 6 outlets and the total from a
+KasaStripState, against about 4.3 us from the list of outlet dicts.
+
+Run from the server directory:
+    cd server; ../venv/bin/python benchmarks/bench_kasa_parse.py [--iterations 20000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kasa_state import KasaStripState
+
+RECORDED = os.path.join(os.path.dirname(os.path.abspath(__file__)), "kasa_hs300_responses.json")
+
+
+def scrape_outlet_power(output, outlet_id):
+    """The removed KasaPowerStrip.get_power_consumption text parser (per-outlet branch)."""
+    current_outlet_index = -1
+    in_child_section = False
+    for line in output.split('\n'):
+        if line.strip().startswith('== ') and '(Socket for HS300' in line:
+            current_outlet_index += 1
+            in_child_section = (current_outlet_index == outlet_id)
+            continue
+        if in_child_section and 'Current consumption (current_consumption):' in line:
+            power_str = line.split(':')[-1].strip()
+            return float(power_str.split()[0])
+    return None
+
+
+def scrape_total_power(output):
+    """The removed KasaPowerStrip.get_power_consumption text parser (device total branch)."""
+    for line in output.split('\n'):
+        if 'Current consumption (current_consumption):' in line and not line.startswith('        '):
+            return float(line.split(':')[-1].strip().split()[0])
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Kasa strip state parsing")
+    parser.add_argument("--iterations", type=int, default=20000, help="Iterations per case (default: 20000)")
+    args = parser.parse_args()
+
+    with open(RECORDED) as f:
+        recorded = json.load(f)
+    text = recorded["kasa_state_text"]
+    sysinfo_raw = json.dumps(recorded["sysinfo"]).encode()
+    realtime_raw = [json.dumps(r).encode() for r in recorded["realtime"]]
+    v1_realtime = [r["emeter"]["get_realtime"] for r in recorded["hs300_v1_realtime"]]
+
+    def text_scrape():
+        return [scrape_outlet_power(text, i) for i in range(6)], scrape_total_power(text)
+
+    def structured():
+        sysinfo = json.loads(sysinfo_raw)["system"]["get_sysinfo"]
+        realtimes = [json.loads(r)["emeter"]["get_realtime"] for r in realtime_raw]
+        state = KasaStripState.from_responses(sysinfo, realtimes)
+        return [state.power_w(i) for i in range(6)], state.total_power_w
+
+    # Same answers from both parsers (and from hw v1 readings in watts)
+    old_powers, old_total = text_scrape()
+    new_powers, new_total = structured()
+    state = KasaStripState.from_responses(recorded["sysinfo"]["system"]["get_sysinfo"], v1_realtime)
+    assert [round(p, 1) for p in new_powers] == old_powers, (new_powers, old_powers)
+    assert round(new_total, 1) == old_total and state.total_power_w == new_total
+
+    decoded_sysinfo = recorded["sysinfo"]["system"]["get_sysinfo"]
+    decoded_realtimes = [r["emeter"]["get_realtime"] for r in recorded["realtime"]]
+
+    def from_decoded():
+        return KasaStripState.from_responses(decoded_sysinfo, decoded_realtimes)
+
+    outlet_dicts = state.outlets()
+
+    def dict_lookups():
+        return ([next(o['power_w'] for o in outlet_dicts if o['outlet_id'] == i) for i in range(6)],
+                sum(o['power_w'] for o in outlet_dicts))
+
+    def state_lookups():
+        return [state.power_w(i) for i in range(6)], state.total_power_w
+
+    cases = [
+        ("text scrape (6 outlets + total)", text_scrape),
+        ("structured parse (6 outlets + total)", structured),
+        ("  of which KasaStripState.from_responses", from_decoded),
+        ("lookups: list of outlet dicts", dict_lookups),
+        ("lookups: KasaStripState", state_lookups),
+    ]
+    print(f"{args.iterations} iterations per case\n")
+    for name, func in cases:
+        seconds = min(timeit.repeat(func, number=args.iterations, repeat=3))
+        print(f"{name:<40} {seconds / args.iterations * 1e6:8.2f} us/op")
+
+
+if __name__ == "__main__":
+    main()
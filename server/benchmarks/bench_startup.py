@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Server startup benchmark.
+
+1. Runs `python -X importtime -c "import server"` and reports the total import
+   time plus the slowest top-level imports (what the server pays before it
+   can even create the FastAPI app).
+2. Starts server.py and measures wall time until the HTTP port accepts
+   connections, and until /api/ready reports every discovery step finished.
+
+Run from the server directory:
+    cd server; ../venv/bin/python benchmarks/bench_startup.py
+"""
+
+import argparse
+import json
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure_import_time(top):
+    """Return (total_seconds, [(cumulative_seconds, module)]) for `import server`."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import server"],
+                            cwd=SERVER_DIR, capture_output=True, text=True, timeout=120)
+    top_level = []
+    total_us = 0
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, module = match.groups()
+        if len(indent) == 1:  # Top-level import (one space after the '|')
+            top_level.append((int(cumulative) / 1e6, module))
+            total_us += int(cumulative)
+    top_level.sort(reverse=True)
+    return total_us / 1e6, top_level[:top]
+
+
+def measure_time_to_ready(port, timeout):
+    """Start server.py; return (seconds to port bound, seconds to /api/ready)."""
+    start = time.monotonic()
+    server = subprocess.Popen([sys.executable, "server.py"], cwd=SERVER_DIR,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                              start_new_session=True)
+    bound = ready = None
+    try:
+        deadline = start + timeout
+        while time.monotonic() < deadline and bound is None:
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                    bound = time.monotonic() - start
+            except OSError:
+                time.sleep(0.02)
+
+        while time.monotonic() < deadline and bound is not None and ready is None:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/ready", timeout=2) as response:
+                    if json.load(response).get("ready"):
+                        ready = time.monotonic() - start
+            except OSError:
+                pass
+            time.sleep(0.1)
+    finally:
+        os.killpg(server.pid, signal.SIGINT)
+        try:
+            server.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            os.killpg(server.pid, signal.SIGKILL)
+            server.wait()
+    return bound, ready
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark server import time and time-to-ready")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest imports to show (default: 15)")
+    parser.add_argument("--runs", type=int, default=3, help="Server start runs (default: 3)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-run timeout in seconds (default: 120)")
+    parser.add_argument("--imports-only", action="store_true", help="Skip the server start measurement")
+    args = parser.parse_args()
+
+    total, slowest = measure_import_time(args.top)
+    print(f"import server: {total * 1000:.1f} ms total (-X importtime)")
+    for seconds, module in slowest:
+        print(f"  {seconds * 1000:8.1f} ms  {module}")
+
+    if args.imports_only:
+        return
+
+    with open(os.path.join(SERVER_DIR, "constants.json")) as fp:
+        port = int(json.load(fp)["PORT"])
+
+    print(f"\n{'run':>4} | {'port bound':>10} | {'all discovered':>14}")
+    for run in range(1, args.runs + 1):
+        bound, ready = measure_time_to_ready(port, args.timeout)
+        fmt = lambda value: f"{value:9.2f}s" if value is not None else "   timeout"
+        print(f"{run:>4} | {fmt(bound):>10} | {fmt(ready):>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+USB hub command latency against the pty hub simulator (no hardware needed).
+
+Cases:
+  per-request open   - new CoolGearUSBHub (open + handshake + ?Q/GP init) per request, the old path
+  status             - status query (GP) sent to the hub through the UsbHubSession worker
+  status (cached)    - get_current_active_port() answered from the session's port state cache
+  set_single_port_on - re-select the already active port (no power-sequencing cooldown)
+  all_off            - all ports off
+  concurrent status  - --clients threads forcing a status query at once; queued queries are merged
+  internet switch    - end to end hub part of /api/internet/power: set_single_port_on() to another
+                       port (includes the driver's 2 s cooldown) until a fresh status query confirms it
+  full_hub_reset     - only with --reset (one run, ~14 s of built-in sleeps)
+Latency, dropped reply bytes and NUL glitches are simulator options; failed
+commands (False / no valid status / wrong port) are counted per case.
+The wire time printed for reference is request + reply at --baud (10 bits per byte).
+
+Run from the server directory:
+    cd server; ../venv/bin/python benchmarks/bench_usb_hub.py [--baud 9600] [--latency 0.0]
+        [--drop-rate 0.01] [--glitch-rate 0.05] [--switches 5] [--reset]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from usbhub_fake_coolgear import FakeCoolGearHub
+from usb_hub_session import UsbHubSession, UsbHubClient, OpenHub, open_coolgear_hub
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def time_calls(func, iterations):
+    """Per-call durations and the number of calls that returned a falsy result."""
+    samples = []
+    failures = 0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        ok = func()
+        samples.append(time.perf_counter() - start)
+        if not ok:
+            failures += 1
+    return samples, failures
+
+
+def report(name, result):
+    samples, failures = result
+    print(f"{name:<34} p50 {percentile(samples, 50) * 1000:8.2f} ms   "
+          f"p95 {percentile(samples, 95) * 1000:8.2f} ms   mean {statistics.mean(samples) * 1000:8.2f} ms   "
+          f"failed {failures}/{len(samples)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark USB hub session paths against the pty simulator")
+    parser.add_argument("--iterations", type=int, default=50, help="Requests per case (default: 50)")
+    parser.add_argument("--baud", type=int, default=9600, help="Simulated line speed (default: 9600)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated hub processing time in seconds")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Probability that a reply byte is lost")
+    parser.add_argument("--glitch-rate", type=float, default=0.0, help="Probability of a NUL frame before a reply")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for the line faults (default: 1)")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent callers for the merge case (default: 8)")
+    parser.add_argument("--switches", type=int, default=5,
+                        help="Internet switches to time, ~2 s each (default: 5, 0 to skip)")
+    parser.add_argument("--reset", action="store_true", help="Also time one full_hub_reset")
+    args = parser.parse_args()
+
+    fake = FakeCoolGearHub(latency=args.latency, baud=args.baud, drop_rate=args.drop_rate,
+                           glitch_rate=args.glitch_rate, seed=args.seed).start()
+    print(f"Fake CoolGear hub on {fake.port}, {args.baud} baud, latency {args.latency * 1000:.0f} ms, "
+          f"drop rate {args.drop_rate}, glitch rate {args.glitch_rate}, {args.iterations} iterations\n")
+
+    def per_request_open():
+        hub = open_coolgear_hub(fake.port)
+        active = hub.get_current_active_port()
+        hub.close()  # the old path leaked the port instead
+        return active >= 0
+
+    session = UsbHubSession(ports=[fake.port])
+    client = UsbHubClient(session)
+
+    def concurrent_status():
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(client.get_current_active_port(max_age=0)))
+                   for _ in range(args.clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return all(active >= 0 for active in results)
+
+    def internet_switch(port):
+        if not client.set_single_port_on(port):
+            return False
+        return client.get_current_active_port(max_age=0) == port
+
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        results["per-request open: status"] = time_calls(per_request_open, args.iterations)
+        session.execute(OpenHub())  # the server opens the hub once at startup
+        client.set_single_port_on(1)
+        results["status"] = time_calls(lambda: client.get_current_active_port(max_age=0) >= 0, args.iterations)
+        results["status (cached)"] = time_calls(lambda: client.get_current_active_port() >= 0, args.iterations)
+        results["set_single_port_on (same port)"] = time_calls(lambda: client.set_single_port_on(1), args.iterations)
+        results["all_off"] = time_calls(client.all_off, args.iterations)
+        before = fake.commands
+        results[f"{args.clients} concurrent status queries"] = time_calls(concurrent_status, args.iterations)
+        concurrent_commands = fake.commands - before
+        if args.switches:
+            client.set_single_port_on(1)
+            targets = iter([2, 1] * args.switches)
+            results["internet switch (end to end)"] = time_calls(lambda: internet_switch(next(targets)),
+                                                                 args.switches)
+        if args.reset:
+            results["full_hub_reset"] = time_calls(client.full_hub_reset, 1)
+    for name, result in results.items():
+        report(name, result)
+    if args.baud:
+        wire_ms = lambda nbytes: nbytes * 10000.0 / args.baud
+        print(f"\nwire time at {args.baud} baud: status {wire_ms(3 + 10):.1f} ms, set port {wire_ms(19 + 10):.1f} ms")
+    print(f"concurrent case: {args.clients * args.iterations} queries, {concurrent_commands} sent to the hub "
+          f"({session.merged} merged); session opens: {session.opens}, reopens: {session.reopens}")
+    if args.drop_rate or args.glitch_rate:
+        print(f"line faults: {fake.dropped_bytes} reply bytes dropped, {fake.glitches} NUL frames injected")
+
+    session.close()
+    fake.stop()
+
+
+if __name__ == "__main__":
+    main()
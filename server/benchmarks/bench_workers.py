@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Request throughput vs. uvicorn worker count.
+
+Starts server.py with SERVER_WORKERS=1, 2, 4 (one shared-memory telemetry
+ingester in multi-worker mode), hammers /data/home and /data/power from
+several client processes with keep-alive connections, and reports
+requests/second for each worker count.
+
+Run from the server directory on the target machine (e.g. the 4-core Pi):
+    cd server; ../venv/bin/python benchmarks/bench_workers.py --workers 1 2 4
+
+No results are recorded yet: it needs the generated constants.json, rvglue
+for the page calcs and more than one core, so the scaling with worker count
+is unmeasured.
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENDPOINTS = ["/data/home", "/data/power"]
+
+
+def wait_for_port(host, port, timeout=60.0):
+    """Wait until the server accepts connections."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def client_worker(host, port, duration, result_queue):
+    """Issue requests over one keep-alive connection until the deadline."""
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    count = 0
+    errors = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        try:
+            conn.request("GET", ENDPOINTS[count % len(ENDPOINTS)])
+            response = conn.getresponse()
+            response.read()
+            if response.status == 200:
+                count += 1
+            else:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=10)
+    conn.close()
+    result_queue.put((count, errors))
+
+
+def run_load(host, port, clients, duration):
+    result_queue = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=client_worker, args=(host, port, duration, result_queue))
+             for _ in range(clients)]
+    start = time.monotonic()
+    for p in procs:
+        p.start()
+    results = [result_queue.get() for _ in procs]
+    for p in procs:
+        p.join()
+    elapsed = time.monotonic() - start
+    total = sum(r[0] for r in results)
+    errors = sum(r[1] for r in results)
+    return total / elapsed, errors
+
+
+def bench_worker_count(workers, port, clients, duration, warmup):
+    env = os.environ.copy()
+    env["SERVER_WORKERS"] = str(workers)
+    server = subprocess.Popen([sys.executable, "server.py"], cwd=SERVER_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                              start_new_session=True)
+    try:
+        if not wait_for_port("127.0.0.1", port):
+            raise RuntimeError(f"Server with {workers} workers did not start")
+        run_load("127.0.0.1", port, clients, warmup)
+        return run_load("127.0.0.1", port, clients, duration)
+    finally:
+        os.killpg(server.pid, signal.SIGINT)
+        try:
+            server.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            os.killpg(server.pid, signal.SIGKILL)
+            server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark request throughput vs. worker count")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4],
+                        help="Worker counts to test (default: 1 2 4)")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent client processes (default: 8)")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per measurement (default: 15)")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Warmup seconds (default: 3)")
+    args = parser.parse_args()
+
+    with open(os.path.join(SERVER_DIR, "constants.json")) as fp:
+        port = int(json.load(fp)["PORT"])
+
+    print(f"{'workers':>8} | {'req/s':>9} | {'speedup':>7} | errors")
+    print("-" * 42)
+    baseline = None
+    for workers in args.workers:
+        rate, errors = bench_worker_count(workers, port, args.clients, args.duration, args.warmup)
+        baseline = baseline or rate
+        print(f"{workers:>8} | {rate:>9.1f} | {rate / baseline:>6.2f}x | {errors}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Circuit breaker for flaky network devices (used for the Kasa power strip).
+
+    closed     calls go through; failure_threshold consecutive failures open it
+    open       calls fail fast; after a backoff delay one background probe runs
+    half_open  the probe is running; calls still fail fast
+
+A successful probe closes the breaker. A failed probe re-opens it with the
+delay doubled (up to max_delay) and randomized by +/- jitter, so several
+processes talking to the same device don't retry in lockstep. Callers never
+wait on the probe: while the device is down, allow() returns False immediately.
+"""
+
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised by CircuitBreaker.call() while the breaker is open."""
+    pass
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker with exponential backoff and one background probe.
+
+    probe() should attempt to (re)establish the connection and raise on failure.
+    on_transition(name, old_state, new_state) is called after every state change.
+    """
+
+    def __init__(self, name: str, probe: Callable, failure_threshold: int = 2,
+                 base_delay: float = 2.0, max_delay: float = 60.0, jitter: float = 0.2,
+                 on_transition: Optional[Callable] = None):
+        self.name = name
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.on_transition = on_transition
+        self.state = CLOSED
+        self.failures = 0            # consecutive failures while closed
+        self.open_count = 0          # consecutive openings; drives the backoff
+        self.retry_at = 0.0          # monotonic time of the next probe while open
+        self.last_error = None
+        self.transitions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _transition(self, new_state: str):
+        # Called with self._lock held
+        old_state, self.state = self.state, new_state
+        key = f"{old_state}->{new_state}"
+        self.transitions[key] = self.transitions.get(key, 0) + 1
+        print(f"INFO: {self.name} circuit {old_state} -> {new_state}")
+        if self.on_transition:
+            self.on_transition(self.name, old_state, new_state)
+
+    def _open(self):
+        # Called with self._lock held
+        self.open_count += 1
+        delay = min(self.max_delay, self.base_delay * 2 ** (self.open_count - 1))
+        delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        self.retry_at = time.monotonic() + delay
+        self._transition(OPEN)
+
+    def allow(self) -> bool:
+        """True if a call may go to the device now; starts the background probe when due."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() >= self.retry_at:
+                self._transition(HALF_OPEN)
+                threading.Thread(target=self._run_probe, name=f"{self.name}-probe", daemon=True).start()
+            return False
+
+    def _run_probe(self):
+        try:
+            self.probe()
+        except Exception as e:
+            with self._lock:
+                self.last_error = str(e)
+                self._open()
+            return
+        with self._lock:
+            self.failures = 0
+            self.open_count = 0
+            self._transition(CLOSED)
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+
+    def record_failure(self, error=None):
+        """Count a failed call; opens the breaker at failure_threshold consecutive failures."""
+        with self._lock:
+            if error is not None:
+                self.last_error = str(error)
+            if self.state != CLOSED:
+                return
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self._open()
+
+    def trip(self, error=None):
+        """Open immediately (e.g. the initial connect failed)."""
+        with self._lock:
+            if error is not None:
+                self.last_error = str(error)
+            if self.state == CLOSED:
+                self._open()
+
+    def reset(self):
+        """Force the breaker closed (e.g. from a debug endpoint)."""
+        with self._lock:
+            self.failures = 0
+            self.open_count = 0
+            if self.state != CLOSED:
+                self._transition(CLOSED)
+
+    def call(self, func: Callable, *args, **kwargs):
+        """Run func through the breaker, raising CircuitOpenError while it is open."""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} unavailable (circuit {self.state})")
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        self.record_success()
+        return result
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "retry_in_seconds": round(max(0.0, self.retry_at - time.monotonic()), 1) if self.state == OPEN else None,
+                "last_error": self.last_error,
+                "transitions": dict(self.transitions)
+            }
@@ -0,0 +1,209 @@
+# Racing internet connectivity probes
+# test_internet_connectivity used to run ping, then curl, then a socket connect, one after the
+# other (5 s timeout plus 2 s slack each, so about 20 s to report a dead link). Here ICMP echo,
+# TCP:53, TCP:443 and an HTTP request to several targets all start at once on non-blocking
+# sockets in one selector loop. The first success wins and the other sockets are closed.
+# Failure is declared after a single timeout window. Nothing is forked: ICMP uses an
+# unprivileged ping socket (net.ipv4.ping_group_range) or a raw socket (root / CAP_NET_RAW),
+# and is skipped if neither is allowed.
+
+import errno
+import os
+import selectors
+import socket
+import struct
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_TARGETS = ("8.8.8.8", "1.1.1.1")
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+
+ProbeSpec = Tuple  # ("icmp", host) | ("tcp", host, port) | ("http", host, port)
+
+
+def default_probes(targets: Sequence[str] = DEFAULT_TARGETS) -> List[ProbeSpec]:
+    """ICMP, TCP:53, TCP:443 and HTTP for every target, interleaved so each method gets a head start."""
+    probes = []
+    for make in (lambda host: ("tcp", host, 53), lambda host: ("tcp", host, 443),
+                 lambda host: ("icmp", host), lambda host: ("http", host, 80)):
+        probes.extend(make(host) for host in targets)
+    return probes
+
+
+def _checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+class ProbeResult:
+    """Winner of a race (connected) or why every probe failed."""
+
+    __slots__ = ("connected", "probe", "elapsed", "errors")
+
+    def __init__(self):
+        self.connected = False
+        self.probe = None        # name of the winning probe, e.g. "tcp:53 1.1.1.1"
+        self.elapsed = 0.0
+        self.errors: Dict[str, str] = {}
+
+    def as_dict(self) -> Dict:
+        return {"connected": self.connected, "probe": self.probe,
+                "elapsed_ms": round(self.elapsed * 1000, 1), "errors": self.errors}
+
+    def describe(self) -> str:
+        if self.connected:
+            return f"{self.probe}, {self.elapsed * 1000:.0f} ms"
+        return "; ".join(f"{name}: {error}" for name, error in self.errors.items()) or "no probes"
+
+
+class _Probe:
+    """One probe's socket and state; handle() returns True (success), False (failed) or None (pending)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.sock = None
+        self.error = None
+        self.done = False
+
+    def fail(self, error: str) -> bool:
+        self.error = error
+        self.done = True
+        return False
+
+    def close(self, selector):
+        if self.sock is not None:
+            try:
+                selector.unregister(self.sock)
+            except (KeyError, ValueError):
+                pass
+            self.sock.close()
+            self.sock = None
+
+
+class _TcpProbe(_Probe):
+    """TCP connect; with a payload (HTTP), also send it and expect an 'HTTP/' reply."""
+
+    def __init__(self, host: str, port: int, payload: Optional[bytes] = None):
+        super().__init__(f"{'http' if payload else 'tcp'}:{port} {host}")
+        self.address = (host, port)
+        self.payload = payload
+
+    def start(self, selector):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setblocking(False)
+        err = self.sock.connect_ex(self.address)
+        if err not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+            return self.fail(os.strerror(err))
+        selector.register(self.sock, selectors.EVENT_WRITE, self)
+        return None
+
+    def handle(self, selector, events):
+        if events & selectors.EVENT_WRITE:
+            err = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if err:
+                return self.fail(os.strerror(err))
+            if self.payload is None:
+                return True
+            self.sock.send(self.payload)
+            selector.modify(self.sock, selectors.EVENT_READ, self)
+            return None
+        data = self.sock.recv(64)
+        if data.startswith(b"HTTP/"):
+            return True  # any HTTP status means the request got through
+        return self.fail("connection closed" if not data else "not an HTTP reply")
+
+
+class _IcmpProbe(_Probe):
+    """ICMP echo over a ping socket, or a raw socket where ping sockets aren't allowed."""
+
+    def __init__(self, host: str, ident: int):
+        super().__init__(f"icmp {host}")
+        self.host = host
+        self.ident = ident & 0xFFFF
+        self.raw = False
+
+    def start(self, selector):
+        try:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+        except OSError:
+            try:
+                self.sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+                self.raw = True
+            except OSError:
+                return self.fail("ICMP sockets not permitted")
+        self.sock.setblocking(False)
+        header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, self.ident, 1)
+        payload = b"rvsecurity-probe"
+        packet = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, _checksum(header + payload), self.ident, 1) + payload
+        self.sock.sendto(packet, (self.host, 0))
+        selector.register(self.sock, selectors.EVENT_READ, self)
+        return None
+
+    def handle(self, selector, events):
+        data, address = self.sock.recvfrom(1024)
+        if self.raw:
+            # A raw socket sees every ICMP packet: skip the IP header and match source and id
+            if address[0] != self.host:
+                return None
+            data = data[(data[0] & 0x0F) * 4:]
+        if len(data) < 8:
+            return None
+        icmp_type, _, _, ident, _ = struct.unpack("!BBHHH", data[:8])
+        if icmp_type != ICMP_ECHO_REPLY or (self.raw and ident != self.ident):
+            return None  # the ping socket's id is assigned by the kernel, which also filters replies
+        return True
+
+
+def _make_probe(spec: ProbeSpec, ident: int) -> _Probe:
+    kind, host = spec[0], spec[1]
+    if kind == "icmp":
+        return _IcmpProbe(host, ident)
+    if kind == "http":
+        return _TcpProbe(host, spec[2], f"HEAD / HTTP/1.0\r\nHost: {host}\r\n\r\n".encode("ascii"))
+    return _TcpProbe(host, spec[2])
+
+
+def race_probes(probes: Optional[Sequence[ProbeSpec]] = None, timeout: float = 5.0) -> ProbeResult:
+    """Start all probes at once; returns at the first success or after timeout seconds."""
+    specs = default_probes() if probes is None else probes
+    selector = selectors.DefaultSelector()
+    running = [_make_probe(spec, os.getpid() + index) for index, spec in enumerate(specs)]
+    result = ProbeResult()
+    start = time.monotonic()
+    deadline = start + timeout
+    try:
+        for probe in running:
+            try:
+                probe.start(selector)
+            except OSError as e:
+                probe.fail(str(e))
+        while any(not probe.done for probe in running):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for key, events in selector.select(remaining):
+                probe = key.data
+                if probe.done:
+                    continue
+                try:
+                    outcome = probe.handle(selector, events)
+                except OSError as e:
+                    outcome = probe.fail(str(e))
+                if outcome:
+                    result.connected = True
+                    result.probe = probe.name
+                    return result
+                if outcome is False:
+                    probe.close(selector)
+        result.errors = {probe.name: probe.error or f"no answer within {timeout:g} s" for probe in running}
+        return result
+    finally:
+        result.elapsed = time.monotonic() - start
+        for probe in running:
+            probe.close(selector)  # the losers of the race are cancelled here
+        selector.close()
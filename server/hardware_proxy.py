@@ -0,0 +1,148 @@
+# Forwarding of hardware endpoints from uvicorn workers to the hardware owner
+# In multi-worker mode (SERVER_WORKERS > 1) only the master process opens the USB hub, talks to
+# the Kasa strips, runs the internet switch jobs and drives the alarm; it serves the same app on
+# a loopback socket. Workers pass every request under HARDWARE_PATH_PREFIXES through to it, so
+# the single-owner hub queue, the port-state cache, "one switch at a time" and job ids hold no
+# matter which worker a request lands on. The request goes out as HTTP/1.0, so the owner
+# delimits its response by closing the connection and the body (SSE streams included) is
+# relayed chunk by chunk without re-framing.
+# /metrics is not relayed: a worker serves its own HTTP metrics and merges in the owner's
+# hardware, circuit breaker and link readiness families (metrics.merge_owner_metrics).
+
+import asyncio
+import json
+from typing import Dict, Optional, Sequence, Tuple
+
+HARDWARE_PATH_PREFIXES = (
+    "/api/kasa/", "/api/internet/", "/api/debug/usb/", "/api/debug/kasa/", "/api/debug/synology/",
+    "/api/alarm", "/api/ready",
+)
+HOP_BY_HOP_HEADERS = (b"connection", b"keep-alive", b"transfer-encoding", b"host", b"content-length")
+CHUNK_SIZE = 65536
+
+
+def parse_owner_address(address: str) -> Tuple[str, int]:
+    """'127.0.0.1:8765' -> ('127.0.0.1', 8765)."""
+    host, _, port = address.rpartition(":")
+    return host, int(port)
+
+
+def _unavailable(error: Exception) -> bytes:
+    return json.dumps({"success": False,
+                       "message": f"Hardware owner process not reachable: {error}"}).encode("utf-8")
+
+
+class HardwareProxyMiddleware:
+    """ASGI middleware relaying hardware paths to the owner at owner ("host:port").
+
+    With owner None (single process, or the owner itself) every request is
+    served locally.
+    """
+
+    def __init__(self, app, owner: Optional[str] = None, prefixes: Sequence[str] = HARDWARE_PATH_PREFIXES):
+        self.app = app
+        self.owner = parse_owner_address(owner) if owner else None
+        self.prefixes = tuple(prefixes)
+        self.forwarded = 0
+
+    async def __call__(self, scope, receive, send):
+        if self.owner is None or scope["type"] != "http" or not scope["path"].startswith(self.prefixes):
+            await self.app(scope, receive, send)
+            return
+        self.forwarded += 1
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+        await self.forward(scope, body, receive, send)
+
+    async def forward(self, scope, body: bytes, receive, send):
+        target = scope.get("raw_path") or scope["path"].encode("utf-8")
+        if scope.get("query_string"):
+            target += b"?" + scope["query_string"]
+        headers = [(name, value) for name, value in scope["headers"] if name not in HOP_BY_HOP_HEADERS]
+        try:
+            reader, writer = await asyncio.open_connection(*self.owner)
+        except OSError as e:
+            await self._send_error(send, e)
+            return
+        try:
+            head = [scope["method"].encode("ascii") + b" " + target + b" HTTP/1.0",
+                    b"host: " + f"{self.owner[0]}:{self.owner[1]}".encode("ascii"),
+                    b"content-length: " + str(len(body)).encode("ascii")]
+            head.extend(name + b": " + value for name, value in headers)
+            writer.write(b"\r\n".join(head) + b"\r\n\r\n" + body)
+            try:
+                status, response_headers = _parse_head(await reader.readuntil(b"\r\n\r\n"))
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError, OSError) as e:
+                await self._send_error(send, e)
+                return
+            await send({"type": "http.response.start", "status": status, "headers": response_headers})
+            # Streams (SSE) end when the browser goes away: stop reading from the owner then
+            watcher = asyncio.ensure_future(_close_on_disconnect(receive, writer))
+            try:
+                while True:
+                    chunk = await reader.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            except OSError:
+                pass  # owner or browser went away mid-stream; end the response
+            finally:
+                watcher.cancel()
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            writer.close()
+
+    async def _send_error(self, send, error: Exception):
+        print(f"WARNING: Forwarding to the hardware owner failed: {error}")
+        await send({"type": "http.response.start", "status": 503,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": _unavailable(error)})
+
+
+def _parse_head(head: bytes) -> Tuple[int, list]:
+    """Status code and relayable headers of a raw HTTP response head."""
+    lines = head.rstrip(b"\r\n").split(b"\r\n")
+    status = int(lines[0].split(b" ", 2)[1])
+    headers = []
+    for line in lines[1:]:
+        name, _, value = line.partition(b":")
+        name = name.strip().lower()
+        if name not in (b"connection", b"keep-alive", b"transfer-encoding"):
+            headers.append((name, value.strip()))
+    return status, headers
+
+
+async def _close_on_disconnect(receive, writer):
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            writer.close()
+            return
+
+
+async def fetch_owner(owner: str, path: str, timeout: float = 30.0) -> bytes:
+    """GET path from the hardware owner; returns the response body."""
+    host, port = parse_owner_address(owner)
+
+    async def fetch():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            writer.write(f"GET {path} HTTP/1.0\r\nhost: {host}:{port}\r\n\r\n".encode("ascii"))
+            response = await reader.read()
+        finally:
+            writer.close()
+        _, _, body = response.partition(b"\r\n\r\n")
+        return body
+
+    return await asyncio.wait_for(fetch(), timeout)
+
+
+async def fetch_owner_json(owner: str, path: str, timeout: float = 30.0) -> Dict:
+    """GET path from the hardware owner and decode its JSON body (used for /api/batch items)."""
+    return json.loads(await fetch_owner(owner, path, timeout))
@@ -0,0 +1,225 @@
+# Internet switch jobs
+# POST /api/internet/power queues a job and returns its id at once. One worker thread runs the
+# switch steps (Kasa outlets, hub switch, initialization delay, cellular modem setup), recording
+# each step, so no HTTP request or threadpool thread is held for the 20-60 s a switch can take.
+# Progress is read with GET /api/internet/jobs/{id} or streamed as server-sent events.
+# Only one switch runs at a time: a newer request replaces a queued one (marked "superseded")
+# and cuts the running job's remaining waits short. A hardware command already sent finishes.
+
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+SUPERSEDED = "superseded"
+FINISHED_STATES = (SUCCEEDED, FAILED, SUPERSEDED)
+DEFAULT_KEEP = 20  # finished jobs kept for GET /api/internet/jobs/{id}
+
+
+class SwitchJob:
+    """One internet switch request and its progress; changed only by InternetJobRunner (under its lock)."""
+
+    def __init__(self, request: Dict):
+        self.id = uuid.uuid4().hex[:12]
+        self.request = request
+        self.state = QUEUED
+        self.steps: List[Dict] = []
+        self.result: Optional[Dict] = None
+        self.superseded_by: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.version = 0  # bumped on every change, for streaming
+
+    @property
+    def done(self) -> bool:
+        return self.state in FINISHED_STATES
+
+    def as_dict(self) -> Dict:
+        end = self.finished_at or time.time()
+        return {
+            "id": self.id,
+            "state": self.state,
+            "done": self.done,
+            "request": self.request,
+            "step": self.steps[-1]["step"] if self.steps else None,
+            "steps": [dict(step) for step in self.steps],
+            "result": self.result,
+            "superseded_by": self.superseded_by,
+            "created_at": self.created_at,
+            "elapsed_seconds": round(end - (self.started_at or self.created_at), 1),
+            "version": self.version
+        }
+
+
+class InternetJobRunner:
+    """Single-worker queue of SwitchJobs with at most one job waiting.
+
+    run_steps(job) performs the switch on the worker thread, reporting steps
+    with step() and waiting with wait(); it returns the result dict
+    ({"success": ..., "message": ..., "port": ...}).
+    """
+
+    def __init__(self, run_steps: Callable[[SwitchJob], Dict], keep: int = DEFAULT_KEEP):
+        self.run_steps = run_steps
+        self.keep = keep
+        self.jobs: "OrderedDict[str, SwitchJob]" = OrderedDict()
+        self.current: Optional[SwitchJob] = None
+        self.pending: Optional[SwitchJob] = None
+        self.superseded = 0
+        self._cond = threading.Condition()
+        self._listeners = []  # (event loop, asyncio.Event) of streams waiting for a change
+        self._worker = None
+
+    def submit(self, request: Dict) -> SwitchJob:
+        """Queue a switch; supersedes the queued one and cuts the running one's waits short."""
+        job = SwitchJob(request)
+        with self._cond:
+            if self.pending is not None:
+                self.pending.superseded_by = job.id
+                self._finish(self.pending, SUPERSEDED, {"success": False, "message": f"Superseded by job {job.id}"})
+                self.superseded += 1
+            if self.current is not None and not self.current.done:
+                self.current.superseded_by = job.id
+                self._changed(self.current)
+            self.pending = job
+            self.jobs[job.id] = job
+            self._trim()
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="internet-jobs", daemon=True)
+                self._worker.start()
+            self._cond.notify_all()
+        return job
+
+    def get(self, job_id: str) -> Optional[SwitchJob]:
+        return self.jobs.get(job_id)
+
+    def snapshot(self, job: SwitchJob) -> Dict:
+        with self._cond:
+            return job.as_dict()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self.pending is None:
+                    self._cond.wait()
+                job, self.pending = self.pending, None
+                self.current = job
+                job.state = RUNNING
+                job.started_at = time.time()
+                self._changed(job)
+            try:
+                result = self.run_steps(job)
+                state = SUCCEEDED if result.get("success") else FAILED
+            except Exception as e:
+                print(f"ERROR: Internet switch job {job.id} failed: {e}")
+                result = {"success": False, "message": f"Internet switch error: {str(e)}"}
+                state = FAILED
+            with self._cond:
+                if job.superseded_by is not None:
+                    state = SUPERSEDED
+                    self.superseded += 1
+                self._finish(job, state, result)
+
+    @contextmanager
+    def step(self, job: SwitchJob, name: str, message: str = ""):
+        """Record one step: running while the block executes, then done (or failed on an exception).
+
+        The block may set entry["status"] ("failed", "skipped", ...) and entry["message"].
+        """
+        entry = {"step": name, "status": "running", "message": message, "elapsed_ms": None}
+        start = time.perf_counter()
+        with self._cond:
+            job.steps.append(entry)
+            self._changed(job)
+        try:
+            yield entry
+        except Exception as e:
+            with self._cond:
+                entry.update(status="failed", message=str(e))
+            raise
+        finally:
+            with self._cond:
+                if entry["status"] == "running":
+                    entry["status"] = "done"
+                entry["elapsed_ms"] = round((time.perf_counter() - start) * 1000)
+                self._changed(job)
+
+    def wait(self, job: SwitchJob, seconds: float) -> bool:
+        """Sleep up to seconds on the worker; False if a newer job superseded this one meanwhile."""
+        deadline = time.monotonic() + seconds
+        with self._cond:
+            while job.superseded_by is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return job.superseded_by is None
+
+    async def wait_change(self, job: SwitchJob, version: int, timeout: float) -> bool:
+        """Await a change of job past version (True) or the timeout (False) without holding a thread."""
+        event = asyncio.Event()
+        listener = (asyncio.get_running_loop(), event)
+        with self._cond:
+            if job.version != version:
+                return True
+            self._listeners.append(listener)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._cond:
+                if listener in self._listeners:
+                    self._listeners.remove(listener)
+
+    async def wait_done(self, job: SwitchJob, timeout: float):
+        """Await the job's end (or the timeout)."""
+        deadline = time.monotonic() + timeout
+        while not job.done:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            await self.wait_change(job, job.version, remaining)
+
+    def _finish(self, job: SwitchJob, state: str, result: Dict):
+        job.state = state
+        job.result = result
+        job.finished_at = time.time()
+        if self.current is job:
+            self.current = None
+        self._changed(job)
+
+    def _changed(self, job: SwitchJob):
+        """Bump the job's version and wake streams (call with the lock held)."""
+        job.version += 1
+        for loop, event in self._listeners:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # that stream's event loop has closed
+        self._cond.notify_all()
+
+    def _trim(self):
+        while len(self.jobs) > self.keep:
+            oldest = next(iter(self.jobs.values()))
+            if not oldest.done:
+                break
+            self.jobs.popitem(last=False)
+
+    def status(self) -> Dict:
+        with self._cond:
+            return {
+                "current": self.current.id if self.current else None,
+                "pending": self.pending.id if self.pending else None,
+                "superseded": self.superseded,
+                "jobs": [job.id for job in self.jobs.values()]
+            }
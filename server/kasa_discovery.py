@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Kasa power strip discovery with a persistent MAC -> IP cache.
+
+Kasa devices answer an XOR-encrypted get_sysinfo sent as a UDP broadcast to
+port 9999 (no length prefix) with their full sysinfo, which includes the MAC.
+KasaDiscoveryCache keeps the last known IP for each strip MAC in a small JSON
+file and KasaResolver maps one configured strip to its MAC, so a (re)start
+connects straight to the cached address - one unicast round trip - and only
+falls back to a broadcast when that address stops answering, e.g. after DHCP
+moved the strip.
+
+The cache lives in the data directory RV_DATA_DIR (the Docker image sets it to
+the /data volume, so the bindings survive container restarts; default: this
+server directory).
+
+Cache file format:
+    {"strips": {"main": "50:C7:BF:00:11:22"},
+     "devices": {"50:C7:BF:00:11:22": {"ip": "10.0.0.188", "alias": "...", "model": "HS300(US)", "seen": 1718390000}}}
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+from typing import Dict, List, Optional
+
+from kasa_protocol import KASA_PORT, xor_encrypt, xor_decrypt
+
+DISCOVERY_QUERY = {"system": {"get_sysinfo": {}}}
+DEFAULT_DISCOVERY_TIMEOUT = 2.0
+DATA_DIR = os.path.abspath(os.getenv("RV_DATA_DIR", os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_CACHE_FILE = os.path.join(DATA_DIR, "kasa_devices.json")
+
+
+def sysinfo_mac(sysinfo: Dict) -> Optional[str]:
+    mac = sysinfo.get("mac") or sysinfo.get("mic_mac")
+    if not mac:
+        return None
+    mac = mac.replace("-", ":").upper()
+    if ":" not in mac and len(mac) == 12:
+        mac = ":".join(mac[i:i + 2] for i in range(0, 12, 2))
+    return mac
+
+
+def is_power_strip(sysinfo: Dict) -> bool:
+    return (sysinfo.get("model", "").startswith("HS300")
+            or sysinfo.get("mic_type") == "IOT.SMARTSTRIP"
+            or bool(sysinfo.get("children")))
+
+
+def discover(target: str = "255.255.255.255", port: int = KASA_PORT,
+             timeout: float = DEFAULT_DISCOVERY_TIMEOUT) -> List[Dict]:
+    """Broadcast a get_sysinfo and collect the power strips that answer within timeout.
+
+    Returns a list of {"ip", "mac", "alias", "model"} dicts.
+    """
+    query = xor_encrypt(json.dumps(DISCOVERY_QUERY).encode("utf-8"))
+    found = {}
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        sock.sendto(query, (target, port))
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            sock.settimeout(remaining)
+            try:
+                data, (ip, _) = sock.recvfrom(65535)
+            except socket.timeout:
+                break
+            try:
+                sysinfo = json.loads(xor_decrypt(data))["system"]["get_sysinfo"]
+            except (ValueError, KeyError, TypeError):
+                continue
+            mac = sysinfo_mac(sysinfo)
+            if mac and is_power_strip(sysinfo):
+                found[mac] = {"ip": ip, "mac": mac, "alias": sysinfo.get("alias", ""),
+                              "model": sysinfo.get("model", "")}
+    finally:
+        sock.close()
+    return list(found.values())
+
+
+class KasaDiscoveryCache:
+    """MAC -> IP bindings for every known power strip, persisted as JSON.
+
+    Shared by the resolvers of all configured strips; one broadcast refreshes
+    every binding, and concurrent rediscover() calls share that broadcast.
+    """
+
+    def __init__(self, cache_file: str = DEFAULT_CACHE_FILE, target: str = "255.255.255.255",
+                 port: int = KASA_PORT, timeout: float = DEFAULT_DISCOVERY_TIMEOUT):
+        self.cache_file = cache_file
+        self.target = target
+        self.port = port
+        self.timeout = timeout
+        self.discoveries = 0
+        self.lock = threading.Lock()
+        self._discover_lock = threading.Lock()
+        self._last_found: List[Dict] = []
+        self.devices, self.strips = self._load()
+
+    def _load(self):
+        try:
+            with open(self.cache_file) as f:
+                cache = json.load(f)
+        except FileNotFoundError:
+            return {}, {}
+        except (OSError, ValueError) as e:
+            print(f"WARNING: Ignoring unreadable Kasa discovery cache {self.cache_file}: {e}")
+            return {}, {}
+        strips = cache.get("strips", {})
+        if not strips and cache.get("preferred"):
+            strips = {"main": cache["preferred"]}   # single-strip cache format
+        return cache.get("devices", {}), strips
+
+    def save(self):
+        # Called with self.lock held; write-then-rename so a crash never leaves half a file
+        tmp = f"{self.cache_file}.tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_file)), exist_ok=True)
+            with open(tmp, "w") as f:
+                json.dump({"strips": self.strips, "devices": self.devices}, f, indent=1)
+            os.replace(tmp, self.cache_file)
+        except OSError as e:
+            print(f"WARNING: Could not write Kasa discovery cache {self.cache_file}: {e}")
+
+    def rediscover(self) -> List[Dict]:
+        """Broadcast for power strips and update the bindings; returns the strips that answered."""
+        if not self._discover_lock.acquire(blocking=False):
+            # Someone else is broadcasting right now: wait for and share their result
+            with self._discover_lock:
+                return list(self._last_found)
+        try:
+            self.discoveries += 1
+            devices = discover(self.target, self.port, self.timeout)
+            with self.lock:
+                for device in devices:
+                    known = self.devices.get(device["mac"], {})
+                    self.devices[device["mac"]] = {"ip": device["ip"], "alias": device["alias"],
+                                                   "model": device["model"], "seen": int(time.time())}
+                    if known.get("ip") not in (None, device["ip"]):
+                        print(f"INFO: Kasa device {device['mac']} moved {known['ip']} -> {device['ip']}")
+                if devices:
+                    self.save()
+            self._last_found = devices
+        finally:
+            self._discover_lock.release()
+        print(f"INFO: Kasa discovery found {len(devices)} power strip(s)")
+        return devices
+
+
+class KasaResolver:
+    """Resolves one power strip's current IP from the discovery cache, rediscovering on failure.
+
+    The strip is identified by its MAC: the configured one (KASA_MAC) or the
+    one learned from the first successful connection. configured_host
+    (KASA_IP from constants) is used until a binding is known.
+    """
+
+    def __init__(self, strip_id: str, configured_host: str, cache: KasaDiscoveryCache,
+                 mac: Optional[str] = None):
+        self.strip_id = strip_id
+        self.configured_host = configured_host
+        self.cache = cache
+        with cache.lock:
+            self.mac = mac.upper() if mac else cache.strips.get(strip_id)
+
+    def host(self) -> str:
+        """Best known IP of the strip: cached binding for its MAC, else the configured host."""
+        with self.cache.lock:
+            return self._host_locked()
+
+    def _host_locked(self) -> str:
+        device = self.cache.devices.get(self.mac) if self.mac else None
+        return device["ip"] if device else self.configured_host
+
+    def learn(self, ip: str, sysinfo: Dict):
+        """Record a successful connection (binds the MAC to ip and persists it)."""
+        mac = sysinfo_mac(sysinfo)
+        if not mac:
+            return
+        cache = self.cache
+        with cache.lock:
+            if self.mac is None:
+                self.mac = mac
+            if mac != self.mac:
+                return
+            device = cache.devices.get(mac, {})
+            changed = device.get("ip") != ip or cache.strips.get(self.strip_id) != mac
+            cache.devices[mac] = {"ip": ip, "alias": sysinfo.get("alias", ""),
+                                  "model": sysinfo.get("model", ""), "seen": int(time.time())}
+            cache.strips[self.strip_id] = mac
+            if changed:
+                cache.save()
+
+    def rediscover(self) -> Optional[str]:
+        """Broadcast, then return this strip's (possibly new) IP, or None if it did not answer."""
+        devices = self.cache.rediscover()
+        with self.cache.lock:
+            if self.mac is None:
+                # Adopt the only strip that answered, unless another configured strip owns it
+                unbound = [d for d in devices if d["mac"] not in self.cache.strips.values()]
+                if len(devices) == 1 and unbound:
+                    self.mac = unbound[0]["mac"]
+            if self.mac is None or not any(d["mac"] == self.mac for d in devices):
+                return None
+            return self._host_locked()
+
+    def status(self) -> Dict:
+        with self.cache.lock:
+            device = self.cache.devices.get(self.mac) if self.mac else None
+            return {"mac": self.mac, "host": self._host_locked(), "cache_file": self.cache.cache_file,
+                    "discoveries": self.cache.discoveries, "device": dict(device) if device else None}
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Per-outlet power history and energy metering for the Kasa power strip.
+
+The Kasa poller hands every successful KasaStripState to EnergyHistory.record(),
+so sampling costs no extra device round trips. Each outlet keeps:
+  - a bounded ring of (time, milliwatts) samples in two flat arrays
+  - Wh per local hour and per local day, integrated with the trapezoid rule
+    between consecutive samples
+
+A gap longer than max_gap (strip offline, server paused) is not integrated,
+so an outage never shows up as energy. Each interval is booked to the hour
+and day of its midpoint; with 5 s polls that misplaces at most a few seconds
+of energy at a boundary.
+"""
+
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional
+
+
+SAMPLE_CAPACITY = 17280     # 24 h of samples at the default 5 s poll interval
+HOURS_KEPT = 48
+DAYS_KEPT = 31
+MAX_GAP_SECONDS = 60.0
+
+
+def local_hour(timestamp: float) -> int:
+    """Hours since the epoch in local time (so buckets line up with the wall clock)."""
+    return int((timestamp + time.localtime(timestamp).tm_gmtoff) // 3600)
+
+
+class BucketRing:
+    """Fixed number of consecutive integer-keyed accumulators (e.g. one per hour)."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.keys = array('q', [-1]) * size
+        self.values = array('d', [0.0]) * size
+
+    def add(self, key: int, value: float):
+        slot = key % self.size
+        if self.keys[slot] != key:
+            self.keys[slot] = key
+            self.values[slot] = 0.0
+        self.values[slot] += value
+
+    def get(self, key: int) -> float:
+        slot = key % self.size
+        return self.values[slot] if self.keys[slot] == key else 0.0
+
+    def last(self, newest_key: int, count: int) -> List[tuple]:
+        """(key, value) for the count keys ending at newest_key, oldest first."""
+        count = min(count, self.size)
+        return [(key, self.get(key)) for key in range(newest_key - count + 1, newest_key + 1)]
+
+
+class OutletEnergy:
+    """Sample ring plus hourly/daily Wh accumulators for one outlet."""
+
+    def __init__(self, capacity: int = SAMPLE_CAPACITY, max_gap: float = MAX_GAP_SECONDS):
+        self.capacity = capacity
+        self.max_gap = max_gap
+        self.times = array('d', [0.0]) * capacity
+        self.power_mw = array('i', [0]) * capacity
+        self.count = 0          # samples stored (<= capacity)
+        self.next = 0           # ring write position
+        self.hourly_wh = BucketRing(HOURS_KEPT)
+        self.daily_wh = BucketRing(DAYS_KEPT)
+        self.total_wh = 0.0
+        self._last_time = None
+        self.last_mw = 0
+
+    def add(self, timestamp: float, power_mw: int):
+        if self._last_time is not None:
+            elapsed = timestamp - self._last_time
+            if elapsed <= 0:
+                return
+            if elapsed <= self.max_gap:
+                wh = (self.last_mw + power_mw) / 2.0 / 1000.0 * elapsed / 3600.0
+                hour = local_hour(self._last_time + elapsed / 2.0)
+                self.hourly_wh.add(hour, wh)
+                self.daily_wh.add(hour // 24, wh)
+                self.total_wh += wh
+        self._last_time = timestamp
+        self.last_mw = power_mw
+
+        self.times[self.next] = timestamp
+        self.power_mw[self.next] = power_mw
+        self.next = (self.next + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def samples(self, limit: Optional[int] = None) -> List[tuple]:
+        """Most recent (timestamp, watts) samples, oldest first."""
+        count = self.count if limit is None else min(limit, self.count)
+        start = (self.next - count) % self.capacity
+        indexes = [(start + i) % self.capacity for i in range(count)]
+        return [(self.times[i], self.power_mw[i] / 1000.0) for i in indexes]
+
+
+class EnergyHistory:
+    """Energy history for every outlet of one strip, fed from poller snapshots."""
+
+    def __init__(self, capacity: int = SAMPLE_CAPACITY, max_gap: float = MAX_GAP_SECONDS):
+        self.capacity = capacity
+        self.max_gap = max_gap
+        self.outlets: List[OutletEnergy] = []
+        self.aliases: List[str] = []
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    def record(self, state, timestamp: Optional[float] = None):
+        """Add one sample per outlet from a KasaStripState."""
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            while len(self.outlets) < len(state):
+                self.outlets.append(OutletEnergy(self.capacity, self.max_gap))
+            self.aliases = list(state.aliases)
+            for outlet_id in range(len(state)):
+                self.outlets[outlet_id].add(timestamp, state.power_mw[outlet_id])
+
+    def report(self, hours: int = 24, days: int = 7, samples: int = 0,
+               outlet_ids: Optional[List[int]] = None, now: Optional[float] = None) -> Dict:
+        """Energy summary per outlet (0-based keys), for /api/kasa/energy."""
+        now = time.time() if now is None else now
+        hour = local_hour(now)
+        hours = max(1, min(hours, HOURS_KEPT))
+        days = max(1, min(days, DAYS_KEPT))
+        with self._lock:
+            outlet_ids = range(len(self.outlets)) if outlet_ids is None else [
+                i for i in outlet_ids if 0 <= i < len(self.outlets)]
+            report = {}
+            for outlet_id in outlet_ids:
+                meter = self.outlets[outlet_id]
+                hourly = meter.hourly_wh.last(hour, hours)
+                daily = meter.daily_wh.last(hour // 24, days)
+                entry = {
+                    "alias": self.aliases[outlet_id] if outlet_id < len(self.aliases) else f"Outlet {outlet_id + 1}",
+                    "power_w": meter.last_mw / 1000.0,
+                    "this_hour_wh": round(meter.hourly_wh.get(hour), 3),
+                    "today_wh": round(meter.daily_wh.get(hour // 24), 3),
+                    "last_24h_wh": round(sum(wh for _, wh in meter.hourly_wh.last(hour, 24)), 3),
+                    "total_wh": round(meter.total_wh, 3),
+                    "hourly_wh": [{"hour": bucket_start(key, 3600), "wh": round(wh, 3)} for key, wh in hourly],
+                    "daily_wh": [{"day": bucket_start(key, 86400), "wh": round(wh, 3)} for key, wh in daily],
+                    "sample_count": meter.count
+                }
+                if samples:
+                    entry["samples"] = [{"t": round(t, 1), "w": w} for t, w in meter.samples(samples)]
+                report[outlet_id] = entry
+            return report
+
+
+def bucket_start(key: int, seconds: int) -> str:
+    """Local wall-clock start of an hour/day bucket as 'YYYY-MM-DD HH:MM'."""
+    # key counts local hours/days since the epoch; treating it as UTC gives the local wall time
+    return time.strftime("%Y-%m-%d %H:%M", time.gmtime(key * seconds))
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Fake Kasa HS300 power strip for tests and benchmarks without hardware.
+
+Speaks the same local protocol as the real strip (XOR autokey, 4-byte length
+prefix, TCP port 9999) and keeps one persistent connection per client, like
+the device. Supported requests:
+  system.get_sysinfo                      - strip info with 6 children
+  emeter.get_realtime   (+ context)       - per-outlet realtime power
+  system.set_relay_state (+ context)      - switch one or more outlets
+FakeHS300DiscoveryResponder answers UDP discovery (get_sysinfo without the
+length prefix) for the same state.
+
+Usage:
+    python kasa_fake_hs300.py --port 9999 [--latency 0.05] [--discovery]
+    # then: python kasa_power_strip.py --host 127.0.0.1 --status
+"""
+
+import argparse
+import json
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+from kasa_protocol import xor_encrypt, xor_decrypt, KASA_PORT
+
+_LENGTH = struct.Struct(">I")
+
+DEVICE_ID = "8006A1B2C3D4E5F60718293A4B5C6D7E8F901234"
+DEFAULT_OUTLETS = [
+    ("Cellular Amp", False, 0.0),
+    ("TV", True, 0.1),
+    ("Soundbar", True, 2.4),
+    ("Synology", True, 18.7),
+    ("Outlet 5", True, 0.0),
+    ("Starlink", False, 0.0),
+]
+ON_POWER_W = {0: 6.2, 5: 48.5}  # Power drawn when an outlet that was off is switched on
+
+
+class FakeHS300State:
+    """Mutable device state shared by all client connections."""
+
+    def __init__(self, outlets=DEFAULT_OUTLETS, device_id=DEVICE_ID, alias="RV Power Strip",
+                 mac="50:C7:BF:00:11:22"):
+        self.device_id = device_id
+        self.alias = alias
+        self.mac = mac
+        self.lock = threading.Lock()
+        self.children = []
+        for index, (child_alias, is_on, power_w) in enumerate(outlets):
+            self.children.append({
+                "id": f"{device_id}{index:02d}",
+                "alias": child_alias,
+                "state": 1 if is_on else 0,
+                "on_time": 3600 if is_on else 0,
+                "next_action": {"type": -1},
+                "power_w": power_w if is_on else 0.0,
+            })
+        self.requests = 0
+
+    def _child(self, child_id):
+        for index, child in enumerate(self.children):
+            if child["id"] == child_id or child["id"].endswith(child_id):
+                return index, child
+        return None, None
+
+    def sysinfo(self):
+        return {
+            "sw_ver": "1.0.21 Build 210524 Rel.161309",
+            "hw_ver": "2.0",
+            "model": "HS300(US)",
+            "deviceId": self.device_id,
+            "oemId": "FFF22CFF774A0B89F7624BFC6F50D5DE",
+            "hwId": "34C41AA028022D0CCEA5E678E8547C54",
+            "rssi": -52,
+            "latitude_i": 0,
+            "longitude_i": 0,
+            "alias": self.alias,
+            "status": "new",
+            "mic_type": "IOT.SMARTSTRIP",
+            "feature": "TIM:ENE",
+            "mac": self.mac,
+            "updating": 0,
+            "led_off": 0,
+            "children": [
+                {key: child[key] for key in ("id", "state", "alias", "on_time", "next_action")}
+                for child in self.children
+            ],
+            "child_num": len(self.children),
+            "err_code": 0,
+        }
+
+    def handle(self, request):
+        """Return the response dict for one decoded request."""
+        with self.lock:
+            self.requests += 1
+            child_ids = request.get("context", {}).get("child_ids", [])
+            response = {}
+            for module, methods in request.items():
+                if module == "context":
+                    continue
+                response[module] = {}
+                for method, params in methods.items():
+                    response[module][method] = self._dispatch(module, method, params, child_ids)
+            return response
+
+    def _dispatch(self, module, method, params, child_ids):
+        if module == "system" and method == "get_sysinfo":
+            return self.sysinfo()
+
+        if module == "system" and method == "set_relay_state":
+            if not child_ids:
+                return {"err_code": -2, "err_msg": "member not support"}
+            state = 1 if params.get("state") else 0
+            for child_id in child_ids:
+                index, child = self._child(child_id)
+                if child is None:
+                    return {"err_code": -14, "err_msg": "entry not exist"}
+                if child["state"] != state:
+                    child["state"] = state
+                    child["on_time"] = 0
+                    child["power_w"] = ON_POWER_W.get(index, 1.0) if state else 0.0
+            return {"err_code": 0}
+
+        if module == "emeter" and method == "get_realtime":
+            if not child_ids:
+                return {"err_code": -1, "err_msg": "module not support"}
+            _, child = self._child(child_ids[0])
+            if child is None:
+                return {"err_code": -14, "err_msg": "entry not exist"}
+            power_mw = int(round(child["power_w"] * 1000))
+            return {
+                "voltage_mv": 121200,
+                "current_ma": int(power_mw / 121.2),
+                "power_mw": power_mw,
+                "total_wh": 1520,
+                "slot_id": int(child["id"][-2:]),
+                "err_code": 0,
+            }
+
+        return {"err_code": -2, "err_msg": "member not support"}
+
+
+class FakeHS300Handler(socketserver.BaseRequestHandler):
+    """One persistent client connection; serves requests until the client closes."""
+
+    def _recv_exactly(self, count):
+        data = b""
+        while len(data) < count:
+            chunk = self.request.recv(count - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def setup(self):
+        with self.server.connections_lock:
+            self.server.connections.add(self.request)
+
+    def finish(self):
+        with self.server.connections_lock:
+            self.server.connections.discard(self.request)
+
+    def handle(self):
+        while True:
+            try:
+                header = self._recv_exactly(_LENGTH.size)
+            except OSError:
+                return
+            if header is None:
+                return
+            (length,) = _LENGTH.unpack(header)
+            payload = self._recv_exactly(length)
+            if payload is None:
+                return
+            request = json.loads(xor_decrypt(payload))
+            if self.server.latency:
+                time.sleep(self.server.latency)
+            response = xor_encrypt(json.dumps(self.server.state.handle(request)).encode("utf-8"))
+            self.request.sendall(_LENGTH.pack(len(response)) + response)
+
+
+class FakeHS300Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=KASA_PORT, latency=0.0, state=None):
+        self.latency = latency
+        self.state = state or FakeHS300State()
+        self.connections = set()
+        self.connections_lock = threading.Lock()
+        super().__init__((host, port), FakeHS300Handler)
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        """Serve in a background daemon thread and return self."""
+        threading.Thread(target=self.serve_forever, name="fake-hs300", daemon=True).start()
+        return self
+
+    def drop_connections(self):
+        """Close every client connection, like a device reboot or idle timeout."""
+        with self.connections_lock:
+            connections = list(self.connections)
+        for conn in connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self.drop_connections()
+
+
+class FakeHS300DiscoveryHandler(socketserver.BaseRequestHandler):
+    """Answers UDP discovery (unprefixed XOR get_sysinfo) like the real strip."""
+
+    def handle(self):
+        data, sock = self.request
+        try:
+            request = json.loads(xor_decrypt(data))
+        except ValueError:
+            return
+        if "system" not in request or "get_sysinfo" not in request["system"]:
+            return
+        response = xor_encrypt(json.dumps(self.server.state.handle(request)).encode("utf-8"))
+        sock.sendto(response, self.client_address)
+
+
+class FakeHS300DiscoveryResponder(socketserver.ThreadingUDPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=KASA_PORT, state=None):
+        self.state = state or FakeHS300State()
+        super().__init__((host, port), FakeHS300DiscoveryHandler)
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        """Serve in a background daemon thread and return self."""
+        threading.Thread(target=self.serve_forever, name="fake-hs300-discovery", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Kasa HS300 power strip")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=KASA_PORT, help=f"TCP port (default: {KASA_PORT})")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated device latency in seconds")
+    parser.add_argument("--discovery", action="store_true", help="Also answer UDP discovery on the same port")
+    args = parser.parse_args()
+
+    server = FakeHS300Server(args.host, args.port, args.latency)
+    print(f"Fake HS300 listening on {args.host}:{server.port}")
+    if args.discovery:
+        FakeHS300DiscoveryResponder(args.host, server.port, server.state).start()
+        print(f"Fake HS300 answering discovery on udp {args.host}:{server.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Background poller for the Kasa HS300 power strip.
+
+One poll fetches the full strip state (every relay state plus per-outlet
+power) and stores it as an immutable snapshot. Endpoints read the snapshot
+instead of talking to the strip, so a debug-page refresh or a power reading
+costs no device round trips. Acknowledged writes call apply(): the cached
+relay states change immediately and a background read-back verifies them.
+Writes with an unknown outcome call invalidate(): the next read then polls
+synchronously, so nobody sees a relay state from before the write.
+
+There is one poller per strip per server. In multi-worker mode only the
+hardware owner (the master process) runs them; workers relay /api/kasa/* to
+it (hardware_proxy.py) and never talk to the strips themselves.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from kasa_state import KasaStripState
+
+
+DEFAULT_POLL_SECONDS = 5.0
+STRIP_UNAVAILABLE = "Kasa power strip not available"
+
+
+class KasaSnapshot:
+    """Strip state from one poll (a KasaStripState, or None if the poll failed)."""
+
+    __slots__ = ("version", "generation", "taken_at", "state", "error", "optimistic")
+
+    def __init__(self, version: int, generation: int, state: Optional[KasaStripState] = None,
+                 error: Optional[str] = None, optimistic: bool = False):
+        self.version = version
+        self.generation = generation
+        self.taken_at = time.monotonic()
+        self.state = state
+        self.error = error
+        self.optimistic = optimistic  # relay changes applied from a command ack, not yet read back
+
+    @property
+    def available(self) -> bool:
+        return self.state is not None
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.taken_at
+
+    @property
+    def total_power_w(self) -> float:
+        return self.state.total_power_w if self.state is not None else 0.0
+
+    def outlet(self, outlet_id: int) -> Optional[Dict]:
+        """Outlet dict (0-based ID, like KasaPowerStrip), or None if unknown."""
+        if self.state is not None and 0 <= outlet_id < len(self.state):
+            return self.state.outlet(outlet_id)
+        return None
+
+    def same_state(self, other: Optional["KasaSnapshot"]) -> bool:
+        return other is not None and self.state == other.state and self.error == other.error
+
+
+class KasaPoller:
+    """Keeps a versioned KasaSnapshot fresh from a daemon thread.
+
+    strip_provider returns a connected KasaPowerStrip or None (it owns the
+    connection and failure handling); on_error(exception) is called when a
+    poll fails so the provider can count the failure. on_state receives every
+    successfully polled KasaStripState (e.g. to record energy history).
+    """
+
+    def __init__(self, strip_provider: Callable, interval: float = DEFAULT_POLL_SECONDS,
+                 on_error: Optional[Callable] = None, on_state: Optional[Callable] = None):
+        self.strip_provider = strip_provider
+        self.interval = interval
+        self.on_error = on_error
+        self.on_state = on_state
+        self.polls = 0
+        self.corrections = 0                   # optimistic states the read-back disagreed with
+        self._lock = threading.Lock()          # guards _snapshot/_version/_generation
+        self._poll_lock = threading.Lock()     # one device poll at a time
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._snapshot = None
+        self._version = 0
+        self._generation = 0                   # bumped by invalidate()
+        self._writes = 0                       # bumped by apply()
+
+    def start(self):
+        """Start the polling thread (no-op if it is already running)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="kasa-poller", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def invalidate(self):
+        """Mark the cached state stale after a write; the next read re-polls."""
+        with self._lock:
+            self._generation += 1
+        self._wake.set()
+
+    def apply(self, changes: Dict[int, bool], verify_after: float = 0.5):
+        """Apply acknowledged relay changes to the cached state and verify them in the background.
+
+        Readers see the new relay states immediately; after verify_after seconds
+        (long enough for the emeter to settle) a read-back poll replaces the
+        optimistic state, and any disagreement is logged as a correction.
+        """
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.state is not None:
+                try:
+                    state = snapshot.state.with_relays(changes)
+                except ValueError:
+                    state = None
+                if state is not None:
+                    self._writes += 1
+                    self._version += 1
+                    self._snapshot = KasaSnapshot(self._version, snapshot.generation, state, optimistic=True)
+        timer = threading.Timer(verify_after, self._verify)
+        timer.daemon = True
+        timer.start()
+
+    def _verify(self):
+        try:
+            with self._poll_lock:
+                self._poll()
+        except Exception as e:
+            print(f"ERROR: Kasa read-back failed: {e}")
+
+    def snapshot(self, max_age: Optional[float] = None) -> KasaSnapshot:
+        """Return the cached state, polling first if it is invalidated or older than max_age.
+
+        max_age defaults to two poll intervals, so reads only hit the strip
+        when the poller is not running (or a write just invalidated the cache).
+        """
+        if max_age is None:
+            max_age = 2 * self.interval
+        snapshot = self._fresh(max_age)
+        if snapshot is not None:
+            return snapshot
+        with self._poll_lock:
+            # Another reader (or the poller thread) may have polled while we waited
+            snapshot = self._fresh(max_age)
+            if snapshot is not None:
+                return snapshot
+            return self._poll()
+
+    def peek(self) -> Optional[KasaSnapshot]:
+        """The cached snapshot as-is (never polls)."""
+        with self._lock:
+            return self._snapshot
+
+    def _fresh(self, max_age: float) -> Optional[KasaSnapshot]:
+        with self._lock:
+            snapshot = self._snapshot
+            if (snapshot is not None and snapshot.generation == self._generation
+                    and snapshot.age < max_age):
+                return snapshot
+        return None
+
+    def _poll(self) -> KasaSnapshot:
+        with self._lock:
+            generation = self._generation
+            writes = self._writes
+        state, error = None, None
+
+        strip = self.strip_provider()
+        if strip is None:
+            error = STRIP_UNAVAILABLE
+        else:
+            try:
+                state = strip.get_strip_state()
+            except Exception as e:
+                print(f"WARNING: Kasa poll failed: {e}")
+                error = str(e)
+                if self.on_error:
+                    self.on_error(e)
+
+        self.polls += 1
+        with self._lock:
+            if writes != self._writes:
+                # A write was applied while this poll was in flight; keep the newer optimistic
+                # state (its own read-back is already scheduled)
+                return self._snapshot
+            snapshot = KasaSnapshot(self._version, generation, state, error)
+            previous = self._snapshot
+            if (previous is not None and previous.optimistic and state is not None
+                    and previous.state.relay != state.relay):
+                self.corrections += 1
+                print(f"WARNING: Kasa read-back corrected relay states {list(previous.state.relay)} -> {list(state.relay)}")
+            if not snapshot.same_state(self._snapshot):
+                self._version += 1
+                snapshot.version = self._version
+            self._snapshot = snapshot
+        if state is not None and self.on_state:
+            try:
+                self.on_state(state)
+            except Exception as e:
+                print(f"WARNING: Kasa state listener failed: {e}")
+        return snapshot
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.snapshot(max_age=self.interval)
+            except Exception as e:
+                print(f"ERROR: Kasa poller: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
@@ -1,15 +1,16 @@
 # Completely Synchronous Kasa Smart Plug Power Strip HS300 controller
 # This module provides a truly synchronous interface to Kasa HS300 devices
-# by using subprocess calls to the kasa CLI tool instead of the async library
+# by speaking the Kasa local protocol directly (see kasa_protocol.py) over one
+# persistent socket, instead of the async library or a kasa CLI subprocess per call
 
-import json
 import os
-import shutil
-import subprocess
 import sys
 import time
 from typing import Dict, List, Optional, Union, Tuple
 
+from kasa_protocol import KasaConnection, KasaProtocolError, KASA_PORT
+from kasa_state import KasaStripState, realtime_power_mw
+
 
 class KasaPowerStripError(Exception):
     """Exception raised for Kasa power strip communication errors."""
@@ -19,8 +20,9 @@ class KasaPowerStripError(Exception):
 class KasaPowerStrip:
     """Completely synchronous controller for Kasa HS300 Smart Power Strip.
        
-       This version uses the kasa CLI tool via subprocess to avoid all asyncio
-       complications. All operations are truly blocking and synchronous.
+       This version talks to the strip's local protocol in-process over a
+       persistent TCP connection (reconnecting automatically) to avoid all
+       asyncio complications. All operations are truly blocking and synchronous.
        
        Features:
        - Individual outlet control (on/off/toggle)
@@ -29,13 +31,14 @@ class KasaPowerStrip:
        - No asyncio dependencies
     """
     
-    def __init__(self, host: Optional[str] = None, timeout: int = 8):
+    def __init__(self, host: Optional[str] = None, timeout: int = 8, port: int = KASA_PORT):
         """
         Initialize the Kasa Power Strip controller.
         
         Args:
             host: IP address of the power strip (if None, will use environment variable)
             timeout: Command timeout in seconds (default: 8, balanced for device discovery)
+            port: TCP port of the local protocol (default: 9999; override for the fake HS300)
         """
         # Support environment variables for Docker configuration
         self.host = host or os.getenv('KASA_IP')
@@ -46,86 +49,83 @@ class KasaPowerStrip:
             raise KasaPowerStripError(
                 "Host IP address required. Provide host parameter or set KASA_IP environment variable."
             )
+        
+        self.port = port
+        self._connection = KasaConnection(self.host, port=port, timeout=timeout)
+        self._child_ids: List[str] = []
+        self._state: Optional[KasaStripState] = None  # relay states from the last get_sysinfo
     
-    def _run_kasa_command(self, command_args: List[str], use_json: bool = True) -> Dict:
+    def _query(self, request: Dict) -> Dict:
         """
-        Run a kasa CLI command and return the JSON result.
+        Send a request over the persistent connection and return the response.
         
         Args:
-            command_args: List of command arguments to pass to kasa CLI
-            use_json: Whether to use --json flag for structured output
+            request: Kasa protocol request, e.g. {"system": {"get_sysinfo": {}}}
             
         Returns:
-            Dictionary containing the command result
+            Dictionary containing the device response
             
         Raises:
-            KasaPowerStripError: If command fails or times out
+            KasaPowerStripError: If the device can't be reached or reports an error
         """
         try:
-            # Build the full command - use full path to kasa CLI if available
-            kasa_cmd = shutil.which('kasa')
-            if not kasa_cmd:
-                # Try the virtual environment path
-                venv_kasa = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'venv', 'bin', 'kasa')
-                if os.path.exists(venv_kasa):
-                    kasa_cmd = venv_kasa
-                else:
-                    kasa_cmd = 'kasa'  # fallback to PATH lookup
-            
-            cmd = [kasa_cmd, '--host', self.host]
-            if use_json:
-                cmd.append('--json')
-            cmd.extend(command_args)
-            
-            # Run the command with timeout and environment modifications to reduce warnings
-            env = os.environ.copy()
-            env['PYTHONWARNINGS'] = 'ignore'  # Suppress Python warnings including asyncio
-            env['PYTHONIOENCODING'] = 'utf-8'  # Ensure consistent encoding
-            
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=self.timeout,
-                check=True,
-                encoding='utf-8',
-                errors='replace',  # Replace problematic characters instead of failing
-                env=env  # Use modified environment
-            )
-            
-            # Parse JSON output
-            if result.stdout.strip():
-                if use_json:
-                    try:
-                        return json.loads(result.stdout)
-                    except json.JSONDecodeError as e:
-                        raise KasaPowerStripError(f"Failed to parse JSON output: {e}")
-                else:
-                    # Return plain text wrapped in dict
-                    return {"output": result.stdout.strip()}
-            else:
-                return {"success": True}
-                
-        except subprocess.TimeoutExpired:
-            raise KasaPowerStripError(f"Command timed out after {self.timeout} seconds")
-        except subprocess.CalledProcessError as e:
-            error_msg = e.stderr.strip() if e.stderr else str(e)
-            # Filter out aiohttp connection warnings that clutter the error messages
-            if error_msg and ('ERROR:asyncio:Unclosed' in error_msg or 'aiohttp' in error_msg):
-                # Extract just the relevant error info, skip the aiohttp spam
-                lines = error_msg.split('\n')
-                filtered_lines = [line for line in lines if not ('ERROR:asyncio:Unclosed' in line or 
-                                                               'client_session:' in line or 
-                                                               'connector:' in line or
-                                                               'connections:' in line)]
-                error_msg = '\n'.join(filtered_lines).strip()
-                if not error_msg:
-                    error_msg = "Kasa communication error (connection issues filtered)"
-            raise KasaPowerStripError(f"Kasa command failed: {error_msg}")
-        except FileNotFoundError:
-            raise KasaPowerStripError("kasa CLI tool not found. Please install python-kasa package.")
-        except Exception as e:
-            raise KasaPowerStripError(f"Unexpected error running kasa command: {e}")
+            response = self._connection.query(request)
+        except KasaProtocolError as e:
+            raise KasaPowerStripError(f"Kasa command failed: {e}")
+        
+        # Every method result carries an err_code; non-zero means the device rejected it
+        for module, methods in response.items():
+            if not isinstance(methods, dict):
+                continue
+            for method, result in methods.items():
+                if isinstance(result, dict) and result.get('err_code', 0) != 0:
+                    raise KasaPowerStripError(
+                        f"Kasa command failed: {module}.{method}: {result.get('err_msg', result['err_code'])}"
+                    )
+        return response
+    
+    def _get_sysinfo(self) -> Dict:
+        """Fetch system info (including the child outlet list) and remember child IDs."""
+        system_info = self._query({"system": {"get_sysinfo": {}}})['system']['get_sysinfo']
+        self._state = KasaStripState.from_responses(system_info)
+        self._child_ids = list(self._state.child_ids)
+        self.device_info = {'system': {'get_sysinfo': system_info}}
+        return system_info
+    
+    def _child_id(self, outlet_id: int) -> str:
+        if not self._child_ids:
+            self._get_sysinfo()
+        if not 0 <= outlet_id < len(self._child_ids):
+            raise ValueError(f"Outlet ID must be between 0 and {len(self._child_ids) - 1}")
+        return self._child_ids[outlet_id]
+    
+    def _get_realtime(self, outlet_id: int) -> Dict:
+        """Read the emeter realtime values of one outlet."""
+        request = {"context": {"child_ids": [self._child_id(outlet_id)]}, "emeter": {"get_realtime": {}}}
+        return self._query(request)['emeter']['get_realtime']
+    
+    def _set_relay_state(self, outlet_id: int, state: bool):
+        self._set_relay_states([outlet_id], state)
+    
+    def _set_relay_states(self, outlet_ids: List[int], state: bool):
+        # One request switches any number of children to the same state
+        request = {
+            "context": {"child_ids": [self._child_id(i) for i in outlet_ids]},
+            "system": {"set_relay_state": {"state": 1 if state else 0}}
+        }
+        self._query(request)
+    
+    def set_host(self, host: str):
+        """Point the controller at a new IP (e.g. after rediscovery); reconnects lazily."""
+        if host == self.host:
+            return
+        self._connection.close()
+        self.host = host
+        self._connection = KasaConnection(host, port=self.port, timeout=self.timeout)
+    
+    def close(self):
+        """Close the persistent connection (it is reopened on the next command)."""
+        self._connection.close()
     
     def connect(self, verbose: bool = True) -> bool:
         """
@@ -144,11 +144,8 @@ class KasaPowerStrip:
             print(f"Connecting to Kasa device at {self.host}...")
         
         try:
-            # Get device state which also tests connectivity
-            self.device_info = self._run_kasa_command(['state'])
-            
-            # Extract system info from JSON response
-            system_info = self.device_info.get('system', {}).get('get_sysinfo', {})
+            # Get system info which also tests connectivity
+            system_info = self._get_sysinfo()
             children = system_info.get('children', [])
             
             # Verify it's a power strip with children
@@ -180,34 +177,9 @@ class KasaPowerStrip:
         Returns:
             List of dictionaries containing outlet information
         """
-        if not self.device_info:
-            self.connect(verbose=False)
-        
         # Refresh device state
-        current_state = self._run_kasa_command(['state'])
-        system_info = current_state.get('system', {}).get('get_sysinfo', {})
-        children = system_info.get('children', [])
-        
-        outlets = []
-        for i, child in enumerate(children):
-            # Sanitize alias to remove problematic Unicode characters
-            raw_alias = child.get('alias', f'Outlet {i}')
-            try:
-                # Try to encode/decode to clean up any problematic characters
-                clean_alias = raw_alias.encode('ascii', errors='ignore').decode('ascii').strip()
-                if not clean_alias:  # If nothing left after sanitization, use default
-                    clean_alias = f'Outlet {i+1}'
-            except:
-                clean_alias = f'Outlet {i+1}'
-                
-            outlets.append({
-                'outlet_id': i,
-                'alias': clean_alias,
-                'is_on': child.get('state', 0) == 1,
-                'device_id': child.get('id', f'outlet_{i}')
-            })
-        
-        return outlets
+        self._get_sysinfo()
+        return self._state.outlets(with_power=False)
     
     def get_outlet_status(self, outlet_id: int) -> Dict[str, Union[int, str, bool]]:
         """
@@ -222,12 +194,8 @@ class KasaPowerStrip:
         Raises:
             ValueError: If outlet_id is invalid
         """
-        outlets = self.get_all_outlet_status()
-        
-        if not 0 <= outlet_id < len(outlets):
-            raise ValueError(f"Outlet ID must be between 0 and {len(outlets) - 1}")
-        
-        return outlets[outlet_id]
+        self._get_sysinfo()
+        return self._state.outlet(outlet_id, with_power=False)
     
     def turn_on_outlet(self, outlet_id: int) -> bool:
         """
@@ -243,22 +211,15 @@ class KasaPowerStrip:
             ValueError: If outlet_id is invalid
             KasaPowerStripError: If command fails
         """
-        # Basic validation without expensive network call
-        if not 0 <= outlet_id <= 5:  # HS300 has 6 outlets (0-5)
-            raise ValueError(f"Outlet ID must be between 0 and 5")
-        
-        # Use kasa CLI to turn on the specific child device directly
+        # Validated against the child list from the last get_sysinfo (no extra network call)
         try:
-            self._run_kasa_command(['device', '--child-index', str(outlet_id), 'on'], use_json=False)
+            self._set_relay_state(outlet_id, True)
             print(f"SUCCESS: Turned ON port {outlet_id + 1}")
             return True
+        except ValueError:
+            raise ValueError(f"Invalid outlet ID {outlet_id} - outlet may not exist")
         except Exception as e:
-            # If it fails, it might be because outlet doesn't exist or network issue
-            error_msg = str(e)
-            if "child" in error_msg.lower() or "index" in error_msg.lower():
-                raise ValueError(f"Invalid outlet ID {outlet_id} - outlet may not exist")
-            else:
-                raise KasaPowerStripError(f"Failed to turn on outlet {outlet_id}: {e}")
+            raise KasaPowerStripError(f"Failed to turn on outlet {outlet_id}: {e}")
     
     def turn_off_outlet(self, outlet_id: int) -> bool:
         """
@@ -274,22 +235,60 @@ class KasaPowerStrip:
             ValueError: If outlet_id is invalid
             KasaPowerStripError: If command fails
         """
-        # Basic validation without expensive network call
-        if not 0 <= outlet_id <= 5:  # HS300 has 6 outlets (0-5)
-            raise ValueError(f"Outlet ID must be between 0 and 5")
-        
-        # Use kasa CLI to turn off the specific child device directly
+        # Validated against the child list from the last get_sysinfo (no extra network call)
         try:
-            self._run_kasa_command(['device', '--child-index', str(outlet_id), 'off'], use_json=False)
+            self._set_relay_state(outlet_id, False)
             print(f"SUCCESS: Turned OFF port {outlet_id + 1}")
             return True
+        except ValueError:
+            raise ValueError(f"Invalid outlet ID {outlet_id} - outlet may not exist")
         except Exception as e:
-            # If it fails, it might be because outlet doesn't exist or network issue
-            error_msg = str(e)
-            if "child" in error_msg.lower() or "index" in error_msg.lower():
-                raise ValueError(f"Invalid outlet ID {outlet_id} - outlet may not exist")
-            else:
-                raise KasaPowerStripError(f"Failed to turn off outlet {outlet_id}: {e}")
+            raise KasaPowerStripError(f"Failed to turn off outlet {outlet_id}: {e}")
+    
+    def set_outlets(self, states: Dict[int, bool], current: Optional[KasaStripState] = None) -> Dict[int, bool]:
+        """
+        Set several outlets at once, only sending the changes that are needed.
+        
+        Outlets already in the wanted state (according to current) are skipped.
+        The rest are switched with one multi-child request per target state,
+        so mixed on/off changes take two requests and same-state changes one.
+        
+        Args:
+            states: Wanted state per outlet, e.g. {0: False, 5: True} (0-based IDs)
+            current: Known strip state to diff against (e.g. the poller's snapshot);
+                     if None, the relay states are read from the device first
+            
+        Returns:
+            Dictionary of the outlets that were actually switched and their new state
+            
+        Raises:
+            ValueError: If an outlet_id is invalid
+            KasaPowerStripError: If a command fails
+        """
+        for outlet_id in states:
+            self._child_id(outlet_id)  # ValueError for outlets the strip doesn't have
+        
+        if current is None or len(current) == 0:
+            self._get_sysinfo()
+            current = self._state
+        
+        changes = {outlet_id: bool(on) for outlet_id, on in states.items()
+                   if outlet_id >= len(current) or current.is_on(outlet_id) != bool(on)}
+        
+        for target in (True, False):
+            outlet_ids = sorted(i for i, on in changes.items() if on == target)
+            if not outlet_ids:
+                continue
+            try:
+                self._set_relay_states(outlet_ids, target)
+            except ValueError:
+                raise ValueError(f"Invalid outlet IDs {outlet_ids} - outlet may not exist")
+            except Exception as e:
+                raise KasaPowerStripError(f"Failed to turn {'on' if target else 'off'} outlets {outlet_ids}: {e}")
+            ports = ", ".join(str(i + 1) for i in outlet_ids)
+            print(f"SUCCESS: Turned {'ON' if target else 'OFF'} port(s) {ports}")
+        
+        return changes
     
     def toggle_outlet(self, outlet_id: int) -> bool:
         """
@@ -312,85 +311,30 @@ class KasaPowerStrip:
         else:
             return self.turn_on_outlet(outlet_id)
     
+    def get_strip_state(self) -> KasaStripState:
+        """
+        Read relay states and per-outlet power in one pass.
+        
+        Returns:
+            KasaStripState parsed from get_sysinfo plus each outlet's emeter reading
+        """
+        system_info = self._get_sysinfo()
+        realtimes = [self._get_realtime(i) for i in range(len(self._child_ids))]
+        return KasaStripState.from_responses(system_info, realtimes)
+    
     def get_all_outlet_status_with_power(self) -> Tuple[List[Dict[str, Union[int, str, bool, float]]], float]:
         """
-        Get status and power consumption of all outlets in a single call.
+        Get status and power consumption of all outlets.
         
         Returns:
             Tuple of (outlets_list, total_power)
         """
-        # Get device state text output - contains both status and power info
-        device_state = self._run_kasa_command(['state'], use_json=False)
-        output = device_state.get('output', '')
-        lines = output.split('\n')
-        
-        outlets = []
-        power_data = {}
-        total_power = 0
-        current_outlet_index = -1
-        current_outlet_alias = ""
-        current_outlet_state = False
-        in_child_section = False
-        
-        for line in lines:
-            line = line.strip()
-            
-            # Check if this line starts a new child device section
-            if line.startswith('== ') and '(Socket for HS300' in line:
-                current_outlet_index += 1
-                in_child_section = True
-                # Extract alias from the header line
-                # Format: "== Outlet Name (Socket for HS300(..."
-                if ' (' in line:
-                    current_outlet_alias = line.split(' (')[0].replace('== ', '')
-                else:
-                    current_outlet_alias = f'Outlet {current_outlet_index + 1}'
-                continue
-            
-            # Look for device state in child sections
-            if in_child_section and 'State (state):' in line:
-                state_str = line.split(':')[-1].strip()
-                current_outlet_state = (state_str.lower() == 'true')
-                continue
-            
-            # Look for current consumption lines
-            if 'Current consumption (current_consumption):' in line:
-                try:
-                    power_str = line.split(':')[-1].strip()
-                    power_value = float(power_str.split()[0])
-                    
-                    if in_child_section and current_outlet_index >= 0:
-                        # Store power data and create outlet record
-                        power_data[current_outlet_index] = power_value
-                        
-                        # Clean up alias
-                        try:
-                            clean_alias = current_outlet_alias.encode('ascii', errors='ignore').decode('ascii').strip()
-                            if not clean_alias:
-                                clean_alias = f'Outlet {current_outlet_index + 1}'
-                        except:
-                            clean_alias = f'Outlet {current_outlet_index + 1}'
-                        
-                        outlets.append({
-                            'outlet_id': current_outlet_index,
-                            'alias': clean_alias,
-                            'is_on': current_outlet_state,
-                            'device_id': f'outlet_{current_outlet_index}',
-                            'power_w': power_value
-                        })
-                        
-                        in_child_section = False
-                    elif not line.startswith('        '):
-                        # This is the main device total (not indented)
-                        total_power = power_value
-                except (ValueError, IndexError):
-                    continue
-        
-        return outlets, total_power
+        state = self.get_strip_state()
+        return state.outlets(), state.total_power_w
     
     def get_power_consumption(self, outlet_id: Optional[int] = None) -> Dict:
         """
-        Get power consumption information by parsing device state output.
+        Get power consumption information from the outlet emeter.
         
         Args:
             outlet_id: Specific outlet ID (0-based), or None for total device power
@@ -399,52 +343,16 @@ class KasaPowerStrip:
             Dictionary containing power consumption data with 'power_w' field
         """
         try:
-            # Get device state which includes power information
-            device_state = self._run_kasa_command(['state'], use_json=False)
-            output = device_state.get('output', '')
-            
             if outlet_id is not None:
-                # Parse individual outlet power from the text output
-                lines = output.split('\n')
-                current_outlet_index = -1
-                in_child_section = False
-                
-                for line in lines:
-                    # Check if this line starts a new child device section
-                    if line.strip().startswith('== ') and '(Socket for HS300' in line:
-                        current_outlet_index += 1
-                        in_child_section = (current_outlet_index == outlet_id)
-                        continue
-                    
-                    # If we're in the target outlet section, look for current consumption
-                    if in_child_section and 'Current consumption (current_consumption):' in line:
-                        try:
-                            # Extract power value (format: "        Current consumption (current_consumption): 13.0 W")
-                            power_str = line.split(':')[-1].strip()  # Get "13.0 W"
-                            power_value = float(power_str.split()[0])  # Get "13.0"
-                            return {"power_w": power_value, "outlet_id": outlet_id}
-                        except (ValueError, IndexError) as e:
-                            print(f"WARNING: Error parsing power for outlet {outlet_id}: {e}")
-                            continue
-                
-                # If we couldn't find the outlet or its power data
-                return {"error": f"Could not find power data for outlet {outlet_id}", "power_w": 0}
+                try:
+                    realtime = self._get_realtime(outlet_id)
+                except ValueError:
+                    return {"error": f"Could not find power data for outlet {outlet_id}", "power_w": 0}
+                return {"power_w": realtime_power_mw(realtime) / 1000.0, "outlet_id": outlet_id}
             
             else:
-                # Parse total device power consumption (main device section)
-                lines = output.split('\n')
-                for line in lines:
-                    # Look for main device current consumption (not in a child section)
-                    if ('Current consumption (current_consumption):' in line and 
-                        not line.startswith('        ')):  # Main device line is not indented
-                        try:
-                            power_str = line.split(':')[-1].strip()
-                            power_value = float(power_str.split()[0])
-                            return {"power_w": power_value, "device_total": True}
-                        except (ValueError, IndexError):
-                            continue
-                
-                return {"error": "Could not parse total power consumption", "power_w": 0}
+                # The HS300 has no strip-level emeter; total is the sum of the outlets
+                return {"power_w": self.get_strip_state().total_power_w, "device_total": True}
             
         except Exception as e:
             print(f"WARNING: Power consumption data not available: {e}")
@@ -470,7 +378,7 @@ class KasaPowerStrip:
             True if device responds, False otherwise
         """
         try:
-            self._run_kasa_command(['state'])
+            self._get_sysinfo()
             return True
         except Exception:
             return False
@@ -568,6 +476,8 @@ Examples:
         # Host argument (optional if KASA_IP is set)
         parser.add_argument('--host', '--ip', 
                            help='IP address of the Kasa power strip (default: uses KASA_IP environment variable)')
+        parser.add_argument('--kasa-port', type=int, default=KASA_PORT,
+                           help=f'TCP port of the Kasa local protocol (default: {KASA_PORT})')
         
         # Command group - mutually exclusive
         command_group = parser.add_mutually_exclusive_group(required=True)
@@ -596,7 +506,7 @@ Examples:
             parser.error("Host IP address required. Use --host or set KASA_IP environment variable")
         
         try:
-            kasa = KasaPowerStrip(host)
+            kasa = KasaPowerStrip(host, port=args.kasa_port)
             
             if args.status:
                 # Connect quietly for status command
@@ -0,0 +1,131 @@
+# Native TP-Link Kasa local protocol client (HS300 and other IOT.SMARTSTRIP devices)
+# Speaks the XOR-autokey "Smart Home" protocol on TCP port 9999 directly, keeping one
+# persistent socket per device instead of starting a kasa CLI subprocess per command.
+
+import json
+import socket
+import struct
+import threading
+from typing import Dict, Optional
+
+KASA_PORT = 9999
+INITIALIZATION_VECTOR = 171  # First XOR key of the autokey cipher
+
+_LENGTH = struct.Struct(">I")
+MAX_RESPONSE_BYTES = 1024 * 1024
+
+
+class KasaProtocolError(Exception):
+    """Exception raised for Kasa transport or protocol errors."""
+    pass
+
+
+def xor_encrypt(plaintext: bytes) -> bytes:
+    """Encrypt with the Kasa autokey cipher (no length prefix, as used over UDP)."""
+    key = INITIALIZATION_VECTOR
+    out = bytearray(len(plaintext))
+    for i, byte in enumerate(plaintext):
+        key = key ^ byte
+        out[i] = key
+    return bytes(out)
+
+
+def xor_decrypt(ciphertext: bytes) -> bytes:
+    """Decrypt the Kasa autokey cipher (no length prefix, as used over UDP)."""
+    key = INITIALIZATION_VECTOR
+    out = bytearray(len(ciphertext))
+    for i, byte in enumerate(ciphertext):
+        out[i] = key ^ byte
+        key = byte
+    return bytes(out)
+
+
+def encode_request(request: Dict) -> bytes:
+    """Serialize, encrypt and length-prefix a request for the TCP transport."""
+    payload = xor_encrypt(json.dumps(request, separators=(",", ":")).encode("utf-8"))
+    return _LENGTH.pack(len(payload)) + payload
+
+
+def decode_payload(payload: bytes) -> Dict:
+    """Decrypt and parse a response body (without its length prefix)."""
+    try:
+        return json.loads(xor_decrypt(payload).decode("utf-8", errors="replace"))
+    except json.JSONDecodeError as e:
+        raise KasaProtocolError(f"Invalid JSON in device response: {e}")
+
+
+class KasaConnection:
+    """Persistent TCP connection to one Kasa device.
+
+    The socket is opened lazily and reused for every query. If the device has
+    dropped the connection (they do after a period of inactivity or a reboot),
+    the query is retried once on a fresh socket before failing.
+    Thread-safe: queries are serialized with a lock.
+    """
+
+    def __init__(self, host: str, port: int = KASA_PORT, timeout: float = 8.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._lock = threading.Lock()
+        self.reconnects = 0
+
+    def _open(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _recv_exactly(self, count: int) -> bytes:
+        chunks = []
+        remaining = count
+        while remaining:
+            chunk = self._sock.recv(remaining)
+            if not chunk:
+                raise ConnectionResetError("Connection closed by device")
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        return b"".join(chunks)
+
+    def _exchange(self, frame: bytes) -> Dict:
+        self._sock.sendall(frame)
+        (length,) = _LENGTH.unpack(self._recv_exactly(_LENGTH.size))
+        if length > MAX_RESPONSE_BYTES:
+            raise KasaProtocolError(f"Device response too large: {length} bytes")
+        return decode_payload(self._recv_exactly(length))
+
+    def query(self, request: Dict) -> Dict:
+        """Send one request and return the decoded response."""
+        frame = encode_request(request)
+        with self._lock:
+            for attempt in range(2):
+                fresh = self._sock is None
+                try:
+                    if fresh:
+                        self._open()
+                        if attempt:
+                            self.reconnects += 1
+                    return self._exchange(frame)
+                except socket.timeout:
+                    self._close_locked()
+                    raise KasaProtocolError(f"Timed out after {self.timeout} seconds talking to {self.host}")
+                except OSError as e:
+                    self._close_locked()
+                    # A stale reused socket gets one retry on a new connection
+                    if fresh or attempt:
+                        raise KasaProtocolError(f"Connection to {self.host}:{self.port} failed: {e}")
+
+    def _close_locked(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+    def close(self):
+        with self._lock:
+            self._close_locked()
+
+    @property
+    def connected(self) -> bool:
+        return self._sock is not None
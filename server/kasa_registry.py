@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Registry of Kasa power strips, addressed by strip ID.
+
+Each configured strip gets a KasaDevice: its own controller (persistent
+connection), circuit breaker, discovery binding, state poller and energy
+history. One registry thread polls every strip concurrently each interval,
+so a poll cycle takes about as long as the slowest strip rather than the sum
+of all of them, and one unreachable strip never delays the others.
+
+Strips come from constants.json:
+    "KASA_STRIPS": {"main": {"ip": "10.0.0.188"}, "bay": {"ip": "10.0.0.189", "mac": "50:C7:BF:..."}}
+Without KASA_STRIPS there is one strip, "main", at KASA_IP.
+Outlets are addressed as strip/outlet, e.g. "bay/2" (outlets are 1-based in the API).
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from circuit_breaker import CircuitBreaker
+from kasa_discovery import KasaDiscoveryCache, KasaResolver
+from kasa_energy import EnergyHistory, MAX_GAP_SECONDS
+from kasa_poller import KasaPoller, DEFAULT_POLL_SECONDS
+from kasa_power_strip import KasaPowerStrip, KasaPowerStripError
+from kasa_protocol import KASA_PORT
+
+DEFAULT_STRIP_ID = "main"
+DEFAULT_KASA_IP = "10.0.0.188"
+
+
+def strip_config_from_constants(constants: Dict, default_mac: Optional[str] = None) -> Dict[str, Dict]:
+    """{strip_id: {"ip", "mac", "port"}} from KASA_STRIPS, or the single KASA_IP strip."""
+    strips = constants.get("KASA_STRIPS")
+    if not strips:
+        strips = {DEFAULT_STRIP_ID: {"ip": constants.get("KASA_IP", DEFAULT_KASA_IP),
+                                     "mac": default_mac or constants.get("KASA_MAC")}}
+    return {str(strip_id): dict(config) for strip_id, config in strips.items()}
+
+
+def parse_outlet_address(address: str, default_strip: str = DEFAULT_STRIP_ID) -> Tuple[str, int]:
+    """'bay/2' -> ('bay', 2); a bare '2' addresses the default strip. Outlets are 1-based."""
+    strip_id, _, outlet = address.rpartition("/")
+    return strip_id or default_strip, int(outlet)
+
+
+class KasaDevice:
+    """One power strip with its connection, circuit breaker, discovery binding, poller and energy history."""
+
+    def __init__(self, strip_id: str, host: str, cache: KasaDiscoveryCache, mac: Optional[str] = None,
+                 port: int = KASA_PORT, poll_interval: float = DEFAULT_POLL_SECONDS,
+                 instrument: Optional[Callable] = None, on_transition: Optional[Callable] = None,
+                 disabled: bool = False):
+        self.strip_id = strip_id
+        self.port = port
+        self.disabled = disabled
+        self.instrument = instrument
+        self.resolver = KasaResolver(strip_id, host, cache, mac)
+        # Device label for metrics: plain "kasa" for the default strip, "kasa/<id>" for others
+        name = "kasa" if strip_id == DEFAULT_STRIP_ID else f"kasa/{strip_id}"
+        # Only the background probe may fall back to the (2 s) discovery broadcast
+        self.breaker = CircuitBreaker(name, probe=lambda: self.connect(rediscover=True), failure_threshold=2,
+                                      base_delay=2.0, max_delay=60.0, on_transition=on_transition)
+        self.energy = EnergyHistory(max_gap=max(MAX_GAP_SECONDS, 4 * poll_interval))
+        self.poller = KasaPoller(self.get_strip, interval=poll_interval, on_error=self.report_failure,
+                                 on_state=self._record_state)
+        self._strip = None
+        self._connect_lock = threading.Lock()
+
+    def connect(self, rediscover: bool = False) -> KasaPowerStrip:
+        """Connect (or reconnect) the strip controller. Raises on failure.
+
+        With rediscover, a strip that does not answer at its known IP is looked
+        for by broadcast; request threads never pass it, the breaker probe does.
+        """
+        kasa_strip = self._strip
+        if kasa_strip is None:
+            kasa_strip = KasaPowerStrip(host=self.resolver.host(), timeout=8, port=self.port)
+            if self.instrument:
+                kasa_strip._query = self.instrument(kasa_strip._query)
+        try:
+            kasa_strip.connect(verbose=False)
+        except KasaPowerStripError:
+            if not rediscover:
+                raise
+            # The known IP stopped answering - the strip may have been moved by DHCP
+            new_host = self.resolver.rediscover()
+            if not new_host or new_host == kasa_strip.host:
+                raise
+            print(f"INFO: Kasa strip '{self.strip_id}' rediscovered at {new_host} (was {kasa_strip.host})")
+            kasa_strip.set_host(new_host)
+            kasa_strip.connect(verbose=False)
+        self.resolver.learn(kasa_strip.host, kasa_strip.device_info['system']['get_sysinfo'])
+        self._strip = kasa_strip
+        print(f"INFO: Kasa strip '{self.strip_id}' connected successfully ({kasa_strip.host})")
+        return kasa_strip
+
+    def get_strip(self) -> Optional[KasaPowerStrip]:
+        """Connected controller, or None while disabled or the circuit is open."""
+        if self.disabled or not self.breaker.allow():
+            return None
+        if self._strip is not None:
+            return self._strip
+
+        # First connection attempt
+        with self._connect_lock:
+            if self._strip is not None:
+                return self._strip
+            if not self.breaker.allow():
+                return None
+            try:
+                print(f"INFO: Attempting to create new Kasa power strip connection for '{self.strip_id}'...")
+                return self.connect()
+            except Exception as e:
+                print(f"WARNING: Kasa power strip '{self.strip_id}' not available: {e}")
+                self.breaker.trip(e)
+                return None
+
+    def report_failure(self, error=None):
+        """Count a failed operation; repeated failures open the circuit breaker."""
+        self.breaker.record_failure(error)
+
+    def reset(self):
+        """Drop the connection and reset the circuit breaker - forces a fresh connect."""
+        kasa_strip, self._strip = self._strip, None
+        if kasa_strip is not None:
+            kasa_strip.close()
+        self.breaker.reset()
+
+    def _record_state(self, state):
+        # Poller hook for every successful poll: close the failure streak and record energy
+        self.breaker.record_success()
+        self.energy.record(state)
+
+    def status(self) -> Dict:
+        snapshot = self.poller.peek()
+        state = snapshot.state if snapshot is not None else None
+        return {
+            "strip_id": self.strip_id,
+            "available": state is not None,
+            "host": self.resolver.host(),
+            "mac": self.resolver.mac,
+            "outlets": len(state) if state is not None else None,
+            "total_power_w": round(state.total_power_w, 1) if state is not None else 0,
+            "version": snapshot.version if snapshot is not None else 0,
+            "age_seconds": round(snapshot.age, 1) if snapshot is not None else None,
+            "error": snapshot.error if snapshot is not None else None,
+            "circuit": self.breaker.state
+        }
+
+
+class KasaRegistry:
+    """All configured strips, keyed by strip ID, polled concurrently by one thread."""
+
+    def __init__(self, strips: Dict[str, Dict], poll_interval: float = DEFAULT_POLL_SECONDS,
+                 cache: Optional[KasaDiscoveryCache] = None, instrument: Optional[Callable] = None,
+                 on_transition: Optional[Callable] = None, disabled: bool = False):
+        self.poll_interval = poll_interval
+        self.cache = cache or KasaDiscoveryCache()
+        self.devices: Dict[str, KasaDevice] = {}
+        for strip_id, config in strips.items():
+            self.devices[strip_id] = KasaDevice(
+                strip_id, config.get("ip", DEFAULT_KASA_IP), self.cache, mac=config.get("mac"),
+                port=config.get("port", KASA_PORT), poll_interval=poll_interval,
+                instrument=instrument, on_transition=on_transition, disabled=disabled)
+        self.default_id = DEFAULT_STRIP_ID if DEFAULT_STRIP_ID in self.devices else next(iter(self.devices))
+        self.last_cycle_seconds = None
+        self._executor = ThreadPoolExecutor(max_workers=2 * len(self.devices),
+                                            thread_name_prefix="kasa-poll")
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def default(self) -> KasaDevice:
+        return self.devices[self.default_id]
+
+    def get(self, strip_id: Optional[str] = None) -> Optional[KasaDevice]:
+        return self.devices.get(strip_id or self.default_id)
+
+    def ids(self) -> List[str]:
+        return list(self.devices)
+
+    def connect_all(self) -> Dict[str, bool]:
+        """Connect every strip concurrently; returns {strip_id: connected}."""
+        futures = {strip_id: self._executor.submit(device.get_strip)
+                   for strip_id, device in self.devices.items()}
+        return {strip_id: future.result() is not None for strip_id, future in futures.items()}
+
+    def poll_all(self, max_age: Optional[float] = None) -> float:
+        """Refresh every strip's snapshot concurrently; returns the cycle time in seconds."""
+        # Half an interval: a strip a reader just re-polled (after a write) is skipped this cycle
+        max_age = self.poll_interval / 2 if max_age is None else max_age
+        start = time.perf_counter()
+        futures = [self._executor.submit(device.poller.snapshot, max_age)
+                   for device in self.devices.values()]
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"ERROR: Kasa poll: {e}")
+        self.last_cycle_seconds = time.perf_counter() - start
+        return self.last_cycle_seconds
+
+    def start(self):
+        """Start the polling thread (no-op if it is already running)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="kasa-registry", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.poll_all()
+            self._stop.wait(max(0.0, self.poll_interval - (self.last_cycle_seconds or 0.0)))
@@ -0,0 +1,132 @@
+# Compact parsed state of a Kasa HS300 power strip
+# One get_sysinfo response plus one emeter.get_realtime response per outlet are parsed once
+# into parallel per-outlet arrays, so any outlet's state/power or the strip total is an
+# O(1) lookup for as long as the snapshot is in use.
+
+from array import array
+from typing import Dict, List, Optional, Sequence
+
+
+class KasaStripState:
+    """Per-outlet record array for one strip snapshot. Outlet IDs are 0-based.
+
+    Relay states live in a bytearray, power in an int32 array of milliwatts
+    (the HS300 v2 native unit), and the total is summed once at parse time.
+    """
+
+    __slots__ = ("device_id", "alias", "child_ids", "aliases", "relay", "power_mw",
+                 "total_power_mw", "_index")
+
+    def __init__(self, device_id: str, alias: str, child_ids: Sequence[str], aliases: Sequence[str],
+                 relay: bytearray, power_mw: array):
+        self.device_id = device_id
+        self.alias = alias
+        self.child_ids = tuple(child_ids)
+        self.aliases = tuple(aliases)
+        self.relay = relay
+        self.power_mw = power_mw
+        self.total_power_mw = sum(power_mw)
+        self._index = {child_id: i for i, child_id in enumerate(self.child_ids)}
+
+    @classmethod
+    def from_responses(cls, sysinfo: Dict, realtimes: Optional[Sequence[Dict]] = None) -> "KasaStripState":
+        """Parse system.get_sysinfo and the per-outlet emeter.get_realtime results.
+
+        Args:
+            sysinfo: The get_sysinfo result (the dict under ['system']['get_sysinfo'])
+            realtimes: get_realtime results in outlet order, or None for relay state only
+        """
+        device_id = sysinfo.get('deviceId', '')
+        children = sysinfo.get('children', [])
+        count = len(children)
+
+        child_ids = []
+        aliases = []
+        relay = bytearray(count)
+        for i, child in enumerate(children):
+            child_id = child.get('id', '')
+            # Some firmware reports only the 2-digit suffix
+            if device_id and not child_id.startswith(device_id):
+                child_id = device_id + child_id
+            child_ids.append(child_id)
+            aliases.append(clean_alias(child.get('alias', ''), i))
+            relay[i] = 1 if child.get('state', 0) == 1 else 0
+
+        power_mw = array('i', [0]) * count
+        if realtimes is not None:
+            for i, realtime in enumerate(realtimes[:count]):
+                power_mw[i] = realtime_power_mw(realtime)
+
+        return cls(device_id, sysinfo.get('alias', ''), child_ids, aliases, relay, power_mw)
+
+    def __len__(self) -> int:
+        return len(self.relay)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, KasaStripState):
+            return NotImplemented
+        return (self.relay == other.relay and self.power_mw == other.power_mw
+                and self.child_ids == other.child_ids and self.aliases == other.aliases)
+
+    def _check(self, outlet_id: int) -> int:
+        if not 0 <= outlet_id < len(self.relay):
+            raise ValueError(f"Outlet ID must be between 0 and {len(self.relay) - 1}")
+        return outlet_id
+
+    def is_on(self, outlet_id: int) -> bool:
+        return self.relay[self._check(outlet_id)] == 1
+
+    def power_w(self, outlet_id: int) -> float:
+        return self.power_mw[self._check(outlet_id)] / 1000.0
+
+    @property
+    def total_power_w(self) -> float:
+        return self.total_power_mw / 1000.0
+
+    def index_of(self, child_id: str) -> int:
+        """0-based outlet index of a child ID (full ID as used in request contexts)."""
+        return self._index[child_id]
+
+    def with_relays(self, changes: Dict[int, bool]) -> "KasaStripState":
+        """Copy with some relays switched (switched-off outlets read 0 W until the next poll)."""
+        relay = bytearray(self.relay)
+        power_mw = array('i', self.power_mw)
+        for outlet_id, on in changes.items():
+            relay[self._check(outlet_id)] = 1 if on else 0
+            if not on:
+                power_mw[outlet_id] = 0
+        return KasaStripState(self.device_id, self.alias, self.child_ids, self.aliases, relay, power_mw)
+
+    def outlet(self, outlet_id: int, with_power: bool = True) -> Dict:
+        """One outlet in the dict shape returned by KasaPowerStrip.get_all_outlet_status(_with_power)."""
+        self._check(outlet_id)
+        outlet = {
+            'outlet_id': outlet_id,
+            'alias': self.aliases[outlet_id],
+            'is_on': self.relay[outlet_id] == 1,
+            'device_id': self.child_ids[outlet_id]
+        }
+        if with_power:
+            outlet['power_w'] = self.power_mw[outlet_id] / 1000.0
+        return outlet
+
+    def outlets(self, with_power: bool = True) -> List[Dict]:
+        return [self.outlet(i, with_power) for i in range(len(self.relay))]
+
+
+def realtime_power_mw(realtime: Dict) -> int:
+    """Power from an emeter.get_realtime result in milliwatts."""
+    # Hardware v2 reports milliwatts, v1 reports watts
+    if 'power_mw' in realtime:
+        return int(realtime['power_mw'])
+    return int(round(float(realtime.get('power', 0.0)) * 1000))
+
+
+def clean_alias(raw_alias: str, index: int) -> str:
+    """Outlet alias stripped to ASCII, defaulting to 'Outlet N' (1-based)."""
+    # Sanitize alias to remove problematic Unicode characters
+    try:
+        alias = raw_alias.encode('ascii', errors='ignore').decode('ascii').strip()
+    except Exception:
+        alias = ''
+    return alias or f'Outlet {index + 1}'
@@ -0,0 +1,200 @@
+# Readiness of an internet link after its USB port is powered
+# Instead of sleeping a fixed per-connection delay, the link is polled with backoff until usable:
+#   interface - a network interface matching the connection's name patterns exists (/sys/class/net)
+#   carrier   - that interface reports carrier
+#   address   - it has an IPv4 address (DHCP lease)
+#   route     - the default route goes through it (/proc/net/route)
+#   probe     - a connectivity probe succeeds
+# Stages are checked in order and a poll stops at the first one not yet passed. Connections
+# without interface patterns (the device feeds the RV router rather than an interface on this
+# host) only use the probe. The old fixed delay is the upper bound. wait() sleeps between polls;
+# wait_async() awaits instead and runs each poll in the default executor, so a long wait from an
+# async endpoint holds no thread between polls.
+
+import asyncio
+import fcntl
+import os
+import socket
+import struct
+import time
+from typing import Callable, Dict, Iterator, Optional, Sequence
+
+STAGES = ("interface", "carrier", "address", "route", "probe")
+INTERFACE_STAGES = ("interface", "carrier", "address", "route")
+SYS_CLASS_NET = "/sys/class/net"
+PROC_NET_ROUTE = "/proc/net/route"
+SIOCGIFADDR = 0x8915
+FIRST_POLL_INTERVAL = 0.25
+MAX_POLL_INTERVAL = 2.0
+BACKOFF = 1.5
+
+
+def tcp_probe(host: str = "8.8.8.8", port: int = 53, timeout: float = 1.0) -> bool:
+    """True if a TCP connection to host:port opens within timeout."""
+    try:
+        socket.create_connection((host, port), timeout=timeout).close()
+        return True
+    except OSError:
+        return False
+
+
+def _sleep(seconds: float) -> bool:
+    time.sleep(seconds)
+    return True
+
+
+class ReadinessResult:
+    """Outcome of one wait: ready or not, when each stage first passed (seconds after the start)."""
+
+    __slots__ = ("ready", "elapsed", "interface", "stages", "waiting_for", "polls", "cancelled")
+
+    def __init__(self):
+        self.ready = False
+        self.elapsed = 0.0
+        self.interface = None
+        self.stages: Dict[str, float] = {}
+        self.waiting_for = None   # first stage that had not passed at the end
+        self.polls = 0
+        self.cancelled = False
+
+    def as_dict(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "elapsed_seconds": round(self.elapsed, 2),
+            "interface": self.interface,
+            "stages": {stage: round(seconds, 2) for stage, seconds in self.stages.items()},
+            "waiting_for": self.waiting_for,
+            "polls": self.polls,
+            "cancelled": self.cancelled
+        }
+
+    def describe(self) -> str:
+        if self.ready:
+            return f"ready after {self.elapsed:.1f} s"
+        if self.cancelled:
+            return f"wait cancelled after {self.elapsed:.1f} s"
+        return f"not ready after {self.elapsed:.1f} s (waiting for {self.waiting_for})"
+
+
+class LinkReadiness:
+    """Readiness checks for one connection; interface_patterns are substrings of interface names."""
+
+    def __init__(self, interface_patterns: Optional[Sequence[str]] = None,
+                 probe: Callable[[], bool] = tcp_probe,
+                 sys_class_net: str = SYS_CLASS_NET, proc_net_route: str = PROC_NET_ROUTE):
+        self.interface_patterns = tuple(interface_patterns or ())
+        self.probe = probe
+        self.sys_class_net = sys_class_net
+        self.proc_net_route = proc_net_route
+
+    def find_interface(self) -> Optional[str]:
+        try:
+            names = sorted(os.listdir(self.sys_class_net))
+        except OSError:
+            return None
+        for name in names:
+            if name != "lo" and any(pattern in name.lower() for pattern in self.interface_patterns):
+                return name
+        return None
+
+    def has_carrier(self, interface: str) -> bool:
+        try:
+            with open(os.path.join(self.sys_class_net, interface, "carrier"), "r") as f:
+                return f.read().strip() == "1"
+        except OSError:
+            return False  # reading carrier of a down interface fails with EINVAL
+
+    def has_ipv4_address(self, interface: str) -> bool:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            fcntl.ioctl(sock.fileno(), SIOCGIFADDR, struct.pack("256s", interface[:15].encode()))
+            return True
+        except OSError:
+            return False  # EADDRNOTAVAIL: no address assigned yet
+        finally:
+            sock.close()
+
+    def has_default_route(self, interface: str) -> bool:
+        try:
+            with open(self.proc_net_route, "r") as f:
+                next(f, None)  # header
+                for line in f:
+                    fields = line.split()
+                    if len(fields) >= 2 and fields[0] == interface and fields[1] == "00000000":
+                        return True
+        except OSError:
+            pass
+        return False
+
+    def wait(self, upper_bound: float, stages: Optional[Sequence[str]] = None,
+             sleep: Optional[Callable[[float], bool]] = None) -> ReadinessResult:
+        """Poll stages with backoff until all pass or upper_bound seconds have elapsed.
+
+        stages defaults to all that apply (interface stages need interface_patterns).
+        sleep(seconds) does the waiting between polls (time.sleep by default);
+        returning False cancels the wait.
+        """
+        sleep = sleep or _sleep
+        result = ReadinessResult()
+        polls = self._polls(upper_bound, stages, result)
+        for delay in polls:
+            if not sleep(delay):
+                result.cancelled = True
+                polls.close()  # records the elapsed time
+                break
+        return result
+
+    async def wait_async(self, upper_bound: float, stages: Optional[Sequence[str]] = None) -> ReadinessResult:
+        """wait() for async callers: each poll runs in the default executor, the pauses are asyncio.sleep."""
+        result = ReadinessResult()
+        polls = self._polls(upper_bound, stages, result)
+        loop = asyncio.get_running_loop()
+        while True:
+            delay = await loop.run_in_executor(None, next, polls, None)
+            if delay is None:
+                return result
+            await asyncio.sleep(delay)
+
+    def _polls(self, upper_bound: float, stages: Optional[Sequence[str]],
+               result: ReadinessResult) -> Iterator[float]:
+        """Poll into result, yielding the pause before each next poll; ends when ready or out of time."""
+        if stages is None:
+            stages = STAGES if self.interface_patterns else ("probe",)
+        elif not self.interface_patterns:
+            stages = tuple(stage for stage in stages if stage not in INTERFACE_STAGES)
+        start = time.monotonic()
+        interval = FIRST_POLL_INTERVAL
+        while True:
+            result.polls += 1
+            result.waiting_for = self._poll(stages, result, start)
+            result.elapsed = time.monotonic() - start
+            if result.waiting_for is None:
+                result.ready = True
+                return
+            remaining = upper_bound - result.elapsed
+            if remaining <= 0:
+                return
+            try:
+                yield min(interval, remaining)
+            finally:
+                result.elapsed = time.monotonic() - start  # also when the wait is cancelled here
+            interval = min(interval * BACKOFF, MAX_POLL_INTERVAL)
+
+    def _poll(self, stages: Sequence[str], result: ReadinessResult, start: float) -> Optional[str]:
+        """Check stages in order; the first one not passed (None if all passed)."""
+        for stage in stages:
+            if stage == "interface":
+                result.interface = self.find_interface()
+                passed = result.interface is not None
+            elif stage == "carrier":
+                passed = self.has_carrier(result.interface)
+            elif stage == "address":
+                passed = self.has_ipv4_address(result.interface)
+            elif stage == "route":
+                passed = self.has_default_route(result.interface)
+            else:
+                passed = self.probe()
+            if not passed:
+                return stage
+            result.stages.setdefault(stage, time.monotonic() - start)
+        return None
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Minimal Prometheus-style metrics for the RV Security server.
+
+Counters, gauges and histograms are kept in plain dicts keyed by label
+values and rendered on demand in the Prometheus text exposition format
+(version 0.0.4), so there is no extra dependency and the per-request cost
+is a few dict updates under a lock.
+
+MetricsMiddleware records per-route request counts, status codes, in-flight
+requests and latency. time_hardware()/instrument_hardware() record the
+duration of calls to external devices (kasa, serial, synology, ping), and
+record_circuit_transition() exports circuit breaker states.
+
+In multi-worker mode the hardware metrics (hardware calls, circuit breakers,
+link readiness) are recorded only in the hardware owner process, while each
+worker records the HTTP metrics of the requests it serves, relayed ones
+included. A worker's /metrics renders its own registry and takes the
+OWNER_METRICS families from the owner's output (merge_owner_metrics).
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+from starlette.routing import Match
+
+# Request latency buckets (seconds); internet switching can legitimately take 30+ s
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Hardware call buckets (seconds); serial commands are tens of ms, kasa/synology seconds
+HARDWARE_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0)
+# Internet link time-to-ready after power-on (the old fixed delays went up to 20 s)
+LINK_READY_BUCKETS = (0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 10.0, 15.0, 20.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple, object] = {}
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    metric_type = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, *labels, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # [per-bucket counts (non-cumulative) + overflow, sum, count]
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            items = [(labels, (list(state[0]), state[1], state[2])) for labels, state in self._values.items()]
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_str} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self, exclude: Sequence[str] = ()) -> str:
+        lines = []
+        for metric in self._metrics:
+            if metric.name not in exclude:
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+http_requests_total = REGISTRY.register(Counter(
+    "rv_http_requests_total", "HTTP requests by method, route and status code.",
+    ("method", "route", "status")))
+http_requests_in_flight = REGISTRY.register(Gauge(
+    "rv_http_requests_in_flight", "HTTP requests currently being served, by route.", ("route",)))
+http_request_duration_seconds = REGISTRY.register(Histogram(
+    "rv_http_request_duration_seconds", "HTTP request latency by method and route.",
+    ("method", "route"), LATENCY_BUCKETS))
+hardware_call_duration_seconds = REGISTRY.register(Histogram(
+    "rv_hardware_call_duration_seconds", "Duration of calls to external hardware by device.",
+    ("device",), HARDWARE_BUCKETS))
+hardware_call_last_seconds = REGISTRY.register(Gauge(
+    "rv_hardware_call_last_seconds", "Duration of the most recent call to external hardware by device.",
+    ("device",)))
+hardware_call_errors_total = REGISTRY.register(Counter(
+    "rv_hardware_call_errors_total", "Failed calls to external hardware by device.", ("device",)))
+
+circuit_state = REGISTRY.register(Gauge(
+    "rv_circuit_state", "Circuit breaker state per device (0 closed, 1 half-open, 2 open).", ("device",)))
+circuit_transitions_total = REGISTRY.register(Counter(
+    "rv_circuit_transitions_total", "Circuit breaker state transitions per device.", ("device", "from", "to")))
+
+CIRCUIT_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+link_ready_seconds = REGISTRY.register(Histogram(
+    "rv_link_ready_seconds", "Time until a powered internet link was usable (or the wait ended), "
+    "by connection type, phase (init / settle) and outcome (ready / timeout / cancelled).",
+    ("connection_type", "phase", "outcome"), LINK_READY_BUCKETS))
+
+
+# Families only the hardware owner process records
+OWNER_METRICS = (hardware_call_duration_seconds.name, hardware_call_last_seconds.name,
+                 hardware_call_errors_total.name, circuit_state.name, circuit_transitions_total.name,
+                 link_ready_seconds.name)
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
+
+
+def select_families(text: str, names: Sequence[str]) -> List[str]:
+    """Lines of the metric families named in names from rendered exposition text."""
+    lines = []
+    keep = False
+    for line in text.splitlines():
+        if line.startswith("# HELP "):
+            keep = line.split(" ", 3)[2] in names
+        if keep and line:
+            lines.append(line)
+    return lines
+
+
+def merge_owner_metrics(owner_text: str) -> str:
+    """This process's metrics with the OWNER_METRICS families taken from the owner's output."""
+    lines = select_families(owner_text, OWNER_METRICS)
+    return REGISTRY.render(exclude=OWNER_METRICS) + ("\n".join(lines) + "\n" if lines else "")
+
+
+@contextmanager
+def time_hardware(device: str):
+    """Record the duration (and failure) of a hardware call, e.g. with time_hardware("kasa"):"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        hardware_call_errors_total.inc(device)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        hardware_call_duration_seconds.observe(device, value=elapsed)
+        hardware_call_last_seconds.set(device, value=elapsed)
+
+
+def instrument_hardware(device: str, func):
+    """Wrap a callable so every call is timed as a hardware call for device."""
+    def wrapper(*args, **kwargs):
+        with time_hardware(device):
+            return func(*args, **kwargs)
+    wrapper.__wrapped__ = func
+    return wrapper
+
+
+def record_circuit_transition(device: str, old_state: str, new_state: str):
+    """CircuitBreaker on_transition hook: export the state and count the transition."""
+    circuit_state.set(device, value=CIRCUIT_STATE_VALUES.get(new_state, -1))
+    circuit_transitions_total.inc(device, old_state, new_state)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route request metrics.
+
+    Routes are labelled by their path template (e.g. /api/kasa/power/{outlet_id})
+    so label cardinality stays bounded; unmatched paths (static files) are "other".
+    """
+
+    MAX_CACHED_PATHS = 1024
+
+    def __init__(self, app, router=None):
+        self.app = app
+        self.router = router
+        self._route_cache: Dict[Tuple[str, str], str] = {}
+
+    def _route_template(self, scope) -> str:
+        key = (scope["method"], scope["path"])
+        template = self._route_cache.get(key)
+        if template is not None:
+            return template
+
+        template = "other"
+        if self.router is not None:
+            for route in self.router.routes:
+                match, _ = route.matches(scope)
+                if match == Match.FULL and hasattr(route, "methods"):
+                    template = route.path
+                    break
+        if len(self._route_cache) < self.MAX_CACHED_PATHS:
+            self._route_cache[key] = template
+        return template
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self._route_template(scope)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc(route)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_requests_in_flight.dec(route)
+            http_requests_total.inc(method, route, str(status[0]))
+            http_request_duration_seconds.observe(method, route, value=elapsed)
@@ -1,52 +1,72 @@
 #!/usr/bin/env python3
+# Startup note: keep module-level imports light. rvglue/paho (MQTT), pyserial (usbhub_ascii),
+# the alarm GPIO module and usb_modem_manager are imported where they are used, and
+# hardware discovery runs in background threads so uvicorn can bind the port immediately.
 import threading
+import multiprocessing
 import uvicorn
 import os
 import subprocess
-import tempfile
 import sys
 import time
 import socket
-import requests
 import json
-import shutil
 import signal
 import atexit
-import logging
 # Initialize alarm-related global variables
 alarm_mqtt_available = False
+ALARM_AVAILABLE = False
+alarm = None  # rv/alarm module, loaded by load_alarm_module() during background discovery
 
 # Global debug setting
 DEBUG_MODE = os.getenv('SERVER_DEBUG', '').lower() in ('true', '1', 'yes')  # Enable with SERVER_DEBUG=true
 
-# Import alarm system from the rv/alarm directory (optional)
-try:
-    sys.path.append('/home/tblank/code/tblank1024/rv/alarm')
-    import alarm
-    ALARM_AVAILABLE = True
-    print("Alarm system module loaded successfully")
-except ImportError as e:
-    print(f"Alarm system not available: {e}")
-    print("Web alarm buttons will work for state tracking only")
-    ALARM_AVAILABLE = False
-    alarm = None
-    # Check if we should use MQTT for alarm communication
-    alarm_mqtt_available = True
-    print("Will attempt MQTT communication with alarm container")
-from rvglue import MQTTClient
-import rvglue
-from typing import Annotated
-from kasa_power_strip import KasaPowerStrip, KasaPowerStripError
-from usb_modem_manager import usb_modem_manager
-
-from fastapi import FastAPI, Body
-from pydantic import BaseModel
+def load_alarm_module():
+    """Import the alarm system from the rv/alarm directory (optional)."""
+    global alarm, ALARM_AVAILABLE, alarm_mqtt_available
+    try:
+        sys.path.append('/home/tblank/code/tblank1024/rv/alarm')
+        import alarm as alarm_module
+        alarm = alarm_module
+        ALARM_AVAILABLE = True
+        print("Alarm system module loaded successfully")
+    except ImportError as e:
+        print(f"Alarm system not available: {e}")
+        print("Web alarm buttons will work for state tracking only")
+        ALARM_AVAILABLE = False
+        alarm = None
+        # Check if we should use MQTT for alarm communication
+        alarm_mqtt_available = True
+        print("Will attempt MQTT communication with alarm container")
+    return ALARM_AVAILABLE
+
+from typing import Annotated, Any, List, Optional
+import asyncio
+import inspect
+from urllib.parse import quote
+from kasa_power_strip import KasaPowerStripError  # stdlib-only wrapper, cheap to import
+from kasa_poller import STRIP_UNAVAILABLE
+from kasa_discovery import KasaDiscoveryCache, DEFAULT_CACHE_FILE as DEFAULT_KASA_CACHE_FILE
+from kasa_registry import KasaRegistry, strip_config_from_constants
+from internet_jobs import InternetJobRunner
+from usb_hub_trace import FrameTrace
+from usb_hub_resolver import UsbHubResolver
+from usb_hub_session import UsbHubSession, UsbHubClient, AsyncUsbHubClient, OpenHub, DEFAULT_PORTS as DEFAULT_USB_HUB_PORTS  # pyserial itself is imported on first hub open
+
+from fastapi import FastAPI, Body, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, BaseConfig, Extra, ValidationError, create_model
 from starlette.staticfiles import StaticFiles
-from starlette.responses import Response
+from starlette.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-import random
-from server_calcs import *
-from server_calcs import constants
+from app_constants import constants
+from metrics import MetricsMiddleware, render_metrics, merge_owner_metrics, time_hardware, instrument_hardware, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from metrics import record_circuit_transition, circuit_state, link_ready_seconds
+from link_readiness import LinkReadiness
+from connectivity_probe import race_probes
+from hardware_proxy import HardwareProxyMiddleware, fetch_owner, fetch_owner_json
+from telemetry import (TelemetryReader, LocalTelemetrySource, SerializedPageCache, run_ingester,
+                       DEFAULT_SHM_NAME)
 
 
 
@@ -72,6 +92,39 @@ app.add_middleware(
 async def index():
     return Response(index_content)
 
+# Multi-worker mode: SERVER_WORKERS > 1 runs N uvicorn worker processes. One ingester
+# process owns MQTT and the calc tick and publishes telemetry into shared memory.
+# The master process owns the hardware (USB hub, Kasa, internet switch jobs, alarm) and
+# serves this app on a loopback socket; workers relay hardware endpoints to it.
+SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', '1'))
+HARDWARE_OWNER_ADDR = os.getenv('HARDWARE_OWNER_ADDR')  # "host:port", set by the master for its workers
+app.add_middleware(HardwareProxyMiddleware, owner=HARDWARE_OWNER_ADDR)
+# Per-route request counts, status codes, in-flight gauges and latency histograms (see /metrics).
+# Added after the proxy so it is the outer middleware and relayed hardware requests are counted too.
+app.add_middleware(MetricsMiddleware, router=app.router)
+telemetry_reader = None  # Set in worker processes that read the shared telemetry segment
+local_telemetry = LocalTelemetrySource()  # Single-process calc tick (also the worker fallback)
+page_cache = SerializedPageCache()  # Pre-serialized /data/* bodies keyed by snapshot version
+
+def current_telemetry_source():
+    """Shared memory snapshots once the ingester has completed a publish, else the local calc tick."""
+    if telemetry_reader is not None and telemetry_reader.published():
+        return telemetry_reader
+    return local_telemetry
+
+@app.on_event("startup")
+def attach_telemetry_reader():
+    """Attach to the ingester's shared memory segment when running as a worker."""
+    global telemetry_reader
+    shm_name = os.getenv('TELEMETRY_SHM_NAME')
+    if not shm_name or telemetry_reader is not None:
+        return
+    try:
+        telemetry_reader = TelemetryReader(shm_name)
+        print(f"Worker {os.getpid()} attached to telemetry segment '{shm_name}'")
+    except FileNotFoundError:
+        print(f"WARNING: Telemetry segment '{shm_name}' not found - computing page data locally")
+
 bike_alarm_state = False
 interior_alarm_state = False
 
@@ -97,7 +150,8 @@ def execute_scheduled_shutdown():
         server_dir = os.path.dirname(os.path.abspath(__file__))
         password_file = os.path.join(server_dir, 'synology-password.json')
         cmd = ['python', 'synology_nas_controller.py', '--power-off', '--force', '--config', password_file]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=15, cwd=server_dir)
+        with time_hardware("synology"):
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=15, cwd=server_dir)
         
         if result.returncode == 0:
             print("Scheduled shutdown completed successfully")
@@ -131,6 +185,9 @@ def initialize_alarm_system():
     """Initialize the alarm system with error handling"""
     global alarm_system, alarm_thread, alarm_thread_stop_event, alarm_mqtt_available
     
+    if alarm is None and not alarm_mqtt_available:
+        load_alarm_module()
+    
     # First check if we have direct alarm module access
     if ALARM_AVAILABLE and alarm is not None:
         try:
@@ -436,7 +493,7 @@ async def alarm_endpoint(data: Annotated[AlarmPostData, Body()]) -> dict:
     return {"status": "ok", "alarm": data.alarm, "state": data.state}
 
 @app.get("/api/alarmget")
-async def alarms() -> dict:
+def alarms() -> dict:  # Removed async: the MQTT status round trip blocks for up to 2 s
     global bike_alarm_state, interior_alarm_state, alarm_system
     
     result = {
@@ -603,6 +660,38 @@ def get_connection_settle_delay(connection_type):
     """Get the settling delay for a specific connection type."""
     return CONNECTION_SETTLE_DELAYS.get(connection_type, USB_HUB_PORT_DELAY_CONNECTION_SETTLE)
 
+# The delays above are upper bounds: after power-on the link is polled (link_readiness.py) and the
+# wait ends as soon as it is usable. Connection types with network interface name patterns here
+# must also show that interface with carrier, an IPv4 address and the default route; the others
+# (devices behind the RV router) are ready on the first successful connectivity probe.
+CONNECTION_INTERFACES = {
+    'cellular': ["wwan", "ppp", "usb", "eth2"],      # same patterns as usb_modem_manager
+    'cellular-amp': ["wwan", "ppp", "usb", "eth2"]
+}
+last_link_readiness = {}  # "<connection type>/<phase>" -> last measured readiness, for /api/internet/readiness
+LINK_PROBE_TIMEOUT = 1.0  # seconds per readiness probe race; polling retries with backoff
+
+def wait_for_link_ready(connection_type, upper_bound, phase, stages=None, sleep=None):
+    """Wait until the connection's link is usable, at most upper_bound seconds; records time-to-ready."""
+    readiness = LinkReadiness(CONNECTION_INTERFACES.get(connection_type), probe=link_probe)
+    result = readiness.wait(upper_bound, stages=stages, sleep=sleep)
+    return record_link_readiness(connection_type, upper_bound, phase, result)
+
+async def wait_for_link_ready_async(connection_type, upper_bound, phase, probe=None):
+    """wait_for_link_ready() for async endpoints: no thread is held between polls."""
+    readiness = LinkReadiness(CONNECTION_INTERFACES.get(connection_type), probe=probe or link_probe)
+    result = await readiness.wait_async(upper_bound)
+    return record_link_readiness(connection_type, upper_bound, phase, result)
+
+def record_link_readiness(connection_type, upper_bound, phase, result):
+    """Keep a readiness result for /api/internet/readiness and the link_ready_seconds metric."""
+    outcome = "ready" if result.ready else ("cancelled" if result.cancelled else "timeout")
+    link_ready_seconds.observe(connection_type, phase, outcome, value=result.elapsed)
+    last_link_readiness[f"{connection_type}/{phase}"] = dict(result.as_dict(), upper_bound_seconds=upper_bound,
+                                                             measured_at=time.strftime("%Y-%m-%d %H:%M:%S"))
+    print(f"INFO: {connection_type} link {result.describe()} ({phase}, upper bound {upper_bound} s)")
+    return result
+
 def detect_current_internet_connection():
     """
     Detect the current internet connection state by querying the USB hub.
@@ -662,115 +751,100 @@ class InternetPowerData(BaseModel):
 
 class InternetTestData(BaseModel):
     connection_type: str  # 'cellular', 'wifi', 'starlink', 'wired'
+    max_wait: Optional[float] = None  # seconds to wait for the link; default: the connection's settle delay
 
 class InternetResponse(BaseModel):
     success: bool
     message: str
     port: int = None
     connected: bool = None
+    job_id: str = None  # internet switch job (see /api/internet/jobs/{job_id})
+
+# Kasa strips: one KasaDevice per configured strip (constants KASA_STRIPS, or the single KASA_IP
+# strip "main"), each with a persistent connection behind its own circuit breaker, a MAC -> IP
+# discovery binding, a cached-state poller and energy history. While a strip is down callers get
+# None immediately and a single background probe reconnects with exponential backoff.
+# The registry thread polls all strips concurrently: all Kasa reads come from the cached
+# strip states, writes update them optimistically and re-poll.
+KASA_POLL_INTERVAL = float(os.getenv('KASA_POLL_INTERVAL', '5'))  # seconds between full-state polls
+kasa_registry = KasaRegistry(
+    strip_config_from_constants(constants, default_mac=os.getenv('KASA_MAC')),
+    poll_interval=KASA_POLL_INTERVAL,
+    cache=KasaDiscoveryCache(os.getenv('KASA_DISCOVERY_CACHE', DEFAULT_KASA_CACHE_FILE),
+                             target=os.getenv('KASA_DISCOVERY_TARGET', '255.255.255.255')),
+    instrument=lambda query: instrument_hardware("kasa", query),
+    on_transition=record_circuit_transition,
+    disabled=os.getenv('DISABLE_KASA', '').lower() in ('true', '1', 'yes')
+)
+for _device in kasa_registry.devices.values():
+    circuit_state.set(_device.breaker.name, value=0)
+
+# The default strip ("main") serves the unqualified endpoints and the internet power control
+kasa_device = kasa_registry.default
+kasa_poller = kasa_device.poller
 
-# Global Kasa connection cache to prevent repeated discovery
-_kasa_strip_cache = None
-_kasa_cache_time = 0
-_kasa_cache_duration = 300  # Cache for 5 minutes
-_kasa_last_failure_time = 0
-_kasa_failure_cache_duration = 15  # Reduced to 15 seconds for faster recovery when device comes back online
+def unknown_kasa_strip(strip_id: str) -> str:
+    return f"Unknown Kasa strip '{strip_id}' (configured: {', '.join(kasa_registry.ids())})"
 
 def get_kasa_power_strip():
-    """Get Kasa Power Strip Controller instance. Returns None if not available."""
-    import os
-    import time
-    
-    global _kasa_strip_cache, _kasa_cache_time, _kasa_last_failure_time
-    
-    # Check if Kasa is disabled via environment variable
-    if os.getenv('DISABLE_KASA', '').lower() in ('true', '1', 'yes'):
+    """Get the default Kasa Power Strip Controller instance. Returns None if not available."""
+    if kasa_device.disabled:
         print("INFO: Kasa power strip disabled via DISABLE_KASA environment variable")
         return None
-    
-    current_time = time.time()
-    
-    # Check if we recently had a failure and should avoid retrying
-    if (_kasa_last_failure_time > 0 and 
-        (current_time - _kasa_last_failure_time) < _kasa_failure_cache_duration):
-        # Recent failure, don't retry yet
-        return None
-    
-    # Check cache validity for successful connections
-    if (_kasa_strip_cache is not None and 
-        (current_time - _kasa_cache_time) < _kasa_cache_duration):
-        # Cache is still valid, return cached instance
-        return _kasa_strip_cache
-    
-    # Cache is invalid or doesn't exist, try to create new connection
-    try:
-        print("INFO: Attempting to create new Kasa power strip connection...")
-        
-        # Get Kasa host from constants
-        kasa_host = constants.get("KASA_IP", "10.0.0.188")
-        
-        # Try to create and connect to Kasa power strip with balanced timeout
-        kasa_strip = KasaPowerStrip(host=kasa_host, timeout=8)  # Use host from constants
-        if kasa_strip.connect():
-            print("INFO: Kasa power strip connected successfully")
-            _kasa_strip_cache = kasa_strip
-            _kasa_cache_time = current_time
-            _kasa_last_failure_time = 0  # Reset failure time on success
-            return kasa_strip
-        else:
-            print("WARNING: No Kasa power strip found or connection failed")
-            print("INFO: Set DISABLE_KASA=true environment variable to disable Kasa functionality")
-            # Cache the failure to avoid immediate retries
-            _kasa_strip_cache = None
-            _kasa_last_failure_time = current_time
-            return None
-    except Exception as e:
-        print(f"WARNING: Kasa power strip controller not available: {e}")
-        print("INFO: Set DISABLE_KASA=true environment variable to disable Kasa functionality")
-        # Cache the failure to avoid immediate retries
-        _kasa_strip_cache = None
-        _kasa_last_failure_time = current_time
-        return None
+    return kasa_device.get_strip()
+
+def report_kasa_failure(error=None):
+    """Count a failed Kasa operation; repeated failures open the circuit breaker."""
+    kasa_device.report_failure(error)
 
 def clear_kasa_cache():
-    """Clear the Kasa connection cache - useful for testing or after errors."""
-    global _kasa_strip_cache, _kasa_cache_time
-    _kasa_strip_cache = None
-    _kasa_cache_time = 0
+    """Drop every Kasa connection and reset the circuit breakers - forces a fresh connect."""
+    for device in kasa_registry.devices.values():
+        device.reset()
     print("INFO: Kasa connection cache cleared")
 
+# USB hub: one serial session for the life of the process (opened on first use, health-checked
+# before every command and reopened after a SerialException or an unplug). Only the session's
+# worker thread touches the port; request threads queue commands through usb_hub_client.
+# Port state is cached: one status query covers all four ports and writes update it write-through.
+# The hub's tty is found by USB vendor/product/serial in sysfs (USB_HUB_VID / USB_HUB_PID /
+# USB_HUB_SERIAL, defaults from constants: the CoolGear hub's FTDI 0403/6001) and cached until the
+# node disappears. With no IDs configured any USB serial device except a cellular modem matches. USB_HUB_PORT (comma separated) names the ports explicitly instead, e.g. the
+# pty printed by usbhub_fake_coolgear.py to run without hardware.
+USB_HUB_PORTS = [port.strip() for port in os.getenv('USB_HUB_PORT', '').split(',') if port.strip()]
+USB_HUB_VID = os.getenv('USB_HUB_VID', constants.get('USB_HUB_VID'))
+USB_HUB_PID = os.getenv('USB_HUB_PID', constants.get('USB_HUB_PID'))
+usb_hub_resolver = None if USB_HUB_PORTS else UsbHubResolver(vendor_id=USB_HUB_VID,
+                                                              product_id=USB_HUB_PID,
+                                                              serial=os.getenv('USB_HUB_SERIAL'),
+                                                              fallback=DEFAULT_USB_HUB_PORTS)
+if usb_hub_resolver is not None and not USB_HUB_VID and not USB_HUB_PID:
+    print("WARNING: USB_HUB_VID / USB_HUB_PID not configured - the first USB serial device that is not "
+          "a cellular modem will be opened as the USB hub")
+# Raw TX/RX frames go to a binary ring buffer (/api/debug/usb/trace); USB_HUB_TRACE=1 also prints them.
+usb_hub_trace = FrameTrace(capacity=int(os.getenv('USB_HUB_TRACE_FRAMES', '256')),
+                           echo=os.getenv('USB_HUB_TRACE', '0') == '1')
+usb_hub_session = UsbHubSession(ports=USB_HUB_PORTS, resolver=usb_hub_resolver, trace=usb_hub_trace,
+                                instrument=lambda execute: instrument_hardware("serial", execute),
+                                state_ttl=float(os.getenv('USB_HUB_STATE_TTL', '30')))  # seconds a port state read is reused
+usb_hub_client = UsbHubClient(usb_hub_session)
+usb_hub_async = AsyncUsbHubClient(usb_hub_session)  # for async endpoints: awaiting holds no threadpool thread
+
 def get_usb_hub_controller():
-    """Get USB Hub Controller instance. Returns None if not available."""
+    """Get the shared USB Hub Controller (a queueing front end). Returns None if not available."""
     try:
-        # Import the ASCII USB hub controller from the local directory
-        import sys
-        import os
-        
-        # Use the local usbhub_ascii.py module
-        local_path = os.path.dirname(os.path.abspath(__file__))
-        parent_path = os.path.dirname(local_path)  # Go up one directory to RVSecurity root
-        if parent_path not in sys.path:
-            sys.path.append(parent_path)
-        
-        from usbhub_ascii import CoolGearUSBHub
-        
-        # Try common USB device paths
-        possible_ports = ['/dev/ttyUSB0', '/dev/ttyUSB1', '/dev/ttyACM0', '/dev/ttyACM1']
-        
-        for port in possible_ports:
-            if os.path.exists(port):
-                try:
-                    hub = CoolGearUSBHub(port)
-                    if hub.ser and hub.ser.is_open:
-                        print(f"Successfully connected to USB hub on {port}")
-                        return hub
-                except Exception as e:
-                    print(f"Failed to connect to USB hub on {port}: {e}")
-                    continue
-        
-        print("No USB hub found on any of the standard ports")
+        return usb_hub_client if usb_hub_session.execute(OpenHub()) else None
+    except ImportError as e:
+        print(f"USB hub controller not available: {e}")
         return None
-        
+    except Exception as e:
+        print(f"Error initializing USB hub: {e}")
+        return None
+
+async def get_usb_hub_controller_async():
+    """Awaitable get_usb_hub_controller(): the async hub client, or None if not available."""
+    try:
+        return usb_hub_async if await usb_hub_async.open() else None
     except ImportError as e:
         print(f"USB hub controller not available: {e}")
         return None
@@ -779,104 +853,89 @@ def get_usb_hub_controller():
         return None
 
 def test_internet_connectivity(connection_type="generic", timeout=5):
-    """Test internet connectivity using multiple methods for Docker compatibility."""
-    test_results = {
-        'connected': False,
-        'message': 'Testing...'
+    """Test internet connectivity: ICMP, TCP:53, TCP:443 and HTTP probes to several targets race
+    on native sockets (connectivity_probe.py); the first success wins and a dead link is reported
+    after one timeout window."""
+    result = race_probes(timeout=timeout)
+    if result.connected:
+        message = f'Internet connectivity verified via {connection_type} ({result.describe()})'
+    else:
+        message = f'No internet connectivity detected via {connection_type} ({result.describe()})'
+    return {
+        'connected': result.connected,
+        'message': message,
+        'probe': result.as_dict()
     }
+
+def link_probe():
+    """Readiness probe for link_readiness: one short probe race."""
+    return race_probes(timeout=LINK_PROBE_TIMEOUT).connected
+
+def kasa_outlet_power(device, outlet_id: int) -> dict:
+    """Power of one outlet (1-based) of a strip, from its poller's cached state."""
+    snapshot = device.poller.snapshot()
+    if not snapshot.available:
+        return {"success": False, "power": 0, "message": snapshot.error or "Kasa power strip not available"}
     
-    # Method 1: Try ping command (works on host, may fail in Docker)
-    try:
-        result = subprocess.run(
-            ['ping', '-c', '1', '-W', str(timeout), '8.8.8.8'],
-            capture_output=True,
-            text=True,
-            timeout=timeout + 2
-        )
-        
-        if result.returncode == 0:
-            test_results['connected'] = True
-            test_results['message'] = f'Internet connectivity verified via {connection_type} (ping)'
-            return test_results
-        else:
-            # Ping failed, but don't return yet - try other methods
-            ping_error = result.stderr.strip() if result.stderr else "ping failed"
-            
-    except subprocess.TimeoutExpired:
-        ping_error = "ping timed out"
-    except Exception as e:
-        ping_error = f"ping error: {str(e)}"
-    
-    # Method 2: Try curl as fallback (better for Docker)
-    try:
-        result = subprocess.run(
-            ['curl', '--connect-timeout', str(timeout), '--max-time', str(timeout), 
-             '-s', '-o', '/dev/null', '-w', '%{http_code}', 'http://8.8.8.8'],
-            capture_output=True,
-            text=True,
-            timeout=timeout + 2
-        )
-        
-        if result.returncode == 0:
-            # Any HTTP response (even error codes) indicates connectivity
-            test_results['connected'] = True
-            test_results['message'] = f'Internet connectivity verified via {connection_type} (http)'
-            return test_results
-        else:
-            curl_error = result.stderr.strip() if result.stderr else "http test failed"
-            
-    except subprocess.TimeoutExpired:
-        curl_error = "http test timed out"
-    except Exception as e:
-        curl_error = f"http test error: {str(e)}"
-    
-    # Method 3: Try Python socket connection as final fallback
-    try:
-        import socket
-        sock = socket.create_connection(("8.8.8.8", 53), timeout=timeout)
-        sock.close()
-        test_results['connected'] = True
-        test_results['message'] = f'Internet connectivity verified via {connection_type} (socket)'
-        return test_results
-    except Exception as socket_error:
-        socket_error_msg = str(socket_error)
-    
-    # All methods failed
-    test_results['connected'] = False
-    test_results['message'] = f'No internet connectivity detected via {connection_type} (ping: {ping_error}, http: {curl_error}, socket: {socket_error_msg})'
+    # Convert to 0-based indexing for the Kasa controller
+    state = snapshot.state
+    if not 0 <= outlet_id - 1 < len(state):
+        return {"success": False, "power": 0, "message": f"Could not find power data for outlet {outlet_id - 1}"}
     
-    return test_results
+    power_watts = state.power_w(outlet_id - 1)
+    return {
+        "success": True, 
+        "power": round(power_watts, 1),
+        "message": f"Power reading from Kasa port {outlet_id}: {power_watts}W"
+    }
 
 @app.get("/api/kasa/power/{outlet_id}")
 def get_kasa_power(outlet_id: int) -> dict:  # Removed async
-    """Get power consumption from a specific Kasa outlet using simple blocking calls."""
-    try:
-        kasa_strip = get_kasa_power_strip()
-        if not kasa_strip:
-            return {"success": False, "power": 0, "message": "Kasa power strip not available"}
-        
-        # Convert to 0-based indexing for the Kasa controller
-        power_data = kasa_strip.get_power_consumption(outlet_id - 1)
-        
-        # Check if there was an error in the power data
-        if 'error' in power_data:
-            print(f"Kasa power reading error for port {outlet_id}: {power_data['error']}")
-            clear_kasa_cache()  # Clear cache on error
-            return {"success": False, "power": 0, "message": power_data['error']}
-        
-        # Extract power value in watts
-        power_watts = power_data.get('power_w', 0)
-        
-        return {
-            "success": True, 
-            "power": round(power_watts, 1),
-            "message": f"Power reading from Kasa port {outlet_id}: {power_watts}W"
-        }
-            
-    except Exception as e:
-        print(f"ERROR: Failed to get Kasa power for outlet {outlet_id}: {e}")
-        clear_kasa_cache()  # Clear cache on error
-        return {"success": False, "power": 0, "message": f"Kasa error: {str(e)}"}
+    """Get power consumption of a specific outlet of the default Kasa strip."""
+    return kasa_outlet_power(kasa_device, outlet_id)
+
+@app.get("/api/kasa/power/{strip_id}/{outlet_id}")
+def get_kasa_strip_power(strip_id: str, outlet_id: int) -> dict:
+    """Get power consumption of outlet outlet_id of Kasa strip strip_id."""
+    device = kasa_registry.get(strip_id)
+    if device is None:
+        return {"success": False, "power": 0, "message": unknown_kasa_strip(strip_id)}
+    return kasa_outlet_power(device, outlet_id)
+
+@app.get("/api/kasa/strips")
+def get_kasa_strips() -> dict:
+    """Configured Kasa strips with their cached state summary and the last concurrent poll cycle time."""
+    cycle = kasa_registry.last_cycle_seconds
+    return {
+        "success": True,
+        "default": kasa_registry.default_id,
+        "poll_interval_seconds": KASA_POLL_INTERVAL,
+        "last_cycle_ms": round(cycle * 1000, 1) if cycle is not None else None,
+        "strips": [device.status() for device in kasa_registry.devices.values()]
+    }
+
+@app.get("/api/kasa/energy")
+def get_kasa_energy(outlet: Optional[int] = None, hours: int = 24, days: int = 7, samples: int = 0,
+                    strip: Optional[str] = None) -> dict:
+    """Power history and energy use (Wh per hour/day) per Kasa outlet, from the background poller.
+    
+    strip selects the strip (default "main"); outlet selects one outlet (1-based, default all);
+    samples > 0 includes the last N raw power samples.
+    """
+    device = kasa_registry.get(strip)
+    if device is None:
+        return {"success": False, "message": unknown_kasa_strip(strip), "outlets": {}}
+    outlet_ids = None if outlet is None else [outlet - 1]  # Convert to 0-based
+    report = device.energy.report(hours=hours, days=days, samples=samples, outlet_ids=outlet_ids)
+    return {
+        "success": bool(report),
+        "message": "Kasa energy history" if report else "No Kasa power samples recorded yet",
+        "strip": device.strip_id,
+        "poll_interval_seconds": KASA_POLL_INTERVAL,
+        "recording_since": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(device.energy.started_at)),
+        # Report with the same 1-based outlet numbers as the other Kasa endpoints
+        "outlets": {outlet_id + 1: entry for outlet_id, entry in report.items()}
+    }
 
 @app.get("/api/internet/status")
 def get_internet_status() -> dict:  # Removed async
@@ -900,50 +959,50 @@ def get_internet_status() -> dict:  # Removed async
             "message": f"Error detecting connection: {str(e)}"
         }
 
-@app.post("/api/internet/power")
-def internet_power_control(data: Annotated[InternetPowerData, Body()]) -> InternetResponse:  # Removed async
-    """Control USB hub ports and Kasa power strip for internet connections."""
-    try:
+def run_internet_switch(job) -> dict:
+    """Switch the USB hub port and Kasa outlets for job.request (an InternetPowerData dict).
+
+    Runs on the internet job worker; each stage is recorded as a job step and the
+    initialization delay ends early if a newer switch supersedes this one.
+    """
+    data = InternetPowerData(**job.request)
+    with internet_jobs.step(job, "hub_open", "Opening USB hub") as step:
         hub = get_usb_hub_controller()
         if not hub:
-            return InternetResponse(
-                success=False,
-                message="USB hub controller not available. Check USB hub connection.",
-                port=data.port
-            )
-        
-        # Handle mutual exclusion logic for Kasa power control
-        kasa_success = True
-        kasa_message = ""
-        kasa_strip = None
-        
-        # Get Kasa strip if we need to do any Kasa operations
-        try:
-            kasa_strip = get_kasa_power_strip()
-        except Exception as e:
-            print(f"WARNING: Failed to get Kasa power strip: {e}")
-        
-        # Simple Kasa power control logic based on connection_type
-        if kasa_strip:
+            step.update(status="failed", message="USB hub controller not available")
+            return {"success": False, "message": "USB hub controller not available. Check USB hub connection.",
+                    "port": data.port}
+    
+    # Handle mutual exclusion logic for Kasa power control
+    kasa_success = True
+    kasa_message = ""
+    kasa_strip = None
+    
+    # Get Kasa strip if we need to do any Kasa operations
+    try:
+        kasa_strip = get_kasa_power_strip()
+    except Exception as e:
+        print(f"WARNING: Failed to get Kasa power strip: {e}")
+    
+    # Simple Kasa power control logic based on connection_type
+    if kasa_strip:
+        with internet_jobs.step(job, "kasa", "Setting Kasa outlets") as step:
             try:
                 # Always manage both Kasa ports based on connection_type
                 connection_type = data.connection_type or "none"
                 
                 # Kasa Port 1 (Cellular Amp): Only ON when cellular-amp is selected
-                if connection_type == 'cellular-amp':
-                    result1 = kasa_strip.turn_on_outlet(0)  # Convert to 0-based indexing (port 1 -> index 0)
-                    print(f"INFO: Kasa port 1 (cellular amp) turned ON for cellular-amp")
-                else:
-                    result1 = kasa_strip.turn_off_outlet(0)
-                    print(f"INFO: Kasa port 1 (cellular amp) turned OFF (connection: {connection_type})")
-                
                 # Kasa Port 6 (Starlink): Only ON when starlink is selected
-                if connection_type == 'starlink':
-                    result6 = kasa_strip.turn_on_outlet(5)  # Convert to 0-based indexing (port 6 -> index 5)
-                    print(f"INFO: Kasa port 6 (starlink) turned ON for starlink")
-                else:
-                    result6 = kasa_strip.turn_off_outlet(5)
-                    print(f"INFO: Kasa port 6 (starlink) turned OFF (connection: {connection_type})")
+                # (0-based indexing: port 1 -> index 0, port 6 -> index 5)
+                wanted = {0: connection_type == 'cellular-amp', 5: connection_type == 'starlink'}
+                
+                # Diff against the poller's cached state; only changed outlets are switched
+                changed = kasa_strip.set_outlets(wanted, current=kasa_poller.snapshot().state)
+                if changed:
+                    kasa_poller.apply(changed)
+                for outlet_id, on in wanted.items():
+                    action = ("turned " if outlet_id in changed else "already ") + ("ON" if on else "OFF")
+                    print(f"INFO: Kasa port {outlet_id + 1} {action} (connection: {connection_type})")
                 
                 # Build status message
                 if connection_type == 'cellular-amp':
@@ -952,107 +1011,179 @@ def internet_power_control(data: Annotated[InternetPowerData, Body()]) -> Intern
                     kasa_message = ", Kasa: port 1 OFF, port 6 ON"
                 else:
                     kasa_message = ", Kasa: both ports OFF"
+                step["message"] = kasa_message[2:]
                     
             except Exception as e:
                 print(f"WARNING: Kasa power strip operation failed: {e}")
-                clear_kasa_cache()
+                report_kasa_failure(e)
+                kasa_poller.invalidate()
                 kasa_success = False
                 kasa_message = f", Kasa control failed: {str(e)}"
-        
-        # USB Hub Control Logic
-        if data.port == 0:  # All ports off
+                step.update(status="failed", message=kasa_message[2:])
+    
+    # USB Hub Control Logic
+    if data.port == 0:  # All ports off
+        with internet_jobs.step(job, "hub", "Powering off all USB ports") as step:
             result = hub.all_off()
-            if result:
-                time.sleep(USB_HUB_PORT_DELAY_ALL_OFF)  # Allow time for all ports to turn off
-                update_current_internet_connection(0, "off")  # Update state
-                
-                success_msg = "All USB ports powered off"
-                if not kasa_success:
-                    success_msg += kasa_message
-                
-                return InternetResponse(
-                    success=True,
-                    message=success_msg,
-                    port=0
-                )
-            else:
-                return InternetResponse(
-                    success=False,
-                    message="Failed to power off all USB ports" + kasa_message,
-                    port=0
-                )
-        
-        elif 1 <= data.port <= 4:  # Specific port control
-            # Use the connection_type from the request data, or fallback to port mapping
-            connection_type = data.connection_type or PORT_TO_CONNECTION_TYPE.get(data.port, 'wired')
-            init_delay = get_connection_init_delay(data.port)
+            if not result:
+                step["status"] = "failed"
+        if result:
+            with internet_jobs.step(job, "settle", f"Waiting {USB_HUB_PORT_DELAY_ALL_OFF} s for the ports to turn off"):
+                internet_jobs.wait(job, USB_HUB_PORT_DELAY_ALL_OFF)  # Allow time for all ports to turn off
+            update_current_internet_connection(0, "off")  # Update state
             
-            if data.action.lower() == 'on':
-                # Use atomic single-port control to avoid multi-port transitions
-                print(f"Setting ONLY port {data.port} ON ({connection_type}) - all others OFF")
-                result = hub.set_single_port_on(data.port)
-                if result:
-                    print(f"Applying {connection_type} initialization delay: {init_delay} seconds")
-                    time.sleep(init_delay)  # Use connection-specific initialization delay
-                    
-                    # Special handling for cellular modem (port 1)
-                    if data.port == 1 and connection_type == 'cellular':
-                        print("Performing cellular modem setup sequence...")
-                        try:
-                            modem_success, modem_message = usb_modem_manager.prepare_cellular_modem()
-                            if modem_success:
-                                action_msg = f"powered on ({connection_type}) - modem configured"
-                                print(f"Cellular modem setup successful: {modem_message}")
-                            else:
-                                action_msg = f"powered on ({connection_type}) - modem setup failed: {modem_message}"
-                                print(f"Cellular modem setup failed: {modem_message}")
-                        except Exception as e:
-                            action_msg = f"powered on ({connection_type}) - modem setup error: {str(e)}"
-                            print(f"Cellular modem setup error: {e}")
-                    else:
-                        action_msg = f"powered on ({connection_type})"
-                else:
-                    action_msg = f"failed to power on ({connection_type})"
-            else:
-                result = hub.port_off(data.port)
-                if result:
-                    time.sleep(USB_HUB_PORT_DELAY_BETWEEN_COMMANDS)  # Brief pause
-                action_msg = f"powered off ({connection_type})"
+            success_msg = "All USB ports powered off"
+            if not kasa_success:
+                success_msg += kasa_message
+            return {"success": True, "message": success_msg, "port": 0}
+        else:
+            return {"success": False, "message": "Failed to power off all USB ports" + kasa_message, "port": 0}
+    
+    # Specific port control (port range checked when the job was submitted)
+    # Use the connection_type from the request data, or fallback to port mapping
+    connection_type = data.connection_type or PORT_TO_CONNECTION_TYPE.get(data.port, 'wired')
+    init_delay = get_connection_init_delay(data.port)
+    
+    if data.action.lower() == 'on':
+        # Use atomic single-port control to avoid multi-port transitions
+        print(f"Setting ONLY port {data.port} ON ({connection_type}) - all others OFF")
+        with internet_jobs.step(job, "hub", f"Powering on USB port {data.port} ({connection_type}), all others off") as step:
+            result = hub.set_single_port_on(data.port)
+            if not result:
+                step["status"] = "failed"
+        if result:
+            print(f"Waiting for {connection_type} to come up (at most {init_delay} seconds)")
+            modem_setup = data.port == 1 and connection_type == 'cellular'
+            with internet_jobs.step(job, "link_ready", f"Waiting for {connection_type} to come up (at most {init_delay} s)") as step:
+                # Before modem setup the modem's interface appearing is enough; the setup does the rest
+                readiness = wait_for_link_ready(connection_type, init_delay, "init",
+                                                stages=("interface",) if modem_setup else None,
+                                                sleep=lambda seconds: internet_jobs.wait(job, seconds))
+                step["message"] = f"{connection_type} {readiness.describe()}"
+                if readiness.cancelled:
+                    step.update(status="skipped", message=f"Cut short by newer job {job.superseded_by}")
             
-            if result:
-                update_current_internet_connection(data.port, data.action)  # Update state
-                
-                success_msg = f"USB port {data.port} {action_msg} successfully"
-                if kasa_success and data.kasaPort:
-                    success_msg += kasa_message
-                elif not kasa_success and data.kasaPort:
-                    success_msg += kasa_message
-                
-                return InternetResponse(
-                    success=True,
-                    message=success_msg,
-                    port=data.port
-                )
+            # Special handling for cellular modem (port 1)
+            if modem_setup and job.superseded_by is None:
+                print("Performing cellular modem setup sequence...")
+                with internet_jobs.step(job, "modem", "Configuring cellular modem") as step:
+                    try:
+                        from usb_modem_manager import usb_modem_manager
+                        modem_success, modem_message = usb_modem_manager.prepare_cellular_modem()
+                        if modem_success:
+                            action_msg = f"powered on ({connection_type}) - modem configured"
+                            print(f"Cellular modem setup successful: {modem_message}")
+                        else:
+                            action_msg = f"powered on ({connection_type}) - modem setup failed: {modem_message}"
+                            print(f"Cellular modem setup failed: {modem_message}")
+                            step["status"] = "failed"
+                        step["message"] = modem_message
+                    except Exception as e:
+                        action_msg = f"powered on ({connection_type}) - modem setup error: {str(e)}"
+                        print(f"Cellular modem setup error: {e}")
+                        step.update(status="failed", message=str(e))
             else:
-                return InternetResponse(
-                    success=False,
-                    message=f"Failed to {data.action} USB port {data.port}" + kasa_message,
-                    port=data.port
-                )
-        
+                action_msg = f"powered on ({connection_type})"
         else:
-            return InternetResponse(
-                success=False,
-                message=f"Invalid port number: {data.port}. Use 1-4 for specific ports, 0 for all off.",
-                port=data.port
-            )
+            action_msg = f"failed to power on ({connection_type})"
+    else:
+        with internet_jobs.step(job, "hub", f"Powering off USB port {data.port} ({connection_type})") as step:
+            result = hub.port_off(data.port)
+            if not result:
+                step["status"] = "failed"
+        if result:
+            internet_jobs.wait(job, USB_HUB_PORT_DELAY_BETWEEN_COMMANDS)  # Brief pause
+        action_msg = f"powered off ({connection_type})"
     
-    except Exception as e:
+    if result:
+        update_current_internet_connection(data.port, data.action)  # Update state
+        
+        success_msg = f"USB port {data.port} {action_msg} successfully"
+        if data.kasaPort:
+            success_msg += kasa_message
+        return {"success": True, "message": success_msg, "port": data.port}
+    else:
+        return {"success": False, "message": f"Failed to {data.action} USB port {data.port}" + kasa_message,
+                "port": data.port}
+
+# One internet switch at a time, run by a job worker; a newer request supersedes a queued one
+internet_jobs = InternetJobRunner(run_internet_switch)
+INTERNET_JOB_WAIT_TIMEOUT = 180  # seconds ?wait=true blocks for (Starlink init 20 s + modem setup 30+ s)
+SSE_KEEPALIVE_SECONDS = 15
+
+@app.post("/api/internet/power")
+async def internet_power_control(data: Annotated[InternetPowerData, Body()], wait: bool = False) -> InternetResponse:
+    """Queue a switch of the USB hub ports and Kasa power strip for an internet connection.
+
+    Returns the job id at once; follow it with /api/internet/jobs/{job_id} (or its /events
+    stream). wait=true answers with the job's final result instead, like the old inline call;
+    if the job is still running after INTERNET_JOB_WAIT_TIMEOUT it answers success=False
+    with the job id to follow.
+    """
+    if not 0 <= data.port <= 4:
         return InternetResponse(
             success=False,
-            message=f"USB hub control error: {str(e)}",
+            message=f"Invalid port number: {data.port}. Use 1-4 for specific ports, 0 for all off.",
             port=data.port
         )
+    
+    job = internet_jobs.submit(data.dict())
+    if wait:
+        await internet_jobs.wait_done(job, INTERNET_JOB_WAIT_TIMEOUT)
+        if job.result is not None:
+            return InternetResponse(**job.result, job_id=job.id)
+        return InternetResponse(
+            success=False,
+            message=f"Internet switch job {job.id} still {job.state} after {INTERNET_JOB_WAIT_TIMEOUT} s",
+            port=data.port,
+            job_id=job.id
+        )
+    return InternetResponse(
+        success=True,
+        message=f"Internet switch queued as job {job.id}",
+        port=data.port,
+        job_id=job.id
+    )
+
+@app.get("/api/internet/jobs")
+def get_internet_jobs() -> dict:
+    """Recent internet switch jobs, newest last, and the runner's queue."""
+    return {
+        "success": True,
+        "runner": internet_jobs.status(),
+        "jobs": [internet_jobs.snapshot(job) for job in list(internet_jobs.jobs.values())]
+    }
+
+@app.get("/api/internet/jobs/{job_id}")
+def get_internet_job(job_id: str) -> dict:
+    """State, steps and result of one internet switch job."""
+    job = internet_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return {"success": True, "job": internet_jobs.snapshot(job)}
+
+@app.get("/api/internet/jobs/{job_id}/events")
+async def stream_internet_job(job_id: str):
+    """Server-sent events: one 'job' event per change of the job, ending after the final state."""
+    job = internet_jobs.get(job_id)
+    if job is None:
+        # A 200 would leave an EventSource waiting for events that never come
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    
+    async def events():
+        version = None
+        while True:
+            snapshot = internet_jobs.snapshot(job)
+            if snapshot["version"] != version:
+                version = snapshot["version"]
+                yield f"event: job\ndata: {json.dumps(snapshot)}\n\n"
+                if snapshot["done"]:
+                    return
+            elif not await internet_jobs.wait_change(job, version, SSE_KEEPALIVE_SECONDS):
+                yield ": keepalive\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.post("/api/internet/cellular-test")
 def test_cellular_modem_setup() -> InternetResponse:
@@ -1061,6 +1192,7 @@ def test_cellular_modem_setup() -> InternetResponse:
         print("Starting manual cellular modem test...")
         
         # Test the USB modem manager
+        from usb_modem_manager import usb_modem_manager
         success, message = usb_modem_manager.prepare_cellular_modem()
         
         return InternetResponse(
@@ -1077,22 +1209,33 @@ def test_cellular_modem_setup() -> InternetResponse:
         )
 
 @app.post("/api/internet/test")
-def internet_connectivity_test(data: Annotated[InternetTestData, Body()]) -> InternetResponse:  # Removed async
-    """Test internet connectivity for the specified connection type."""
+async def internet_connectivity_test(data: Annotated[InternetTestData, Body()]) -> InternetResponse:
+    """Test internet connectivity for the specified connection type.
+
+    Polls the link (readiness stages, then a short probe race) until it is usable or max_wait
+    seconds have passed, so one call covers the whole wait after a power-on; max_wait=0 tests
+    once. No thread is held between polls.
+    """
     try:
-        # Use connection-specific settling delay before testing
-        settle_delay = get_connection_settle_delay(data.connection_type)
-        print(f"Applying {data.connection_type} connection settle delay: {settle_delay} seconds")
-        time.sleep(settle_delay)
-        
-        # Test internet connectivity with shorter timeout for the simplified ping test
-        timeout = 5  # Fast ping test timeout
-        test_results = test_internet_connectivity(data.connection_type, timeout=timeout)
+        upper_bound = get_connection_settle_delay(data.connection_type) if data.max_wait is None \
+            else max(0.0, data.max_wait)
+        last_race = {}
+
+        def probe():
+            last_race.update(test_internet_connectivity(data.connection_type, timeout=LINK_PROBE_TIMEOUT))
+            return last_race["connected"]
+
+        with time_hardware("ping"):
+            readiness = await wait_for_link_ready_async(data.connection_type, upper_bound, "settle", probe=probe)
         
+        if last_race:
+            message = last_race["message"]  # the last probe race: its winner, or why every probe failed
+        else:
+            message = f"No internet connectivity detected via {data.connection_type} (link {readiness.describe()})"
         return InternetResponse(
             success=True,
-            message=test_results['message'],
-            connected=test_results['connected']
+            message=message,
+            connected=readiness.ready
         )
     
     except Exception as e:
@@ -1102,6 +1245,11 @@ def internet_connectivity_test(data: Annotated[InternetTestData, Body()]) -> Int
             connected=False
         )
 
+@app.get("/api/internet/readiness")
+def get_internet_readiness() -> dict:
+    """Last measured time-to-ready per connection type and phase (init after power-on, settle before a test)."""
+    return {"success": True, "readiness": last_link_readiness}
+
 class DataResponse(BaseModel):
     var1: str
     var2: str
@@ -1126,121 +1274,29 @@ class DataResponse(BaseModel):
     battery_percent: float
 
 
-# This is the POWER page function that is called by the front end client
-@app.get("/data/power")
-def data_power()-> DataResponse:  # Removed async
-    debug = 0  # Define debug variable
-
-    (Charger_AC_power, Charger_AC_voltage, Invert_AC_power, DC_Charger_power, DC_Charger_volts, Invert_DC_power, Invert_status_num)= InvertCalcs()
-    (ShorePower, GenPower)= ATS_Calcs()
-    (SolarPower) = SolcarCalcs()
-    (Batt_Power, Batt_Voltage, Batt_Charge, Batt_Hours_Remaining_str, Batt_status_str) = BatteryCalcs(debug)
-    (AlternatorPower) = AlternatorCalcs(Batt_Power, Invert_status_num, Invert_DC_power, SolarPower)
-
-    (BatteryFlow, InvertPwrFlow, ShorePwrFlow, GeneratorPwrFlow, SolarPwrFlow, AltPwrFlow, Invert_status_str) = \
-        GenAllFlows(Invert_status_num, Batt_Power, SolarPower, ShorePower, GenPower, AlternatorPower)
-
-    #Calc AC and DC Loads since not measured
-    (AC_HeatPump_Load, DC_Load) = LoadCalcs(Invert_status_num, Charger_AC_power, DC_Charger_power, ShorePower, GenPower, Batt_Power, SolarPower, AlternatorPower, Invert_DC_power)
-    (RedMsg, YellowMsg, Time_Str) = HouseKeeping()
-
-    return DataResponse(
-        var1 =str(max(ShorePower, GenPower)) + ' Watts',      #shore or gen power (watts)
-        var2 =ShorePwrFlow,                                             #shorepower Flow
-        var3 =str('%.0f' % Charger_AC_voltage) + " Volts AC",
-        var4 =str('%.0f' % AC_HeatPump_Load) + ' Watts',  
-        var5 =str(SolarPower) + ' Watts',
-        var6 =SolarPwrFlow,                                             #solar power Flow
-        var7 =str('%.1f' % Batt_Voltage) + " Volts DC",
-        var8 =str('%.0f' % DC_Load) + ' Watts',
-        var9 = str('%.0f' % AlternatorPower) + " Watts",                                #Alternator power
-        var10=InvertPwrFlow,                                            #flow annimation   
-        var11=str('%.0f' % Charger_AC_power) + " Watts", 
-        var12= str('%.0f' % max(Invert_AC_power, .8 * (Invert_DC_power)) + " Watts"),      #note: .8 is efficiency estimate of inverter
-        var13=RedMsg, 
-        var14=AltPwrFlow,                                               #Alternator power Flow
-        #battery variables begin
-        var15= Batt_Hours_Remaining_str,
-        var16= 'Status: ' + Batt_status_str,
-        var17= GeneratorPwrFlow,
-        var18= BatteryFlow,                        #Battery power Flow
-        var19= str('%.0f' % Batt_Power) + " Watts",
-        battery_percent= Batt_Charge,
-        #battery variables end 
-        var20=Time_Str,
-        
-    )
+class PreSerializedJSONResponse(Response):
+    """Raw JSON response for bodies that are already serialized (skips pydantic and re-encoding)."""
+    media_type = "application/json"
 
-# This is the HOME page function that is called by the front end client
-@app.get("/data/home")
-def data_home()-> DataResponse:  # Removed async
-    debug = 0  # Define debug variable
-    
-    (Charger_AC_power, Charger_AC_voltage, Invert_AC_power, DC_Charger_power, DC_Charger_volts, Invert_DC_power, Invert_status_num)= InvertCalcs()
-    (ShorePower, GenPower)= ATS_Calcs()
-    (SolarPower) = SolcarCalcs()
-    (Batt_Power, Batt_Voltage, Batt_Charge, Batt_Hours_Remaining_str, Batt_status_str) = BatteryCalcs(debug)
-    (AlternatorPower) = AlternatorCalcs(Batt_Power, Invert_status_num, Invert_DC_power, SolarPower)
+# The /data/* endpoints are polled every second by every open page. Their bodies are
+# cached pre-serialized per telemetry snapshot; response_model keeps the /docs schema.
 
-    #Calc AC and DC Loads since not measured
-    (AC_HeatPump_Load, DC_Load) = LoadCalcs(Invert_status_num, Charger_AC_power, DC_Charger_power, ShorePower, GenPower, Batt_Power, SolarPower, AlternatorPower, Invert_DC_power)
-    (RedMsg, YellowMsg, Time_Str) = HouseKeeping()
-
-    # Tank level calculations with error handling for missing data
-    try:
-        Tank_Fresh = round(rvglue.rvglue.AliasData["_var29Tank_Level"]/rvglue.rvglue.AliasData["_var30Tank_Resolution"] * 100 )  
-    except (KeyError, ZeroDivisionError):
-        Tank_Fresh = 50  # Default value when no data available
-        
-    try:
-        Tank_Black = round(rvglue.rvglue.AliasData["_var32Tank_Level"]/rvglue.rvglue.AliasData["_var33Tank_Resolution"] * 100)
-    except (KeyError, ZeroDivisionError):
-        Tank_Black = 25  # Default value when no data available
-        
-    try:
-        Tank_Gray = round(rvglue.rvglue.AliasData["_var35Tank_Level"]/rvglue.rvglue.AliasData["_var36Tank_Resolution"] * 100)   
-    except (KeyError, ZeroDivisionError):
-        Tank_Gray = 30  # Default value when no data available
-        
-    try:
-        Tank_Propane = round(rvglue.rvglue.AliasData["_var38Tank_Level"]/rvglue.rvglue.AliasData["_var39Tank_Resolution"] * 100)  
-    except (KeyError, ZeroDivisionError):
-        Tank_Propane = 75  # Default value when no data available  
+# This is the POWER page function that is called by the front end client
+@app.get("/data/power", response_model=DataResponse, response_class=PreSerializedJSONResponse)
+def data_power():  # Removed async
+    return PreSerializedJSONResponse(page_cache.get("power", current_telemetry_source(), local_telemetry))
 
-    if debug > 0:
-        print('invert power= ', round(Invert_AC_power), round(Invert_DC_power*.8))
-
-    return DataResponse(
-        var1 = 'Outside 60? psi',   # LR outside
-        var2 = 'Inside 60? psi',    # LR inside
-        var3 = 'Inside 60? psi',   # RR inside
-        var4 = 'Outside 60? psi',    # RR outside
-        var5 = str(SolarPower) + ' Watts',
-        var6 = 'not used',                                            
-        var7 = str('%.1f' % Batt_Voltage) + " Volts DC",
-        var8 = str('%.0f' % DC_Load) + ' Watts',
-        var9 = '60? psi',    # LF
-        var10= '60? psi',    # RF
-        var11= 'not used',  
-        var12= str('%.0f' % max(Invert_AC_power, .8 * (Invert_DC_power)) + " Watts"),      #note: .8 is efficiency estimate of inverter
-        var13= str(Tank_Gray),   # Send as string, client will convert to number
-        var14= str(Tank_Black),  # Send as string, client will convert to number
-        var15= Batt_Hours_Remaining_str,
-        var16= 'Status: ' + Batt_status_str,
-        var17= str(Tank_Fresh),  # Send as string, client will convert to number
-        var18= str(Tank_Propane), # Send as string, client will convert to number
-        var19= str('%.0f' % Batt_Power) + " Watts",
-        battery_percent= Batt_Charge,
-        var20= Time_Str,
-        
-    )
+# This is the HOME page function that is called by the front end client
+@app.get("/data/home", response_model=DataResponse, response_class=PreSerializedJSONResponse)
+def data_home():  # Removed async
+    return PreSerializedJSONResponse(page_cache.get("home", current_telemetry_source(), local_telemetry))
 
 # Debug API endpoints
 @app.get("/api/debug/usb/status")
-def get_usb_debug_status() -> dict:
-    """Get current status of all USB ports for debug interface."""
+async def get_usb_debug_status(refresh: bool = False) -> dict:
+    """Get current status of all USB ports for debug interface (one cached hub query; refresh=true re-reads it)."""
     try:
-        hub = get_usb_hub_controller()
+        hub = await get_usb_hub_controller_async()
         if not hub:
             return {
                 "success": False,
@@ -1248,31 +1304,30 @@ def get_usb_debug_status() -> dict:
                 "ports": {}
             }
         
-        # Get status of all USB ports
+        # All four ports from one status query (or the cached state)
+        state = await hub.get_port_state(max_age=0 if refresh else None)
         ports = {}
         for port_num in range(1, 5):  # USB ports 1-4
-            try:
-                # Get current active port and determine if this specific port is on
-                active_port = hub.get_current_active_port()
-                is_on = (active_port == port_num)
-                connection_type = PORT_TO_CONNECTION_TYPE.get(port_num, 'unknown')
+            connection_type = PORT_TO_CONNECTION_TYPE.get(port_num, 'unknown')
+            if state is None:
                 ports[port_num] = {
-                    "enabled": is_on,
+                    "enabled": False,
                     "connection_type": connection_type,
-                    "name": f"USB Port {port_num} ({connection_type.title()})"
+                    "name": f"USB Port {port_num} (Error)",
+                    "error": "No valid hub status response"
                 }
-            except Exception as e:
+            else:
                 ports[port_num] = {
-                    "enabled": False,
-                    "connection_type": PORT_TO_CONNECTION_TYPE.get(port_num, 'unknown'),
-                    "name": f"USB Port {port_num} (Error)",
-                    "error": str(e)
+                    "enabled": state.is_on(port_num),
+                    "connection_type": connection_type,
+                    "name": f"USB Port {port_num} ({connection_type.title()})"
                 }
         
         return {
             "success": True,
             "message": "USB ports status retrieved",
-            "ports": ports
+            "ports": ports,
+            "session": usb_hub_session.status()
         }
     except Exception as e:
         return {
@@ -1281,8 +1336,19 @@ def get_usb_debug_status() -> dict:
             "ports": {}
         }
 
+@app.get("/api/debug/usb/trace")
+def get_usb_trace(limit: int = 100) -> dict:
+    """Recent raw serial frames to/from the USB hub, oldest first (formatted only here)."""
+    return {
+        "success": True,
+        "capacity": usb_hub_trace.capacity,
+        "recorded": usb_hub_trace.recorded,
+        "echo": usb_hub_trace.echo,
+        "frames": usb_hub_trace.frames(limit)
+    }
+
 @app.post("/api/debug/usb/{port_num}")
-def control_usb_port_debug(port_num: int, data: Annotated[dict, Body()]) -> dict:
+async def control_usb_port_debug(port_num: int, data: Annotated[dict, Body()]) -> dict:
     """Control individual USB port for debug interface."""
     try:
         if port_num < 1 or port_num > 4:
@@ -1298,7 +1364,7 @@ def control_usb_port_debug(port_num: int, data: Annotated[dict, Body()]) -> dict
                 "message": f"Invalid action: {action}. Must be 'on' or 'off'."
             }
         
-        hub = get_usb_hub_controller()
+        hub = await get_usb_hub_controller_async()
         if not hub:
             return {
                 "success": False,
@@ -1307,9 +1373,9 @@ def control_usb_port_debug(port_num: int, data: Annotated[dict, Body()]) -> dict
         
         # Control the specific port
         if action == 'on':
-            result = hub.port_on(port_num)
+            result = await hub.port_on(port_num)
         else:
-            result = hub.port_off(port_num)
+            result = await hub.port_off(port_num)
         
         if result:
             connection_type = PORT_TO_CONNECTION_TYPE.get(port_num, 'unknown')
@@ -1333,55 +1399,50 @@ def control_usb_port_debug(port_num: int, data: Annotated[dict, Body()]) -> dict
             "port": port_num
         }
 
+KASA_OUTLET_NAMES = {
+    1: "Kasa Outlet 1 (Cellular Amp)",
+    2: "Kasa Outlet 2 (TV)", 
+    3: "Kasa Outlet 3 (Soundbar)",
+    4: "Kasa Outlet 4 (Synology)",
+    5: "Kasa Outlet 5",
+    6: "Kasa Outlet 6 (Starlink)"
+}
+
+def kasa_mock_outlets(tag: str, status: str) -> dict:
+    """Placeholder outlet data for the debug page while the strip can't be read."""
+    mock_state = {1: (False, 0), 2: (True, 0.1), 3: (True, 0.0), 4: (True, 0.0), 5: (True, 0.0), 6: (False, 0.0)}
+    return {
+        outlet_id: {"enabled": enabled, "power_watts": power, "name": f"{KASA_OUTLET_NAMES[outlet_id]} [{tag}]",
+                    "mock": True, "status": status}
+        for outlet_id, (enabled, power) in mock_state.items()
+    }
+
 @app.get("/api/debug/kasa/status")
-def get_kasa_debug_status() -> dict:
-    """Get current status and power consumption of all Kasa outlets for debug interface."""
-    import time
-    global _kasa_last_failure_time
-    
-    # Fast fail if we recently had a connection failure
-    current_time = time.time()
-    if (_kasa_last_failure_time > 0 and 
-        (current_time - _kasa_last_failure_time) < _kasa_failure_cache_duration):
-        print("INFO: Debug page - using cached failure, returning mock data immediately")
-        return {
-            "success": True,
-            "message": "Kasa device recently failed - showing cached offline status",
-            "outlets": {
-                1: {"enabled": False, "power_watts": 0, "name": "Kasa Outlet 1 (Cellular Amp) [OFFLINE]", "mock": True, "status": "offline"},
-                2: {"enabled": True, "power_watts": 0.1, "name": "Kasa Outlet 2 (TV) [OFFLINE]", "mock": True, "status": "offline"},
-                3: {"enabled": True, "power_watts": 0.0, "name": "Kasa Outlet 3 (Soundbar) [OFFLINE]", "mock": True, "status": "offline"},
-                4: {"enabled": True, "power_watts": 0.0, "name": "Kasa Outlet 4 (Synology) [OFFLINE]", "mock": True, "status": "offline"},
-                5: {"enabled": True, "power_watts": 0.0, "name": "Kasa Outlet 5 [OFFLINE]", "mock": True, "status": "offline"},
-                6: {"enabled": False, "power_watts": 0.0, "name": "Kasa Outlet 6 (Starlink) [OFFLINE]", "mock": True, "status": "offline"}
-            }
-        }
+def get_kasa_debug_status(strip: Optional[str] = None) -> dict:
+    """Get current status and power consumption of all Kasa outlets for debug interface.
     
+    strip selects the power strip (default "main").
+    """
+    device = kasa_registry.get(strip)
+    if device is None:
+        return {"success": False, "message": unknown_kasa_strip(strip), "outlets": {}}
     try:
-        kasa_strip = get_kasa_power_strip()
-        if not kasa_strip:
-            # Return mock data when Kasa is not available
-            return {
-                "success": True,
-                "message": "Kasa power strip not available - showing mock data for testing",
-                "outlets": {
-                    1: {"enabled": False, "power_watts": 0, "name": "Kasa Outlet 1 (Cellular Amp) [OFFLINE]", "mock": True, "status": "offline"},
-                    2: {"enabled": True, "power_watts": 0.1, "name": "Kasa Outlet 2 (TV) [OFFLINE]", "mock": True, "status": "offline"},
-                    3: {"enabled": True, "power_watts": 0.0, "name": "Kasa Outlet 3 (Soundbar) [OFFLINE]", "mock": True, "status": "offline"},
-                    4: {"enabled": True, "power_watts": 0.0, "name": "Kasa Outlet 4 (Synology) [OFFLINE]", "mock": True, "status": "offline"},
-                    5: {"enabled": True, "power_watts": 0.0, "name": "Kasa Outlet 5 [OFFLINE]", "mock": True, "status": "offline"},
-                    6: {"enabled": False, "power_watts": 0.0, "name": "Kasa Outlet 6 (Starlink) [OFFLINE]", "mock": True, "status": "offline"}
-                }
-            }
+        snapshot = device.poller.snapshot()
+        cache_info = {"strip": device.strip_id, "version": snapshot.version, "age_seconds": round(snapshot.age, 1),
+                      "circuit": device.breaker.status(), "discovery": device.resolver.status()}
         
-        # Test connection first before trying to get individual outlets
-        try:
-            # Try a simple connection test
-            if not kasa_strip.test_connectivity():
-                raise KasaPowerStripError("Connection test failed")
-        except Exception as e:
-            # Connection failed, return mock data with error info
-            error_msg = str(e)
+        if not snapshot.available:
+            if snapshot.error == STRIP_UNAVAILABLE:
+                # Return mock data when Kasa is not available
+                return {
+                    "success": True,
+                    "message": "Kasa power strip not available - showing mock data for testing",
+                    "outlets": kasa_mock_outlets("OFFLINE", "offline"),
+                    "cache": cache_info
+                }
+            
+            # Poll failed, return mock data with error info
+            error_msg = snapshot.error
             # Remove technical details for user-friendly message
             if "Kasa command failed:" in error_msg:
                 error_msg = "Device connection failed"
@@ -1391,58 +1452,17 @@ def get_kasa_debug_status() -> dict:
             return {
                 "success": True,
                 "message": f"Kasa device unavailable ({error_msg}) - showing mock data",
-                "outlets": {
-                    1: {"enabled": False, "power_watts": 0, "name": "Kasa Outlet 1 (Cellular Amp) [ERROR]", "mock": True, "status": "error"},
-                    2: {"enabled": True, "power_watts": 0.1, "name": "Kasa Outlet 2 (TV) [ERROR]", "mock": True, "status": "error"},
-                    3: {"enabled": True, "power_watts": 0.0, "name": "Kasa Outlet 3 (Soundbar) [ERROR]", "mock": True, "status": "error"},
-                    4: {"enabled": True, "power_watts": 0.0, "name": "Kasa Outlet 4 (Synology) [ERROR]", "mock": True, "status": "error"},
-                    5: {"enabled": True, "power_watts": 0.0, "name": "Kasa Outlet 5 [ERROR]", "mock": True, "status": "error"},
-                    6: {"enabled": False, "power_watts": 0.0, "name": "Kasa Outlet 6 (Starlink) [ERROR]", "mock": True, "status": "error"}
-                }
+                "outlets": kasa_mock_outlets("ERROR", "error"),
+                "cache": cache_info
             }
         
-        # Connection successful, get real outlet data
+        state = snapshot.state
+        # Outlet names are configured for the default strip; other strips use their own aliases
+        names = KASA_OUTLET_NAMES if device is kasa_device else {
+            i + 1: f"Kasa Outlet {i + 1} ({alias})" for i, alias in enumerate(state.aliases)}
         outlets = {}
-        for outlet_id in range(1, 7):  # Kasa outlets 1-6
-            try:
-                # Get outlet status (this gives us the on/off state)
-                status_data = kasa_strip.get_outlet_status(outlet_id - 1)  # Convert to 0-based
-                
-                if 'error' in status_data:
-                    outlets[outlet_id] = {
-                        "enabled": False,
-                        "power_watts": 0,
-                        "name": f"Kasa Outlet {outlet_id} [COMM ERROR]",
-                        "error": "Communication error",
-                        "status": "comm_error"
-                    }
-                else:
-                    is_on = status_data.get('is_on', False)
-                    
-                    # Also get power consumption
-                    try:
-                        power_data = kasa_strip.get_power_consumption(outlet_id - 1)
-                        power_watts = power_data.get('power_w', 0) if 'error' not in power_data else 0
-                    except:
-                        power_watts = 0
-                    
-                    # Get outlet name/alias if available
-                    outlet_names = {
-                        1: "Kasa Outlet 1 (Cellular Amp)",
-                        2: "Kasa Outlet 2 (TV)", 
-                        3: "Kasa Outlet 3 (Soundbar)",
-                        4: "Kasa Outlet 4 (Synology)",
-                        5: "Kasa Outlet 5",
-                        6: "Kasa Outlet 6 (Starlink)"
-                    }
-                    
-                    outlets[outlet_id] = {
-                        "enabled": is_on,
-                        "power_watts": round(power_watts, 1),
-                        "name": outlet_names.get(outlet_id, f"Kasa Outlet {outlet_id}"),
-                        "status": "online"
-                    }
-            except Exception as e:
+        for outlet_id in range(1, max(len(state), len(names)) + 1):
+            if outlet_id > len(state):
                 outlets[outlet_id] = {
                     "enabled": False,
                     "power_watts": 0,
@@ -1450,11 +1470,19 @@ def get_kasa_debug_status() -> dict:
                     "error": "Individual outlet error",
                     "status": "error"
                 }
+            else:
+                outlets[outlet_id] = {
+                    "enabled": state.is_on(outlet_id - 1),  # Convert to 0-based
+                    "power_watts": round(state.power_w(outlet_id - 1), 1),
+                    "name": names.get(outlet_id, f"Kasa Outlet {outlet_id}"),
+                    "status": "online"
+                }
         
         return {
             "success": True,
             "message": "Kasa outlets status retrieved successfully",
-            "outlets": outlets
+            "outlets": outlets,
+            "cache": cache_info
         }
     except Exception as e:
         # Complete failure, return mock data
@@ -1462,40 +1490,37 @@ def get_kasa_debug_status() -> dict:
         return {
             "success": True,
             "message": f"Kasa system error ({error_msg}) - showing mock data",
-            "outlets": {
-                1: {"enabled": False, "power_watts": 0, "name": "Kasa Outlet 1 (Cellular Amp) [SYSTEM ERROR]", "mock": True, "status": "system_error"},
-                2: {"enabled": True, "power_watts": 0.1, "name": "Kasa Outlet 2 (TV) [SYSTEM ERROR]", "mock": True, "status": "system_error"},
-                3: {"enabled": True, "power_watts": 0.0, "name": "Kasa Outlet 3 (Soundbar) [SYSTEM ERROR]", "mock": True, "status": "system_error"},
-                4: {"enabled": True, "power_watts": 0.0, "name": "Kasa Outlet 4 (Synology) [SYSTEM ERROR]", "mock": True, "status": "system_error"},
-                5: {"enabled": True, "power_watts": 0.0, "name": "Kasa Outlet 5 [SYSTEM ERROR]", "mock": True, "status": "system_error"},
-                6: {"enabled": False, "power_watts": 0.0, "name": "Kasa Outlet 6 (Starlink) [SYSTEM ERROR]", "mock": True, "status": "system_error"}
-            }
+            "outlets": kasa_mock_outlets("SYSTEM ERROR", "system_error")
         }
 
 @app.post("/api/debug/kasa/clear-cache")
 def clear_kasa_cache_debug() -> dict:
     """Clear Kasa connection cache to force reconnection attempt."""
     clear_kasa_cache()
+    for device in kasa_registry.devices.values():
+        device.poller.invalidate()
     return {"success": True, "message": "Kasa connection cache cleared"}
 
-@app.post("/api/debug/kasa/{outlet_id}")
-def control_kasa_outlet_debug(outlet_id: int, data: Annotated[dict, Body()]) -> dict:
-    """Control individual Kasa outlet for debug interface."""
+def control_kasa_outlet(device, outlet_id: int, data: dict) -> dict:
+    """Switch one outlet (1-based) of a strip for the debug interface."""
+    action = data.get('action', '').lower()
     try:
-        if outlet_id < 1 or outlet_id > 6:
+        # The outlet count comes from the strip itself (cached state), not a fixed 6
+        snapshot = device.poller.snapshot()
+        outlet_count = len(snapshot.state) if snapshot.available else None
+        if outlet_id < 1 or (outlet_count is not None and outlet_id > outlet_count):
             return {
                 "success": False,
-                "message": f"Invalid outlet ID: {outlet_id}. Must be 1-6."
+                "message": f"Invalid outlet ID: {outlet_id}. Must be 1-{outlet_count or 'N'}."
             }
         
-        action = data.get('action', '').lower()
         if action not in ['on', 'off']:
             return {
                 "success": False,
                 "message": f"Invalid action: {action}. Must be 'on' or 'off'."
             }
         
-        kasa_strip = get_kasa_power_strip()
+        kasa_strip = device.get_strip()
         if not kasa_strip:
             # Return mock response when Kasa is not available
             mock_power = 0.1 if action == 'on' else 0.0
@@ -1514,25 +1539,26 @@ def control_kasa_outlet_debug(outlet_id: int, data: Annotated[dict, Body()]) ->
         else:
             result = kasa_strip.turn_off_outlet(outlet_id - 1)
         
-        # Get power consumption after the action (with a small delay)
-        time.sleep(0.5)
-        try:
-            power_data = kasa_strip.get_power_consumption(outlet_id - 1)
-            power_watts = power_data.get('power_w', 0) if 'error' not in power_data else 0
-        except:
-            power_watts = 0
-        
-        # Clear cache to ensure next status request gets fresh data
-        clear_kasa_cache()
+        # The strip acknowledged the command: update the cached state right away and let a
+        # background read-back verify it (and pick up the settled power reading)
+        device.poller.apply({outlet_id - 1: action == 'on'})
+        outlet = device.poller.snapshot().outlet(outlet_id - 1)
+        power_watts = outlet.get('power_w', 0) if outlet else 0
         
         return {
             "success": True,
             "message": f"Kasa outlet {outlet_id} turned {action}",
             "outlet": outlet_id,
             "action": action,
-            "power_watts": round(power_watts, 1)
+            "power_watts": round(power_watts, 1),
+            "verified": False
         }
+    except ValueError as e:
+        return {"success": False, "message": f"Invalid outlet ID: {outlet_id}. {e}"}
     except Exception as e:
+        if isinstance(e, KasaPowerStripError):
+            device.report_failure(e)
+            device.poller.invalidate()  # Outcome unknown; re-read before trusting the cache
         # Return mock response on error
         mock_power = 0.1 if action == 'on' else 0.0
         return {
@@ -1545,6 +1571,19 @@ def control_kasa_outlet_debug(outlet_id: int, data: Annotated[dict, Body()]) ->
             "error": str(e)
         }
 
+@app.post("/api/debug/kasa/{outlet_id}")
+def control_kasa_outlet_debug(outlet_id: int, data: Annotated[dict, Body()]) -> dict:
+    """Control individual outlet of the default Kasa strip for debug interface."""
+    return control_kasa_outlet(kasa_device, outlet_id, data)
+
+@app.post("/api/debug/kasa/{strip_id}/{outlet_id}")
+def control_kasa_strip_outlet_debug(strip_id: str, outlet_id: int, data: Annotated[dict, Body()]) -> dict:
+    """Control outlet outlet_id of Kasa strip strip_id for debug interface."""
+    device = kasa_registry.get(strip_id)
+    if device is None:
+        return {"success": False, "message": unknown_kasa_strip(strip_id)}
+    return control_kasa_outlet(device, outlet_id, data)
+
 # Synology scheduled shutdown endpoints (must come before generic handler)
 @app.get("/api/debug/synology/scheduled-time")
 async def get_scheduled_shutdown():
@@ -1622,7 +1661,8 @@ async def debug_synology_control(action: str):
         if action == 'power-off':
             cmd.append('--force')
             
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=15, cwd=server_dir)
+        with time_hardware("synology"):
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=15, cwd=server_dir)
         
         if result.returncode == 0:
             output = result.stdout.strip()
@@ -1683,10 +1723,220 @@ async def debug_synology_control(action: str):
 
 
 
+# Background hardware discovery
+# Uvicorn binds the port right away; USB hub, Kasa, alarm and MQTT come up concurrently
+# in daemon threads and report their progress here (see /api/ready).
+DISCOVERY_PENDING = "pending"
+DISCOVERY_READY = "ready"
+DISCOVERY_UNAVAILABLE = "unavailable"
+DISCOVERY_FAILED = "failed"
+
+server_start_time = time.time()
+discovery_state = {}  # component -> {"status": ..., "detail": ..., "seconds": ...}
+discovery_lock = threading.Lock()
+mqtt_client_thread = None
+
+def discover_usb_hub():
+    """Detect the active internet connection from the USB hub."""
+    detected_connection = detect_current_internet_connection()
+    print(f"Server startup: Current internet connection is '{detected_connection}'")
+    return True, detected_connection
+
+def discover_kasa():
+    """Connect to every configured Kasa power strip and start polling their state."""
+    if kasa_device.disabled:
+        print("INFO: Kasa power strip disabled via DISABLE_KASA environment variable")
+        return False, "disabled"
+    for device in kasa_registry.devices.values():
+        if device.resolver.mac is None:
+            # First start without a discovery cache: look for the strip before trying its configured IP
+            device.resolver.rediscover()
+    connected = kasa_registry.connect_all()
+    kasa_registry.start()  # keeps retrying (with failure caching) strips that are not up yet
+    hosts = [f"{strip_id}={kasa_registry.get(strip_id).resolver.host()}" if ok else f"{strip_id}=not found"
+             for strip_id, ok in connected.items()]
+    return any(connected.values()), ", ".join(hosts)
+
+def discover_alarm():
+    """Load and start the alarm system (direct GPIO or MQTT)."""
+    available = initialize_alarm_system()
+    mode = "gpio" if alarm_system is not None else ("mqtt" if alarm_mqtt_available else "web-only")
+    return available, mode
+
+def start_mqtt_client(debug=0):
+    """Start the rvglue MQTT subscriber thread that feeds telemetry AliasData."""
+    global mqtt_client_thread
+    from rvglue import MQTTClient
+    # MQTTClient("pub","localhost", 1883, "dgn_variables.json",'_var', 'RVC', debug) 
+    client = MQTTClient("sub","localhost", 1883, '_var', 'RVC', debug)
+    mqtt_client_thread = threading.Thread(target=client.run_mqtt_infinite)
+    #t1 = threading.Thread(target=MQTTClient.MQTTClient().printhello)
+    mqtt_client_thread.start()
+    return True, "subscribed"
+
+def run_discovery_task(name, func):
+    """Run one discovery step and record its outcome in discovery_state."""
+    start = time.perf_counter()
+    try:
+        ok, detail = func()
+        status_value = DISCOVERY_READY if ok else DISCOVERY_UNAVAILABLE
+    except Exception as e:
+        print(f"ERROR: Startup discovery of {name} failed: {e}")
+        status_value, detail = DISCOVERY_FAILED, str(e)
+    with discovery_lock:
+        discovery_state[name] = {
+            "status": status_value,
+            "detail": detail,
+            "seconds": round(time.perf_counter() - start, 3)
+        }
+    print(f"Startup discovery: {name} {status_value} ({detail}) in {discovery_state[name]['seconds']}s")
+
+def start_background_discovery(tasks):
+    """Start each discovery task in its own daemon thread and return immediately."""
+    for name, func in tasks.items():
+        with discovery_lock:
+            discovery_state[name] = {"status": DISCOVERY_PENDING, "detail": None, "seconds": None}
+        threading.Thread(target=run_discovery_task, args=(name, func), name=f"discover-{name}",
+                         daemon=True).start()
+
+def start_hardware_owner(port=0):
+    """Serve this app on 127.0.0.1 from a thread of the master process; returns its "host:port".
+
+    Workers relay hardware endpoints here (HardwareProxyMiddleware), so only this
+    process opens the USB hub and talks to the Kasa strips.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", port))
+    address = f"127.0.0.1:{sock.getsockname()[1]}"
+    owner = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+    threading.Thread(target=owner.run, kwargs={"sockets": [sock]}, name="hardware-owner", daemon=True).start()
+    print(f"Hardware owner serving workers on {address}")
+    return address
+
+@app.get("/api/ready")
+async def readiness() -> dict:
+    """Report which background startup components are ready."""
+    with discovery_lock:
+        components = {name: dict(state) for name, state in discovery_state.items()}
+    return {
+        "ready": all(c["status"] != DISCOVERY_PENDING for c in components.values()),
+        "uptime_seconds": round(time.time() - server_start_time, 1),
+        "components": components
+    }
+
 @app.get("/status")
 async def status() -> dict:
     return {"hello": "world and more"}
 
+@app.get("/metrics")
+async def metrics() -> Response:
+    """Export request and hardware metrics in the Prometheus text format."""
+    if HARDWARE_OWNER_ADDR:
+        # Hardware, circuit breaker and link readiness metrics live in the owner process
+        try:
+            owner_text = await fetch_owner(HARDWARE_OWNER_ADDR, "/metrics", timeout=5.0)
+            return Response(merge_owner_metrics(owner_text.decode("utf-8")), media_type=METRICS_CONTENT_TYPE)
+        except (OSError, asyncio.TimeoutError, UnicodeDecodeError) as e:
+            print(f"WARNING: Could not read the hardware owner's metrics: {e}")
+    return Response(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+# Batched read API
+# Lets a page fetch several read-only endpoints with one HTTP round trip.
+# Only read operations are exposed here; control endpoints must be called directly.
+MAX_BATCH_OPERATIONS = 16
+
+class BatchOperation(BaseModel):
+    op: str  # Operation name, see BATCH_OPERATIONS
+    id: str = None  # Optional client tag echoed back in the result
+    params: dict = {}  # Keyword arguments for the operation (e.g. {"outlet_id": 1})
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation]
+
+BATCH_OPERATIONS = {
+    "alarms": alarms,
+    "data_home": data_home,
+    "data_power": data_power,
+    "internet_status": get_internet_status,
+    "kasa_power": get_kasa_power,
+    "status": status,
+}
+
+class BatchParamsConfig(BaseConfig):
+    extra = Extra.forbid
+
+def batch_params_model(op, handler):
+    """Pydantic model of a handler's parameters, so batch params are checked and coerced like query params."""
+    fields = {}
+    for name, param in inspect.signature(handler).parameters.items():
+        annotation = Any if param.annotation is inspect.Parameter.empty else param.annotation
+        fields[name] = (annotation, ... if param.default is inspect.Parameter.empty else param.default)
+    return create_model(f"BatchParams_{op}", __config__=BatchParamsConfig, **fields)
+
+BATCH_PARAM_MODELS = {op: batch_params_model(op, handler) for op, handler in BATCH_OPERATIONS.items()}
+
+# In multi-worker mode these operations read hardware state, which only the owner process has
+BATCH_OWNER_PATHS = {
+    "alarms": "/api/alarmget",
+    "internet_status": "/api/internet/status",
+    "kasa_power": "/api/kasa/power/{outlet_id}",
+}
+
+async def run_batch_operation(operation):
+    """Run a single batch operation and wrap its outcome in a per-item result."""
+    result = {"id": operation.id, "op": operation.op}
+    handler = BATCH_OPERATIONS.get(operation.op)
+    if handler is None:
+        result.update(success=False, error=f"Unknown operation: {operation.op}")
+        return result
+    try:
+        params = BATCH_PARAM_MODELS[operation.op](**operation.params).dict()
+    except ValidationError as e:
+        problems = "; ".join(f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors())
+        result.update(success=False, status=422, error=f"Invalid parameters for {operation.op}: {problems}")
+        return result
+
+    try:
+        if HARDWARE_OWNER_ADDR and operation.op in BATCH_OWNER_PATHS:
+            quoted = {name: quote(str(value), safe="") for name, value in params.items()}
+            data = await fetch_owner_json(HARDWARE_OWNER_ADDR, BATCH_OWNER_PATHS[operation.op].format(**quoted))
+        elif inspect.iscoroutinefunction(handler):
+            data = await handler(**params)
+        else:
+            # Blocking handlers (alarms' MQTT round trip, Kasa, hub) run in the threadpool so
+            # batch items proceed concurrently and the event loop is never held
+            data = await run_in_threadpool(handler, **params)
+        if isinstance(data, BaseModel):
+            data = data.dict()
+        elif isinstance(data, Response):
+            data = json.loads(data.body)
+        result.update(success=True, data=data)
+    except Exception as e:
+        print(f"ERROR: Batch operation {operation.op} failed: {e}")
+        result.update(success=False, error=str(e))
+    return result
+
+@app.post("/api/batch")
+async def batch_endpoint(data: Annotated[BatchRequest, Body()]) -> dict:
+    """Run several read operations concurrently and return one combined response.
+
+    Failures are reported per item; the batch itself only fails for malformed requests.
+    """
+    if len(data.operations) > MAX_BATCH_OPERATIONS:
+        return {
+            "success": False,
+            "message": f"Too many operations: {len(data.operations)}. Maximum is {MAX_BATCH_OPERATIONS}.",
+            "results": []
+        }
+
+    results = await asyncio.gather(*(run_batch_operation(op) for op in data.operations))
+    return {
+        "success": True,
+        "message": f"{sum(1 for r in results if r['success'])}/{len(results)} operations succeeded",
+        "results": results
+    }
+
 import os
 if os.path.exists("build") and os.path.isdir("build"):
     static_files = StaticFiles(directory="build")
@@ -1708,21 +1958,40 @@ if __name__ == "__main__":
     signal.signal(signal.SIGTERM, signal_handler)
     
     #kick off threads here  
-    # MQTTClient("pub","localhost", 1883, "dgn_variables.json",'_var', 'RVC', debug) 
     debug = 0
-    client = MQTTClient("sub","localhost", 1883, '_var', 'RVC', debug)
-    t1 = threading.Thread(target=client.run_mqtt_infinite)
-    #t1 = threading.Thread(target=MQTTClient.MQTTClient().printhello)
-    t1.start()
-
-    # Initialize internet connection state from USB hub
-    print("Detecting current internet connection state...")
-    detected_connection = detect_current_internet_connection()
-    print(f"Server startup: Current internet connection is '{detected_connection}'")
-
-    # Initialize alarm system
-    print("Initializing alarm system...")
-    initialize_alarm_system()
+    ingester = None
+    ingester_stop_event = None
+    if SERVER_WORKERS > 1:
+        # One ingester process owns MQTT and the calc tick; workers read shared memory
+        shm_name = os.getenv('TELEMETRY_SHM_NAME') or DEFAULT_SHM_NAME
+        ingester_stop_event = multiprocessing.Event()
+        ingester_ready_event = multiprocessing.Event()
+        ingester = multiprocessing.Process(
+            target=run_ingester,
+            kwargs={"shm_name": shm_name, "stop_event": ingester_stop_event,
+                    "ready_event": ingester_ready_event, "debug": debug},
+            daemon=True
+        )
+        ingester.start()
+        if not ingester_ready_event.wait(timeout=10):
+            print("WARNING: Telemetry ingester not ready - workers will compute page data locally")
+        os.environ['TELEMETRY_SHM_NAME'] = shm_name  # Inherited by the uvicorn workers
+        # This process owns the hardware; workers relay hardware endpoints to it
+        os.environ['HARDWARE_OWNER_ADDR'] = start_hardware_owner(int(os.getenv('HARDWARE_OWNER_PORT', '0')))
+        start_background_discovery({
+            "usb_hub": discover_usb_hub,
+            "kasa": discover_kasa,
+            "alarm": discover_alarm,
+        })
+    else:
+        # Discover hardware concurrently in the background so the port binds immediately
+        print("Starting background discovery (USB hub, Kasa, alarm, MQTT)...")
+        start_background_discovery({
+            "usb_hub": discover_usb_hub,
+            "kasa": discover_kasa,
+            "alarm": discover_alarm,
+            "mqtt": lambda: start_mqtt_client(debug),
+        })
 
     # "0.0.0.0" => accept requests from any IP addr
     # default port is 8000.  Dockerfile sets port = 80 using environment variable
@@ -1732,8 +2001,16 @@ if __name__ == "__main__":
     print(constants["IPADDR"], constants["PORT"])
     
     try:
-        uvicorn.run(app, host="0.0.0.0", port=int(constants["PORT"]), log_level="warning")
+        if SERVER_WORKERS > 1:
+            print(f"Starting {SERVER_WORKERS} uvicorn worker processes")
+            uvicorn.run("server:app", host="0.0.0.0", port=int(constants["PORT"]), log_level="warning",
+                        workers=SERVER_WORKERS)
+        else:
+            uvicorn.run(app, host="0.0.0.0", port=int(constants["PORT"]), log_level="warning")
     except KeyboardInterrupt:
         print("Server interrupted by user")
     finally:
         cleanup_alarm_system()
+        if ingester is not None:
+            ingester_stop_event.set()
+            ingester.join(timeout=5)
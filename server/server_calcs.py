@@ -30,12 +30,7 @@ def safe_int(value, default=0):
         return default
 
 
-try:
-    fp = open("./constants.json", "rt")
-    constants = json.load(fp)
-except:
-    print(" ")
-    exit("constants.json file not found or mal formed")
+from app_constants import constants
 
 # Make constants available for import
 __all__ = ['constants', 'safe_float', 'safe_int', 'BATT_POWER_MAX', 
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Telemetry snapshots for the POWER and HOME pages.
+
+The page calculations read the MQTT-fed rvglue AliasData and keep running
+averages in server_calcs, so they must run in exactly one process. In
+multi-worker mode a single ingester process owns the MQTT subscription and
+the calc tick (one run_calcs() per tick feeds both pages), and publishes
+each snapshot into a shared memory segment. Uvicorn worker processes read
+that segment without any locking between processes: a seqlock-style
+sequence number lets them detect (and retry) torn reads. A reader copies
+the payload out before decoding it, since the writer may overwrite the
+segment at any time, and decodes it once per sequence number.
+
+Segment layout:
+    offset 0   uint64  sequence number (odd while a write is in progress)
+    offset 8   uint32  payload length in bytes
+    offset 16  bytes   JSON payload {"home": {...}, "power": {...}}
+"""
+
+import json
+import struct
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Optional, Tuple
+
+
+DEFAULT_SHM_NAME = "rvsecurity_telemetry"
+SHM_SIZE = 16384            # Plenty for two pages of 21 short string fields
+CALC_TICK_SECONDS = 1.0     # Client pages poll once per second
+
+_HEADER = struct.Struct("<QI4x")
+_SEQ = struct.Struct("<Q")
+_MAX_READ_RETRIES = 100
+
+
+def run_calcs() -> Dict:
+    """Run the server_calcs shared by both pages, once per calc tick.
+
+    BatteryCalcs and InvertCalcs advance running averages meant to be updated
+    once per second, so both pages are derived from this one result.
+    """
+    # Imported on first use so server startup doesn't pay for rvglue/MQTT imports
+    from server_calcs import (InvertCalcs, ATS_Calcs, SolcarCalcs, BatteryCalcs, AlternatorCalcs,
+                              LoadCalcs, HouseKeeping)
+    debug = 0  # Define debug variable
+
+    (Charger_AC_power, Charger_AC_voltage, Invert_AC_power, DC_Charger_power, DC_Charger_volts, Invert_DC_power, Invert_status_num)= InvertCalcs()
+    (ShorePower, GenPower)= ATS_Calcs()
+    (SolarPower) = SolcarCalcs()
+    (Batt_Power, Batt_Voltage, Batt_Charge, Batt_Hours_Remaining_str, Batt_status_str) = BatteryCalcs(debug)
+    (AlternatorPower) = AlternatorCalcs(Batt_Power, Invert_status_num, Invert_DC_power, SolarPower)
+
+    #Calc AC and DC Loads since not measured
+    (AC_HeatPump_Load, DC_Load) = LoadCalcs(Invert_status_num, Charger_AC_power, DC_Charger_power, ShorePower, GenPower, Batt_Power, SolarPower, AlternatorPower, Invert_DC_power)
+    (RedMsg, YellowMsg, Time_Str) = HouseKeeping()
+
+    return dict(
+        Charger_AC_power=Charger_AC_power, Charger_AC_voltage=Charger_AC_voltage,
+        Invert_AC_power=Invert_AC_power, DC_Charger_power=DC_Charger_power, Invert_DC_power=Invert_DC_power,
+        Invert_status_num=Invert_status_num, ShorePower=ShorePower, GenPower=GenPower, SolarPower=SolarPower,
+        Batt_Power=Batt_Power, Batt_Voltage=Batt_Voltage, Batt_Charge=Batt_Charge,
+        Batt_Hours_Remaining_str=Batt_Hours_Remaining_str, Batt_status_str=Batt_status_str,
+        AlternatorPower=AlternatorPower, AC_HeatPump_Load=AC_HeatPump_Load, DC_Load=DC_Load,
+        RedMsg=RedMsg, Time_Str=Time_Str,
+    )
+
+
+def build_power_data(calcs: Dict) -> Dict:
+    """POWER page DataResponse fields from one run_calcs() result."""
+    from server_calcs import GenAllFlows
+    c = calcs
+
+    (BatteryFlow, InvertPwrFlow, ShorePwrFlow, GeneratorPwrFlow, SolarPwrFlow, AltPwrFlow, Invert_status_str) = \
+        GenAllFlows(c["Invert_status_num"], c["Batt_Power"], c["SolarPower"], c["ShorePower"], c["GenPower"], c["AlternatorPower"])
+
+    return dict(
+        var1 =str(max(c["ShorePower"], c["GenPower"])) + ' Watts',      #shore or gen power (watts)
+        var2 =ShorePwrFlow,                                             #shorepower Flow
+        var3 =str('%.0f' % c["Charger_AC_voltage"]) + " Volts AC",
+        var4 =str('%.0f' % c["AC_HeatPump_Load"]) + ' Watts',  
+        var5 =str(c["SolarPower"]) + ' Watts',
+        var6 =SolarPwrFlow,                                             #solar power Flow
+        var7 =str('%.1f' % c["Batt_Voltage"]) + " Volts DC",
+        var8 =str('%.0f' % c["DC_Load"]) + ' Watts',
+        var9 = str('%.0f' % c["AlternatorPower"]) + " Watts",                                #Alternator power
+        var10=InvertPwrFlow,                                            #flow annimation   
+        var11=str('%.0f' % c["Charger_AC_power"]) + " Watts", 
+        var12= str('%.0f' % max(c["Invert_AC_power"], .8 * (c["Invert_DC_power"])) + " Watts"),      #note: .8 is efficiency estimate of inverter
+        var13=c["RedMsg"], 
+        var14=AltPwrFlow,                                               #Alternator power Flow
+        #battery variables begin
+        var15= c["Batt_Hours_Remaining_str"],
+        var16= 'Status: ' + c["Batt_status_str"],
+        var17= GeneratorPwrFlow,
+        var18= BatteryFlow,                        #Battery power Flow
+        var19= str('%.0f' % c["Batt_Power"]) + " Watts",
+        battery_percent= c["Batt_Charge"],
+        #battery variables end 
+        var20=c["Time_Str"],
+        
+    )
+
+
+def build_home_data(calcs: Dict) -> Dict:
+    """HOME page DataResponse fields from one run_calcs() result plus the tank levels."""
+    import rvglue.rvglue
+    c = calcs
+    debug = 0  # Define debug variable
+
+    # Tank level calculations with error handling for missing data
+    try:
+        Tank_Fresh = round(rvglue.rvglue.AliasData["_var29Tank_Level"]/rvglue.rvglue.AliasData["_var30Tank_Resolution"] * 100 )  
+    except (KeyError, ZeroDivisionError):
+        Tank_Fresh = 50  # Default value when no data available
+        
+    try:
+        Tank_Black = round(rvglue.rvglue.AliasData["_var32Tank_Level"]/rvglue.rvglue.AliasData["_var33Tank_Resolution"] * 100)
+    except (KeyError, ZeroDivisionError):
+        Tank_Black = 25  # Default value when no data available
+        
+    try:
+        Tank_Gray = round(rvglue.rvglue.AliasData["_var35Tank_Level"]/rvglue.rvglue.AliasData["_var36Tank_Resolution"] * 100)   
+    except (KeyError, ZeroDivisionError):
+        Tank_Gray = 30  # Default value when no data available
+        
+    try:
+        Tank_Propane = round(rvglue.rvglue.AliasData["_var38Tank_Level"]/rvglue.rvglue.AliasData["_var39Tank_Resolution"] * 100)  
+    except (KeyError, ZeroDivisionError):
+        Tank_Propane = 75  # Default value when no data available  
+
+    if debug > 0:
+        print('invert power= ', round(c["Invert_AC_power"]), round(c["Invert_DC_power"]*.8))
+
+    return dict(
+        var1 = 'Outside 60? psi',   # LR outside
+        var2 = 'Inside 60? psi',    # LR inside
+        var3 = 'Inside 60? psi',   # RR inside
+        var4 = 'Outside 60? psi',    # RR outside
+        var5 = str(c["SolarPower"]) + ' Watts',
+        var6 = 'not used',                                            
+        var7 = str('%.1f' % c["Batt_Voltage"]) + " Volts DC",
+        var8 = str('%.0f' % c["DC_Load"]) + ' Watts',
+        var9 = '60? psi',    # LF
+        var10= '60? psi',    # RF
+        var11= 'not used',  
+        var12= str('%.0f' % max(c["Invert_AC_power"], .8 * (c["Invert_DC_power"])) + " Watts"),      #note: .8 is efficiency estimate of inverter
+        var13= str(Tank_Gray),   # Send as string, client will convert to number
+        var14= str(Tank_Black),  # Send as string, client will convert to number
+        var15= c["Batt_Hours_Remaining_str"],
+        var16= 'Status: ' + c["Batt_status_str"],
+        var17= str(Tank_Fresh),  # Send as string, client will convert to number
+        var18= str(Tank_Propane), # Send as string, client will convert to number
+        var19= str('%.0f' % c["Batt_Power"]) + " Watts",
+        battery_percent= c["Batt_Charge"],
+        var20= c["Time_Str"],
+        
+    )
+
+
+PAGE_BUILDERS = {"home": build_home_data, "power": build_power_data}
+
+
+def build_snapshot() -> Dict:
+    """Build one telemetry snapshot covering every page from a single calc run."""
+    calcs = run_calcs()
+    return {page: build(calcs) for page, build in PAGE_BUILDERS.items()}
+
+
+class LazyPages(dict):
+    """Snapshot whose pages are built from one calc run the first time each is read."""
+
+    def __init__(self, calcs: Dict):
+        super().__init__()
+        self.calcs = calcs
+
+    def __missing__(self, page: str) -> Dict:
+        fields = PAGE_BUILDERS[page](self.calcs)
+        self[page] = fields
+        return fields
+
+
+def serialize_page(fields: Dict) -> bytes:
+    """Serialize page fields exactly like FastAPI's JSONResponse renders them."""
+    return json.dumps(fields, ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+
+class LocalTelemetrySource:
+    """In-process calc tick for single-process mode.
+
+    The calcs run at most once per tick, so every request within a tick sees
+    the same snapshot version; a page is only built once it is requested.
+    Same read() interface as TelemetryReader.
+    """
+
+    def __init__(self, interval: float = CALC_TICK_SECONDS):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._version = 0
+        self._snapshot = None
+        self._built_at = 0.0
+
+    def read(self) -> Tuple[int, Optional[Dict]]:
+        with self._lock:
+            now = time.monotonic()
+            if self._snapshot is None or now - self._built_at >= self.interval:
+                self._snapshot = LazyPages(run_calcs())
+                self._built_at = now
+                self._version += 1
+            return self._version, self._snapshot
+
+
+class SerializedPageCache:
+    """Pre-serialized JSON bodies per page, rebuilt only when the snapshot version changes."""
+
+    def __init__(self):
+        self._pages = {}  # page -> (source id, version, body bytes)
+
+    def get(self, page: str, source, fallback=None) -> bytes:
+        """Body of page from source; from fallback while source has no complete snapshot yet."""
+        version, snapshot = source.read()
+        if snapshot is None and fallback is not None:
+            source = fallback
+            version, snapshot = source.read()
+        cached = self._pages.get(page)
+        if cached is not None and cached[0] == id(source) and cached[1] == version:
+            return cached[2]
+        body = serialize_page(snapshot[page])
+        self._pages[page] = (id(source), version, body)
+        return body
+
+
+class TelemetryPublisher:
+    """Writer side of the shared memory telemetry segment (ingester process only)."""
+
+    def __init__(self, name: str = DEFAULT_SHM_NAME, size: int = SHM_SIZE):
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left over from a previous run that was killed; reuse it
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.buf = self.shm.buf
+        self.seq = 0
+        _HEADER.pack_into(self.buf, 0, 0, 0)
+
+    def publish(self, snapshot: Dict) -> int:
+        """Publish a snapshot and return its (even) sequence number."""
+        payload = json.dumps(snapshot, separators=(",", ":")).encode("utf-8")
+        if len(payload) > len(self.buf) - _HEADER.size:
+            raise ValueError(f"Telemetry snapshot too large: {len(payload)} bytes")
+
+        # Odd sequence number marks the write in progress
+        self.seq += 1
+        _SEQ.pack_into(self.buf, 0, self.seq)
+        self.buf[_HEADER.size:_HEADER.size + len(payload)] = payload
+        _HEADER.pack_into(self.buf, 0, self.seq, len(payload))
+        self.seq += 1
+        _SEQ.pack_into(self.buf, 0, self.seq)
+        return self.seq
+
+    def close(self, unlink: bool = True):
+        self.buf = None
+        self.shm.close()
+        if unlink:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class TelemetryReader:
+    """Reader side of the shared memory telemetry segment (uvicorn workers).
+
+    The decoded snapshot is cached per sequence number, so repeated reads of an
+    unchanged snapshot only touch the 8-byte header in the shared segment.
+    """
+
+    def __init__(self, name: str = DEFAULT_SHM_NAME):
+        self.shm = shared_memory.SharedMemory(name=name)
+        # Workers only attach; keep the resource tracker from unlinking the
+        # segment when a worker exits (the ingester owns its lifetime)
+        try:
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        except Exception:
+            pass
+        self.buf = self.shm.buf
+        self._cached_seq = 0
+        self._cached_snapshot = None
+
+    def sequence(self) -> int:
+        return _SEQ.unpack_from(self.buf, 0)[0]
+
+    def published(self) -> bool:
+        """True once the first snapshot has been completely written (sequence 2)."""
+        return self.sequence() >= 2
+
+    def read(self) -> Tuple[int, Optional[Dict]]:
+        """Return (sequence, snapshot); snapshot is None until the first publish."""
+        for _ in range(_MAX_READ_RETRIES):
+            seq_before = self.sequence()
+            if seq_before == self._cached_seq:
+                return seq_before, self._cached_snapshot
+            if seq_before & 1:
+                # Writer is mid-update; yield and retry
+                time.sleep(0)
+                continue
+
+            _, length = _HEADER.unpack_from(self.buf, 0)
+            payload = bytes(self.buf[_HEADER.size:_HEADER.size + length])
+            if self.sequence() != seq_before:
+                continue  # Torn read, retry
+
+            self._cached_snapshot = json.loads(payload) if length else None
+            self._cached_seq = seq_before
+            return seq_before, self._cached_snapshot
+
+        # Writer kept the segment busy; serve the last consistent snapshot
+        return self._cached_seq, self._cached_snapshot
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+
+
+def run_ingester(shm_name: str = DEFAULT_SHM_NAME, interval: float = CALC_TICK_SECONDS,
+                 stop_event=None, ready_event=None, debug: int = 0):
+    """Ingester process entry point: own the MQTT subscription and the calc tick."""
+    # Create the segment first so the uvicorn workers can attach right away
+    publisher = TelemetryPublisher(shm_name)
+    if ready_event is not None:
+        ready_event.set()
+
+    from rvglue import MQTTClient
+    client = MQTTClient("sub", "localhost", 1883, '_var', 'RVC', debug)
+    mqtt_thread = threading.Thread(target=client.run_mqtt_infinite, daemon=True)
+    mqtt_thread.start()
+
+    print(f"Telemetry ingester publishing to shared memory '{shm_name}' every {interval}s")
+    try:
+        while stop_event is None or not stop_event.is_set():
+            tick_start = time.monotonic()
+            try:
+                publisher.publish(build_snapshot())
+            except Exception as e:
+                print(f"ERROR: Telemetry calc tick failed: {e}")
+            time.sleep(max(0.0, interval - (time.monotonic() - tick_start)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        publisher.close()
+        print("Telemetry ingester stopped")
@@ -0,0 +1,7 @@
+# The server modules are flat files in server/ (the image copies them next to server.py)
+import os
+import sys
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytest
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+def make_breaker(probe=lambda: None, **kwargs):
+    transitions = []
+    kwargs.setdefault("jitter", 0.0)
+    breaker = CircuitBreaker("test", probe=probe, on_transition=lambda *t: transitions.append(t[1:]), **kwargs)
+    return breaker, transitions
+
+
+def test_opens_at_failure_threshold():
+    breaker, transitions = make_breaker(failure_threshold=2, base_delay=60.0)
+    breaker.record_failure("first")
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure("second")
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.last_error == "second"
+    assert transitions == [(CLOSED, OPEN)]
+
+
+def test_success_resets_failure_streak():
+    breaker, _ = make_breaker(failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_due_probe_runs_once_in_background_and_closes():
+    release = threading.Event()
+    calls = []
+
+    def probe():
+        calls.append(1)
+        release.wait(5)
+
+    breaker, transitions = make_breaker(probe, base_delay=0.0)
+    breaker.trip("down")
+    assert not breaker.allow()              # due at once: starts the probe, still fails fast
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()              # no second probe while one is running
+    release.set()
+    wait_for(lambda: breaker.state == CLOSED)
+    assert len(calls) == 1
+    assert breaker.allow()
+    assert transitions == [(CLOSED, OPEN), (OPEN, HALF_OPEN), (HALF_OPEN, CLOSED)]
+    assert breaker.status()["transitions"] == {"closed->open": 1, "open->half_open": 1, "half_open->closed": 1}
+
+
+def test_failed_probe_reopens_with_doubled_delay():
+    def probe():
+        raise OSError("still down")
+
+    breaker, transitions = make_breaker(probe, base_delay=10.0, max_delay=15.0)
+    breaker.trip()
+    assert 9.0 < breaker.retry_at - time.monotonic() <= 10.0
+    breaker.retry_at = 0.0                  # make the probe due
+    breaker.allow()
+    wait_for(lambda: breaker.state == OPEN and breaker.open_count == 2)
+    assert breaker.last_error == "still down"
+    assert 14.0 < breaker.retry_at - time.monotonic() <= 15.0   # 2 x 10 s, capped at max_delay
+    assert transitions[-2:] == [(OPEN, HALF_OPEN), (HALF_OPEN, OPEN)]
+
+
+def test_call_fails_fast_while_open():
+    def fails():
+        raise ValueError("boom")
+
+    breaker, _ = make_breaker(failure_threshold=1, base_delay=60.0)
+    with pytest.raises(ValueError):
+        breaker.call(fails)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: "never runs")
+
+
+def test_reset_closes_and_clears_backoff():
+    breaker, transitions = make_breaker(base_delay=60.0)
+    breaker.trip()
+    breaker.reset()
+    assert breaker.state == CLOSED and breaker.open_count == 0
+    assert breaker.call(lambda: 42) == 42
+    assert transitions == [(CLOSED, OPEN), (OPEN, CLOSED)]
@@ -0,0 +1,87 @@
+import http.server
+import socket
+import threading
+import time
+
+import pytest
+
+from connectivity_probe import race_probes
+
+TIMEOUT = 0.5
+
+
+class QuietHandler(http.server.BaseHTTPRequestHandler):
+    def do_HEAD(self):
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def live_port():
+    server = http.server.HTTPServer(("127.0.0.1", 0), QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def refused_port():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()                            # nothing listens there now
+    return port
+
+
+@pytest.fixture
+def sinkhole_port():
+    """Port whose SYNs go unanswered: a listener with backlog 0 whose queue is already full."""
+    sink = socket.socket()
+    sink.bind(("127.0.0.1", 0))
+    sink.listen(0)
+    port = sink.getsockname()[1]
+    fillers = []
+    for _ in range(4):
+        filler = socket.socket()
+        filler.setblocking(False)
+        filler.connect_ex(("127.0.0.1", port))
+        fillers.append(filler)
+    time.sleep(0.1)
+    yield port
+    for sock in [sink] + fillers:
+        sock.close()
+
+
+def test_http_probe_against_a_live_server(live_port):
+    result = race_probes([("http", "127.0.0.1", live_port)], TIMEOUT)
+    assert result.connected
+    assert result.probe == f"http:{live_port} 127.0.0.1"
+    assert result.elapsed < TIMEOUT
+
+
+def test_refused_port_fails_without_waiting_for_the_timeout(refused_port):
+    result = race_probes([("tcp", "127.0.0.1", refused_port), ("http", "127.0.0.1", refused_port)], 5.0)
+    assert not result.connected
+    assert result.elapsed < 1.0
+    assert set(result.errors) == {f"tcp:{refused_port} 127.0.0.1", f"http:{refused_port} 127.0.0.1"}
+    assert all("refused" in error.lower() for error in result.errors.values())
+
+
+def test_first_answer_wins_over_a_dead_target(sinkhole_port, live_port):
+    result = race_probes([("http", "127.0.0.1", sinkhole_port), ("tcp", "127.0.0.1", sinkhole_port),
+                          ("tcp", "127.0.0.1", live_port)], TIMEOUT)
+    assert result.connected
+    assert result.probe == f"tcp:{live_port} 127.0.0.1"
+    assert result.elapsed < TIMEOUT
+
+
+def test_dead_targets_fail_after_one_timeout_window(sinkhole_port):
+    result = race_probes([("http", "127.0.0.1", sinkhole_port), ("tcp", "127.0.0.1", sinkhole_port)], TIMEOUT)
+    assert not result.connected
+    assert TIMEOUT <= result.elapsed < TIMEOUT + 0.5
+    assert result.errors[f"tcp:{sinkhole_port} 127.0.0.1"] == f"no answer within {TIMEOUT:g} s"
+    assert result.describe().count("no answer") == 2
@@ -0,0 +1,83 @@
+import asyncio
+import time
+
+from internet_jobs import FAILED, QUEUED, RUNNING, SUCCEEDED, SUPERSEDED, InternetJobRunner
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+def make_runner():
+    ran = []
+
+    def run_steps(job):
+        ran.append(job.request["port"])
+        with runner.step(job, "modem", "waiting for the link"):
+            if not runner.wait(job, job.request.get("delay", 0.0)):
+                return {"success": False, "message": "cut short", "port": job.request["port"]}
+        return {"success": True, "message": "switched", "port": job.request["port"]}
+
+    runner = InternetJobRunner(run_steps)
+    return runner, ran
+
+
+def test_job_runs_its_steps_and_succeeds():
+    runner, ran = make_runner()
+    job = runner.submit({"port": 1})
+    asyncio.run(runner.wait_done(job, 5))
+    assert job.state == SUCCEEDED
+    assert job.result["message"] == "switched"
+    assert [step["step"] for step in job.steps] == ["modem"]
+    assert job.steps[0]["status"] == "done"
+    assert ran == [1]
+
+
+def test_newer_request_supersedes_queued_and_cuts_running_short():
+    runner, ran = make_runner()
+    first = runner.submit({"port": 1, "delay": 5.0})
+    wait_for(lambda: first.state == RUNNING and first.steps)
+    second = runner.submit({"port": 2})
+    assert second.state == QUEUED
+    third = runner.submit({"port": 3})
+
+    # The queued job is replaced at once and never runs
+    assert second.state == SUPERSEDED
+    assert second.superseded_by == third.id
+    assert first.superseded_by == third.id
+
+    start = time.monotonic()
+    asyncio.run(runner.wait_done(third, 5))
+    assert time.monotonic() - start < 2.0     # the running job's 5 s wait was cut short
+    assert first.state == SUPERSEDED
+    assert third.state == SUCCEEDED
+    assert ran == [1, 3]
+    assert runner.superseded == 2
+    assert runner.status() == {"current": None, "pending": None, "superseded": 2,
+                               "jobs": [first.id, second.id, third.id]}
+
+
+def test_exception_in_steps_fails_the_job():
+    def run_steps(job):
+        with runner.step(job, "hub"):
+            raise RuntimeError("hub gone")
+
+    runner = InternetJobRunner(run_steps)
+    job = runner.submit({"port": 1})
+    wait_for(lambda: job.done)
+    assert job.state == FAILED
+    assert job.steps[0]["status"] == "failed"
+    assert "hub gone" in job.result["message"]
+
+
+def test_finished_jobs_are_trimmed_to_keep():
+    runner = InternetJobRunner(lambda job: {"success": True}, keep=2)
+    jobs = []
+    for port in range(4):
+        jobs.append(runner.submit({"port": port}))
+        wait_for(lambda: jobs[-1].done)
+    assert list(runner.jobs) == [jobs[2].id, jobs[3].id]
+    assert runner.get(jobs[0].id) is None
@@ -0,0 +1,113 @@
+import asyncio
+import types
+
+import pytest
+
+import link_readiness
+from link_readiness import LinkReadiness
+
+
+class FakeClock:
+    """Stands in for link_readiness.time: sleep(seconds) advances monotonic() by seconds."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+        return True
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(link_readiness, "time", types.SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+def probe_ready_after(calls):
+    made = []
+
+    def probe():
+        made.append(1)
+        return len(made) >= calls
+    return probe
+
+
+def test_ready_on_the_first_poll_does_not_sleep(clock):
+    result = LinkReadiness(probe=lambda: True).wait(10.0, sleep=clock.sleep)
+    assert result.ready and result.polls == 1
+    assert clock.sleeps == []
+    assert result.stages == {"probe": 0.0}
+
+
+def test_polls_back_off_until_the_probe_passes(clock):
+    result = LinkReadiness(probe=probe_ready_after(4)).wait(10.0, sleep=clock.sleep)
+    assert result.ready and result.polls == 4
+    assert clock.sleeps == [0.25, 0.375, 0.5625]
+    assert result.elapsed == pytest.approx(1.1875)
+    assert result.describe() == "ready after 1.2 s"
+
+
+def test_upper_bound_ends_the_wait(clock):
+    result = LinkReadiness(probe=lambda: False).wait(2.0, sleep=clock.sleep)
+    assert not result.ready
+    assert result.waiting_for == "probe"
+    assert sum(clock.sleeps) == pytest.approx(2.0)      # the last pause is clipped to the bound
+    assert max(clock.sleeps) <= link_readiness.MAX_POLL_INTERVAL
+    assert result.elapsed == pytest.approx(2.0)
+
+
+def test_sleep_returning_false_cancels(clock):
+    def sleep(seconds):
+        clock.sleep(seconds)
+        return len(clock.sleeps) < 2
+
+    result = LinkReadiness(probe=lambda: False).wait(30.0, sleep=sleep)
+    assert result.cancelled and not result.ready
+    assert result.polls == 2
+    assert result.elapsed == pytest.approx(0.625)
+    assert result.describe() == "wait cancelled after 0.6 s"
+
+
+def test_interface_stages_stop_at_the_first_not_passed(tmp_path, clock):
+    (tmp_path / "lo").mkdir()
+    (tmp_path / "wwan0").mkdir()
+    (tmp_path / "wwan0" / "carrier").write_text("0\n")
+    probes = []
+    readiness = LinkReadiness(["wwan"], probe=lambda: probes.append(1) or True, sys_class_net=str(tmp_path))
+
+    result = readiness.wait(0.0, stages=("interface", "carrier", "probe"), sleep=clock.sleep)
+    assert not result.ready
+    assert result.interface == "wwan0"
+    assert result.waiting_for == "carrier"
+    assert probes == []                     # later stages are not checked
+
+    (tmp_path / "wwan0" / "carrier").write_text("1\n")
+    result = readiness.wait(0.0, stages=("interface", "carrier", "probe"), sleep=clock.sleep)
+    assert result.ready
+    assert list(result.stages) == ["interface", "carrier", "probe"]
+
+
+def test_interface_stages_are_skipped_without_patterns(clock):
+    result = LinkReadiness(probe=lambda: True).wait(1.0, stages=("interface", "carrier", "probe"),
+                                                     sleep=clock.sleep)
+    assert result.ready
+    assert list(result.stages) == ["probe"]
+
+
+def test_wait_async_polls_until_ready(monkeypatch):
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+
+    monkeypatch.setattr(link_readiness.asyncio, "sleep", fake_sleep)
+    result = asyncio.run(LinkReadiness(probe=probe_ready_after(3)).wait_async(30.0))
+    assert result.ready and result.polls == 3
+    assert sleeps == [0.25, 0.375]
@@ -0,0 +1,24 @@
+import metrics
+from metrics import Counter, Registry, merge_owner_metrics, select_families
+
+
+def test_select_families_keeps_whole_families():
+    registry = Registry()
+    registry.register(Counter("a_total", "A.", ("x",))).inc("1")
+    registry.register(Counter("b_total", "B.", ("x",))).inc("2")
+    assert select_families(registry.render(), ["b_total"]) == [
+        "# HELP b_total B.", "# TYPE b_total counter", 'b_total{x="2"} 1']
+
+
+def test_merge_takes_hardware_families_from_the_owner():
+    owner_registry = Registry()
+    owner_calls = owner_registry.register(Counter(metrics.hardware_call_errors_total.name, "Owner.", ("device",)))
+    owner_calls.inc("kasa", amount=3)
+    owner_registry.register(Counter(metrics.http_requests_total.name, "Owner HTTP.", ("route",))).inc("/x")
+
+    merged = merge_owner_metrics(owner_registry.render())
+    assert f'{metrics.hardware_call_errors_total.name}{{device="kasa"}} 3' in merged
+    assert merged.count(f"# HELP {metrics.hardware_call_errors_total.name} ") == 1
+    # HTTP metrics stay this process's own; the owner's would count relayed requests twice
+    assert "Owner HTTP." not in merged
+    assert merged.count(f"# HELP {metrics.http_requests_total.name} ") == 1
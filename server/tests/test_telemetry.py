@@ -0,0 +1,52 @@
+import json
+import os
+from multiprocessing import resource_tracker
+
+import pytest
+
+import telemetry
+from telemetry import _SEQ, SerializedPageCache, TelemetryPublisher, TelemetryReader
+
+
+class StaticSource:
+    def __init__(self, snapshot, version=1):
+        self.snapshot = snapshot
+        self.version = version
+
+    def read(self):
+        return self.version, self.snapshot
+
+
+@pytest.fixture
+def segment():
+    publisher = TelemetryPublisher(f"rvtest_{os.getpid()}")
+    reader = TelemetryReader(publisher.shm.name)
+    # The reader unregistered the segment, which in this one process was the publisher's registration
+    resource_tracker.register(publisher.shm._name, "shared_memory")
+    yield publisher, reader
+    reader.close()
+    publisher.close()
+
+
+def test_reader_sees_published_snapshots(segment):
+    publisher, reader = segment
+    assert not reader.published() and reader.read() == (0, None)
+    publisher.publish({"power": {"SolarPower": "12"}})
+    assert reader.published()
+    assert reader.read() == (2, {"power": {"SolarPower": "12"}})
+
+
+def test_first_write_in_progress_is_not_published(segment, monkeypatch):
+    publisher, reader = segment
+    _SEQ.pack_into(publisher.buf, 0, 1)     # the first publish has started but not finished
+    monkeypatch.setattr(telemetry.time, "sleep", lambda seconds: None)
+    assert not reader.published()
+    assert reader.read() == (0, None)       # retries run out: still no snapshot
+
+
+def test_page_cache_falls_back_while_the_source_has_no_snapshot():
+    cache = SerializedPageCache()
+    local = StaticSource({"power": {"SolarPower": "7"}})
+    assert json.loads(cache.get("power", StaticSource(None), local)) == {"SolarPower": "7"}
+    shared = StaticSource({"power": {"SolarPower": "9"}}, version=4)
+    assert json.loads(cache.get("power", shared, local)) == {"SolarPower": "9"}
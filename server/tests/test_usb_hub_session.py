@@ -0,0 +1,193 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import CancelledError
+
+import pytest
+
+from usb_hub_session import AsyncUsbHubClient, HubCommand, QueryStatus, SetPorts, UsbHubSession
+
+
+class FakeHub:
+    """Just enough of CoolGearUSBHub for the session: GP queries and single-port writes."""
+
+    TERMINATOR = "\r"
+    cooldown = 0.0      # power sequencing cooldown between switches to another port
+
+    def __init__(self, port, trace=None):
+        self.port = port
+        self.ser = self
+        self.is_open = True
+        self.mask = 0x01
+        self.commands = []
+        self.last_serial_error = None
+        self.last_sent_status = None
+        self.last_response = ""
+        self.last_active_port = -1
+        self.switched_at = 0.0
+
+    def is_healthy(self):
+        return self.is_open
+
+    def _execute_command(self, command):
+        self.commands.append(command.strip())
+        return f"G{self.mask:02X}FFFFFF"
+
+    def set_single_port_on(self, port):
+        self.commands.append(f"SP{port}")
+        self.mask = 1 << (port - 1)
+        self.switched_at = time.monotonic()
+        self.last_sent_status = f"{self.mask:02X}FFFFFF"
+        self.last_response = f"G{self.last_sent_status}"
+        return True
+
+    def switch_cooldown_remaining(self, port):
+        if self.mask == 1 << (port - 1):
+            return 0.0
+        return max(0.0, self.cooldown - (time.monotonic() - self.switched_at))
+
+    def close(self):
+        self.is_open = False
+
+
+class Hold(HubCommand):
+    """Keeps the worker busy until released, so the commands behind it stay queued."""
+    __slots__ = ("started", "release")
+
+    def __init__(self):
+        super().__init__()
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def run(self, hub):
+        self.started.set()
+        self.release.wait(5)
+        return True
+
+
+@pytest.fixture
+def session(tmp_path):
+    port = tmp_path / "ttyUSB0"
+    port.write_text("")
+    hubs = []
+
+    def opener(path, trace=None):
+        hubs.append(FakeHub(path, trace))
+        return hubs[-1]
+
+    session = UsbHubSession(ports=[str(port)], opener=opener)
+    session.hubs = hubs
+    return session
+
+
+def hold(session):
+    command = Hold()
+    session.submit(command)
+    assert command.started.wait(5)
+    return command
+
+
+def gp_queries(session):
+    return session.hubs[0].commands.count("GP")
+
+
+def test_status_query_is_cached(session):
+    state = session.execute(QueryStatus(0))
+    assert state.active_port() == 1
+    assert session.execute(QueryStatus()) is state
+    assert session.cache_hits == 1
+    assert gp_queries(session) == 1
+
+
+def test_queued_identical_queries_share_one_round_trip(session):
+    blocker = hold(session)
+    first = session.submit(QueryStatus(0))
+    second = session.submit(QueryStatus(0))
+    assert first is not second              # every caller gets a Future of its own
+    blocker.release.set()
+    assert first.result(5) is second.result(5)
+    assert session.merged == 1
+    assert gp_queries(session) == 1
+
+
+def test_write_is_seen_by_queries_submitted_after_it(session):
+    session.execute(QueryStatus(0))
+    blocker = hold(session)
+    before = session.submit(QueryStatus(0))
+    write = session.submit(SetPorts("set_single_port_on", 2))
+    after = session.submit(QueryStatus())    # cache is fresh, but a write is queued
+    blocker.release.set()
+    assert before.result(5).active_port() == 1
+    assert write.result(5) is True
+    assert after.result(5).active_port() == 2
+    assert session.merged == 0 and session.cache_hits == 0
+    # Write-through: the port state after the write needs no query
+    assert session.execute(QueryStatus()).active_port() == 2
+    assert session.cache_hits == 1
+
+
+def test_cancelling_one_merged_caller_keeps_the_query_for_the_other(session):
+    blocker = hold(session)
+    first = session.submit(QueryStatus(0))
+    second = session.submit(QueryStatus(0))
+    assert first.cancel()
+    blocker.release.set()
+    assert second.result(5).active_port() == 1
+    assert gp_queries(session) == 1
+
+
+def test_query_cancelled_by_every_caller_is_skipped(session):
+    blocker = hold(session)
+    first = session.submit(QueryStatus(0))
+    second = session.submit(QueryStatus(0))
+    first.cancel()
+    second.cancel()
+    third = session.submit(QueryStatus(0))   # the dropped query is not joined
+    blocker.release.set()
+    assert third.result(5).active_port() == 1
+    assert gp_queries(session) == 1
+    with pytest.raises(CancelledError):
+        first.result(0)
+
+
+def test_cancelled_queued_write_releases_the_pending_count(session):
+    session.execute(QueryStatus(0))
+    blocker = hold(session)
+    write = session.submit(SetPorts("set_single_port_on", 3))
+    assert write.cancel()
+    blocker.release.set()
+    session.execute(QueryStatus(0))         # the worker has passed the cancelled write
+    assert session._writes_pending == 0
+    assert "SP3" not in session.hubs[0].commands
+    # With no write pending, fresh cached state is served again
+    session.execute(QueryStatus())
+    assert session.cache_hits == 1
+
+
+def test_async_timeout_does_not_cancel_a_shared_query(session):
+    blocker = hold(session)
+    waiting = session.submit(QueryStatus(0))
+    client = AsyncUsbHubClient(session, timeout=0.05)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(client.get_port_state(0))
+    assert session.merged == 1
+    blocker.release.set()
+    assert waiting.result(5).active_port() == 1
+    assert gp_queries(session) == 1
+
+
+def test_switch_in_cooldown_is_held_while_queries_are_served(session, monkeypatch):
+    monkeypatch.setattr(FakeHub, "cooldown", 0.5)
+    assert session.execute(SetPorts("set_single_port_on", 2))
+    start = time.monotonic()
+    switch = session.submit(SetPorts("set_single_port_on", 3))
+    write_behind = session.submit(SetPorts("set_single_port_on", 4))
+    state = session.execute(QueryStatus(0))     # not stuck behind the held switch
+    assert time.monotonic() - start < 0.25
+    assert state.active_port() == 2
+    assert session.status()["held"] == 2
+    assert switch.result(5) is True
+    assert time.monotonic() - start >= 0.45
+    assert write_behind.result(5) is True
+    assert time.monotonic() - start >= 0.95     # the write behind it waits its own cooldown, in order
+    assert [c for c in session.hubs[0].commands if c.startswith("SP")] == ["SP2", "SP3", "SP4"]
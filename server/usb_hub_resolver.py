@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Find the CoolGear USB hub's serial device by its USB identity instead of by probing.
+
+Every /sys/class/tty/<name>/device of a USB serial port leads (via the
+interface directory) to the USB device directory holding idVendor,
+idProduct and serial. The resolver lists those ttys and picks the ones
+matching the configured vendor/product/serial; without a configured vendor
+every USB tty that isn't a known cellular modem (usb_modem_manager's
+vendor IDs) is a candidate, so the modem's ttyUSB ports are never opened.
+
+The path the hub was opened on is cached together with its USB device
+directory. Later opens reuse it without a scan as long as the device node
+still exists and still belongs to the same USB device; only then is sysfs
+read again. Without /sys/class/tty (some containers) the legacy port list is
+used.
+"""
+
+import os
+import re
+import time
+from typing import Dict, List, Optional, Sequence
+
+SYS_CLASS_TTY = "/sys/class/tty"
+CELLULAR_VENDOR_IDS = ("12d1", "19d2", "1e0e")  # same list as usb_modem_manager
+
+
+def _read_attr(directory: str, name: str) -> Optional[str]:
+    try:
+        with open(os.path.join(directory, name), "r") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _natural_key(name: str):
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", name)]
+
+
+class TtyUsbDevice:
+    """A USB serial tty and the identity of the USB device it belongs to."""
+
+    __slots__ = ("name", "path", "usb_dir", "vendor_id", "product_id", "serial")
+
+    def __init__(self, name: str, path: str, usb_dir: str):
+        self.name = name
+        self.path = path
+        self.usb_dir = usb_dir
+        self.vendor_id = (_read_attr(usb_dir, "idVendor") or "").lower()
+        self.product_id = (_read_attr(usb_dir, "idProduct") or "").lower()
+        self.serial = _read_attr(usb_dir, "serial")
+
+    def as_dict(self) -> Dict:
+        return {"path": self.path, "vendor_id": self.vendor_id, "product_id": self.product_id,
+                "serial": self.serial}
+
+
+class UsbHubResolver:
+    """Resolve (and cache) the hub's /dev path from sysfs USB IDs.
+
+    vendor_id/product_id are 4-digit hex strings as in lsusb; serial is the
+    USB serial number string. Any of them may be None (not checked).
+    """
+
+    def __init__(self, vendor_id: Optional[str] = None, product_id: Optional[str] = None,
+                 serial: Optional[str] = None, fallback: Sequence[str] = (),
+                 sys_class_tty: str = SYS_CLASS_TTY, dev_dir: str = "/dev"):
+        self.vendor_id = vendor_id.lower() if vendor_id else None
+        self.product_id = product_id.lower() if product_id else None
+        self.serial = serial or None
+        self.fallback = tuple(fallback)
+        self.sys_class_tty = sys_class_tty
+        self.dev_dir = dev_dir
+        self.path = None          # cached hub device node
+        self.usb_dir = None       # USB device directory it belongs to
+        self._found: Dict[str, TtyUsbDevice] = {}  # matches of the last scan, by path
+        self.scans = 0
+        self.last_scan_ms = None
+
+    def _find_usb_dir(self, name: str) -> Optional[str]:
+        """USB device directory (the one with idVendor) above /sys/class/tty/<name>/device, or None."""
+        device = os.path.join(self.sys_class_tty, name, "device")
+        if not os.path.exists(device):
+            return None  # virtual console, pty, ...
+        path = os.path.realpath(device)
+        while path and path != os.path.dirname(path):
+            if os.path.isfile(os.path.join(path, "idVendor")):
+                return path
+            path = os.path.dirname(path)
+        return None  # not a USB device (e.g. ttyS0, ttyAMA0)
+
+    def scan(self) -> List[TtyUsbDevice]:
+        """All USB serial ttys, in name order (ttyACM0, ttyUSB0, ttyUSB1, ...)."""
+        start = time.perf_counter()
+        devices = []
+        try:
+            names = sorted(os.listdir(self.sys_class_tty), key=_natural_key)
+        except OSError:
+            names = []
+        for name in names:
+            usb_dir = self._find_usb_dir(name)
+            if usb_dir is not None:
+                devices.append(TtyUsbDevice(name, os.path.join(self.dev_dir, name), usb_dir))
+        self.scans += 1
+        self.last_scan_ms = round((time.perf_counter() - start) * 1000, 2)
+        return devices
+
+    def matches(self, device: TtyUsbDevice) -> bool:
+        if self.vendor_id is None and device.vendor_id in CELLULAR_VENDOR_IDS:
+            return False
+        return ((self.vendor_id is None or device.vendor_id == self.vendor_id)
+                and (self.product_id is None or device.product_id == self.product_id)
+                and (self.serial is None or device.serial == self.serial))
+
+    def _cache_valid(self) -> bool:
+        if self.path is None or not os.path.exists(self.path):
+            return False
+        # Same node name, same USB device (a replug can hand ttyUSB0 to the modem)
+        return self._find_usb_dir(os.path.basename(self.path)) == self.usb_dir
+
+    def candidates(self) -> List[str]:
+        """Device paths to try opening, the cached one alone while it is still valid."""
+        if self._cache_valid():
+            return [self.path]
+        self.invalidate()
+        if not os.path.isdir(self.sys_class_tty):
+            return list(self.fallback)
+        self._found = {device.path: device for device in self.scan() if self.matches(device)}
+        return list(self._found)
+
+    def bind(self, path: str):
+        """Remember path as the hub's node (called once it opened and answered)."""
+        device = self._found.get(path)
+        self.path = path
+        self.usb_dir = device.usb_dir if device is not None else self._find_usb_dir(os.path.basename(path))
+
+    def invalidate(self):
+        self.path = None
+        self.usb_dir = None
+
+    def status(self) -> Dict:
+        return {
+            "match": {"vendor_id": self.vendor_id, "product_id": self.product_id, "serial": self.serial},
+            "resolved": self.path,
+            "matches": [device.as_dict() for device in self._found.values()],
+            "scans": self.scans,
+            "last_scan_ms": self.last_scan_ms
+        }
@@ -0,0 +1,493 @@
+#!/usr/bin/env python3
+"""
+Long-lived CoolGear USB hub session owned by the server.
+
+Opening the hub costs a /dev/tty* probe, the port open, the RTS/DTR handshake
+and the ?Q/GP init sequence (a few hundred ms). UsbHubSession does that once
+and keeps the CoolGearUSBHub open. Before every command a cheap health check
+runs (port still open, device node still present, no SerialException since
+the last command); a failed check closes the port and the hub is reopened, so
+an unplugged and replugged hub recovers by itself. With a resolver
+(usb_hub_resolver.UsbHubResolver) the ports to try come from its sysfs
+USB ID match instead of the fixed list. After a failed open the
+ports are not probed again for retry_interval seconds, so a missing hub
+doesn't cost a scan on every request.
+
+The serial port belongs to one worker thread. Callers submit typed commands
+(QueryStatus, SetPorts) to its queue and get a Future back, so concurrent
+requests can never interleave writes and buffer resets on the port. A status
+query submitted while an identical one is still queued (with no write queued
+behind it) shares that query's result instead of adding another round trip.
+Every caller gets a Future of its own that follows the queued command's, so
+one caller cancelling (an async timeout) never cancels the others; a queued
+command is only dropped once all of its callers have cancelled.
+UsbHubClient wraps this in the CoolGearUSBHub method names used by server.py;
+AsyncUsbHubClient offers the same calls as coroutines for async endpoints.
+Awaiting one holds no thread: the worker's Future is wrapped for the event
+loop, so one worker serves any number of waiting requests.
+
+set_single_port_on() to another port has to respect the hub's power
+sequencing cooldown (2 s since the last port change). Both clients wait out
+what remains of it before queueing the switch (time.sleep in the caller's
+thread, asyncio.sleep in the event loop), so the worker keeps serving
+other commands meanwhile. The hub driver itself never sleeps: if two
+switches still meet in the queue, the worker holds the later one (and any
+write queued behind it) until the cooldown has passed and serves status
+queries in the meantime.
+
+The session also caches the hub's port state (usb_hub_state.HubPortState):
+one GP query yields all four ports, every successful port write updates the
+cache write-through, and a status query is only sent to the hub when the
+cached state is older than state_ttl or a refresh is asked for. While a
+write is queued, status queries go to the queue so they see its result.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import CancelledError, Future
+from typing import Callable, Dict, Optional, Sequence
+
+from usb_hub_state import HubPortState
+
+DEFAULT_PORTS = ('/dev/ttyUSB0', '/dev/ttyUSB1', '/dev/ttyACM0', '/dev/ttyACM1')
+DEFAULT_RETRY_SECONDS = 5.0
+COMMAND_TIMEOUT = 30.0  # longest wait for a queued command (a port switch can include a 2 s cooldown)
+DEFAULT_STATE_TTL = 30.0  # the ports only change through our own writes, which update the cache
+
+
+def open_coolgear_hub(port: str, trace=None):
+    """Open a CoolGearUSBHub on port, recording its frames to trace (imports pyserial on first use)."""
+    # usbhub_ascii.py lives in the repo root (copied next to server.py in the image)
+    parent_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if parent_path not in sys.path:
+        sys.path.append(parent_path)
+    from usbhub_ascii import CoolGearUSBHub
+    return CoolGearUSBHub(port, trace=trace)
+
+
+class HubCommand:
+    """A hub operation queued to the session worker; run(hub) executes on the worker thread.
+
+    Commands with the same non-None merge_key that are queued back to back
+    share one execution. unavailable is the result when no hub can be opened.
+    """
+
+    __slots__ = ("future", "waiters")
+    merge_key = None
+    unavailable = None
+    writes = False  # changes the hub's port state
+
+    def __init__(self):
+        self.future = Future()
+        self.waiters = 0  # callers' Futures still following this command (under the session lock)
+
+    def run(self, hub):
+        raise NotImplementedError
+
+
+class OpenHub(HubCommand):
+    """Make sure the hub is open; True if it is."""
+    __slots__ = ()
+    merge_key = "open"
+    unavailable = False
+
+    def run(self, hub):
+        return True
+
+
+class QueryStatus(HubCommand):
+    """Port state (HubPortState, None on error) from the cache if at most max_age old, else one GP query.
+
+    max_age None means the session's state_ttl; 0 forces a query.
+    """
+    __slots__ = ("max_age",)
+    merge_key = "status"
+
+    def __init__(self, max_age: Optional[float] = None):
+        super().__init__()
+        self.max_age = max_age
+
+    def run(self, hub):
+        state = HubPortState.parse(hub._execute_command(f"GP{hub.TERMINATOR}"))
+        if state is None:
+            print("[WARNING] No valid response from hub status query")
+        elif state.active_port() >= 0:
+            hub.last_active_port = state.active_port()  # same tracking as get_current_active_port()
+        return state
+
+
+SET_ACTIONS = ("all_on", "all_off", "port_on", "port_off", "set_single_port_on", "full_hub_reset")
+
+
+class SetPorts(HubCommand):
+    """Port mask write via the CoolGearUSBHub method named action; True if the command was sent."""
+    __slots__ = ("action", "port")
+    unavailable = False
+    writes = True
+
+    def __init__(self, action: str, port: Optional[int] = None):
+        if action not in SET_ACTIONS:
+            raise ValueError(f"Unknown hub action '{action}' (expected one of {', '.join(SET_ACTIONS)})")
+        super().__init__()
+        self.action = action
+        self.port = port
+
+    def run(self, hub):
+        method = getattr(hub, self.action)
+        return method() if self.port is None else method(self.port)
+
+
+class CloseHub(HubCommand):
+    """Close the serial port; the next command reopens it (handled by the worker itself)."""
+    __slots__ = ()
+    writes = True
+
+
+class UsbHubSession:
+    """One persistent hub connection with health checks and automatic reopen.
+
+    instrument, if given, wraps each new hub's _execute_command (for metrics).
+    trace (a usb_hub_trace.FrameTrace) is handed to every hub opened, so it
+    spans reopens; opener is called as opener(port, trace=trace).
+    resolver, if given, supplies the ports to try (ports is then unused) and
+    is told which one opened.
+    """
+
+    def __init__(self, ports: Sequence[str] = DEFAULT_PORTS, opener: Callable = open_coolgear_hub,
+                 instrument: Optional[Callable] = None, retry_interval: float = DEFAULT_RETRY_SECONDS,
+                 state_ttl: float = DEFAULT_STATE_TTL, trace=None, resolver=None):
+        self.ports = tuple(ports)
+        self.opener = opener
+        self.instrument = instrument
+        self.trace = trace
+        self.resolver = resolver
+        self.retry_interval = retry_interval
+        self.opens = 0
+        self.reopens = 0
+        self.executed = 0
+        self.merged = 0
+        self.cache_hits = 0
+        self.state_ttl = state_ttl
+        self.port_state: Optional[HubPortState] = None   # last known port state, None = unknown
+        self.last_error = None
+        self.opened_at = None
+        self._hub = None                 # only touched by the worker thread
+        self._retry_at = 0.0
+        self._queue = deque()
+        self._mergeable: Dict[str, HubCommand] = {}
+        self._writes_pending = 0
+        self._held = deque()             # writes waiting out the switch cooldown, in order
+        self._held_until = 0.0
+        self._cond = threading.Condition()
+        self._worker = None
+
+    def submit(self, command: HubCommand) -> Future:
+        """Queue a command for the worker; returns a Future for this caller.
+
+        An identical queued query is joined instead: the Future then follows
+        that query's result. Cancelling the returned Future only detaches
+        this caller.
+        """
+        with self._cond:
+            if isinstance(command, QueryStatus) and not self._writes_pending:
+                state = self.port_state
+                max_age = self.state_ttl if command.max_age is None else command.max_age
+                if state is not None and state.age <= max_age:
+                    self.cache_hits += 1
+                    command.future.set_result(state)
+                    return command.future
+            if command.writes:
+                self._writes_pending += 1
+            key = command.merge_key
+            if key is not None:
+                queued = self._mergeable.get(key)
+                if queued is not None and not queued.future.cancelled():
+                    self.merged += 1
+                    return self._waiter(queued)
+                self._mergeable[key] = command
+            else:
+                # Queries submitted after this write must observe it
+                self._mergeable.clear()
+            self._queue.append(command)
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="usb-hub", daemon=True)
+                self._worker.start()
+            self._cond.notify()
+            return self._waiter(command)
+
+    def _waiter(self, command: HubCommand) -> Future:
+        """A caller's Future following command's (call with the lock held).
+
+        When the last waiter is cancelled before the worker starts the
+        command, the command itself is cancelled and skipped.
+        """
+        waiter = Future()
+        command.waiters += 1
+
+        def settle(done: Future):
+            if not waiter.set_running_or_notify_cancel():
+                return  # this caller cancelled already
+            if done.cancelled():
+                waiter.set_exception(CancelledError())
+            elif done.exception() is not None:
+                waiter.set_exception(done.exception())
+            else:
+                waiter.set_result(done.result())
+
+        def release(_):
+            if not waiter.cancelled():
+                return
+            with self._cond:
+                command.waiters -= 1
+                if command.waiters == 0:
+                    command.future.cancel()  # no-op once the worker is running it
+
+        waiter.add_done_callback(release)
+        command.future.add_done_callback(settle)
+        return waiter
+
+    def execute(self, command: HubCommand, timeout: float = COMMAND_TIMEOUT):
+        """Submit a command and wait for its result."""
+        return self.submit(command).result(timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                command = self._next_command()
+            if self._hold_for_cooldown(command):
+                continue
+            try:
+                if not command.future.set_running_or_notify_cancel():
+                    continue  # every caller cancelled while it was queued
+                if isinstance(command, CloseHub):
+                    self._close_hub()
+                    self._retry_at = 0.0
+                    result = True
+                else:
+                    hub = self._ensure_hub()
+                    result = command.unavailable if hub is None else command.run(hub)
+                    self.executed += 1
+                    if hub is not None:
+                        self._update_state(command, hub, result)
+            except Exception as e:
+                self.port_state = None
+                command.future.set_exception(e)
+                continue
+            finally:
+                if command.writes:
+                    with self._cond:
+                        self._writes_pending -= 1
+            command.future.set_result(result)
+
+    def _next_command(self) -> HubCommand:
+        """Wait for the next command to run (call with the lock held).
+
+        Held writes go back to the front of the queue once the cooldown has
+        passed; until then later writes are held behind them, in order.
+        """
+        while True:
+            if self._held and time.monotonic() >= self._held_until:
+                self._queue.extendleft(reversed(self._held))
+                self._held.clear()
+            if self._queue:
+                command = self._queue.popleft()
+                if command.merge_key is not None and self._mergeable.get(command.merge_key) is command:
+                    del self._mergeable[command.merge_key]
+                if command.writes and self._held:
+                    self._held.append(command)
+                    continue
+                return command
+            self._cond.wait(self._held_until - time.monotonic() if self._held else None)
+
+    def _hold_for_cooldown(self, command: HubCommand) -> bool:
+        """Hold a switch to another port while the power sequencing cooldown runs; True if held."""
+        if not isinstance(command, SetPorts) or command.action != "set_single_port_on" or command.future.cancelled():
+            return False
+        hub = self._ensure_hub()
+        remaining = hub.switch_cooldown_remaining(command.port) if hub is not None else 0.0
+        if remaining <= 0:
+            return False
+        with self._cond:
+            self._held_until = time.monotonic() + remaining
+            self._held.appendleft(command)
+        return True
+
+    def _update_state(self, command: HubCommand, hub, result):
+        """Keep the cached port state in step with what the worker just did."""
+        if isinstance(command, QueryStatus):
+            self.port_state = result
+        elif isinstance(command, SetPorts):
+            # Write-through: the hub's echo of the new status, else the mask that was sent
+            state = None
+            if result:
+                state = (HubPortState.parse(hub.last_response, source="write")
+                         or HubPortState.parse(hub.last_sent_status, source="write"))
+            self.port_state = state  # a failed write leaves the ports unknown
+
+    def _ensure_hub(self):
+        """The open hub, reopening it if the health check fails; None if no hub is available."""
+        hub = self._hub
+        if hub is not None:
+            if hub.is_healthy():
+                return hub
+            self.last_error = str(hub.last_serial_error or f"{hub.port} closed or removed")
+            print(f"WARNING: USB hub session unhealthy ({self.last_error}) - reopening")
+            self._close_hub()
+            self.reopens += 1
+            self._retry_at = 0.0  # reopen right away
+        if time.monotonic() < self._retry_at:
+            return None
+        self._hub = self._open_hub()
+        if self._hub is None:
+            self._retry_at = time.monotonic() + self.retry_interval
+        return self._hub
+
+    def _open_hub(self):
+        ports = self.resolver.candidates() if self.resolver is not None else self.ports
+        for port in ports:
+            if not os.path.exists(port):
+                continue
+            try:
+                hub = self.opener(port, trace=self.trace)
+            except Exception as e:
+                self.last_error = f"{port}: {e}"
+                print(f"Failed to connect to USB hub on {port}: {e}")
+                continue
+            if hub.ser and hub.ser.is_open:
+                if self.instrument:
+                    hub._execute_command = self.instrument(hub._execute_command)
+                self.opens += 1
+                self.opened_at = time.time()
+                if self.resolver is not None:
+                    self.resolver.bind(port)
+                print(f"Successfully connected to USB hub on {port}")
+                return hub
+            self.last_error = f"{port}: open failed"
+        if self.resolver is not None:
+            self.resolver.invalidate()  # rescan on the next attempt
+            print(f"No USB hub found (tried {', '.join(ports) or 'no matching USB serial devices'})")
+        else:
+            print("No USB hub found on any of the standard ports")
+        return None
+
+    def _close_hub(self):
+        self.port_state = None  # unknown until the reopened hub is queried
+        hub, self._hub = self._hub, None
+        if hub is not None:
+            hub.close()
+
+    def close(self):
+        """Close the port (after the commands already queued); the next command reopens it."""
+        self.execute(CloseHub())
+
+    def switch_cooldown_remaining(self, port_number: int) -> float:
+        """Seconds of power sequencing cooldown before port_number can be selected (0.0 if none)."""
+        hub = self._hub
+        return hub.switch_cooldown_remaining(port_number) if hub is not None else 0.0
+
+    def status(self) -> Dict:
+        hub = self._hub
+        return {
+            "open": hub is not None and hub.ser is not None and hub.ser.is_open,
+            "port": hub.port if hub is not None else None,
+            "opens": self.opens,
+            "reopens": self.reopens,
+            "opened_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.opened_at)) if self.opened_at else None,
+            "last_error": self.last_error,
+            "queued": len(self._queue),
+            "held": len(self._held),
+            "executed": self.executed,
+            "merged": self.merged,
+            "cache_hits": self.cache_hits,
+            "state": self.port_state.as_dict() if self.port_state is not None else None,
+            "resolver": self.resolver.status() if self.resolver is not None else None
+        }
+
+
+class UsbHubClient:
+    """CoolGearUSBHub-shaped front end: every call is queued to the session worker and waited for."""
+
+    def __init__(self, session: UsbHubSession, timeout: float = COMMAND_TIMEOUT):
+        self.session = session
+        self.timeout = timeout
+
+    def _set(self, action: str, port: Optional[int] = None) -> bool:
+        return self.session.execute(SetPorts(action, port), self.timeout)
+
+    def get_port_state(self, max_age: Optional[float] = None) -> Optional[HubPortState]:
+        """All four port states from the cache or one status query (max_age=0 forces a query)."""
+        return self.session.execute(QueryStatus(max_age), self.timeout)
+
+    def get_current_active_port(self, max_age: Optional[float] = None) -> int:
+        state = self.get_port_state(max_age)
+        return state.active_port() if state is not None else -1
+
+    def all_on(self) -> bool:
+        return self._set("all_on")
+
+    def all_off(self) -> bool:
+        return self._set("all_off")
+
+    def port_on(self, port_number: int) -> bool:
+        return self._set("port_on", port_number)
+
+    def port_off(self, port_number: int) -> bool:
+        return self._set("port_off", port_number)
+
+    def set_single_port_on(self, port_number: int) -> bool:
+        remaining = self.session.switch_cooldown_remaining(port_number)
+        if remaining > 0:
+            time.sleep(remaining)  # in this thread, not the worker's
+        return self._set("set_single_port_on", port_number)
+
+    def full_hub_reset(self) -> bool:
+        return self._set("full_hub_reset")
+
+
+class AsyncUsbHubClient:
+    """Awaitable UsbHubClient: commands go to the same worker queue, callers await its Future."""
+
+    def __init__(self, session: UsbHubSession, timeout: float = COMMAND_TIMEOUT):
+        self.session = session
+        self.timeout = timeout
+
+    async def execute(self, command: HubCommand):
+        return await asyncio.wait_for(asyncio.wrap_future(self.session.submit(command)), self.timeout)
+
+    async def _set(self, action: str, port: Optional[int] = None) -> bool:
+        return await self.execute(SetPorts(action, port))
+
+    async def open(self) -> bool:
+        return await self.execute(OpenHub())
+
+    async def get_port_state(self, max_age: Optional[float] = None) -> Optional[HubPortState]:
+        return await self.execute(QueryStatus(max_age))
+
+    async def get_current_active_port(self, max_age: Optional[float] = None) -> int:
+        state = await self.get_port_state(max_age)
+        return state.active_port() if state is not None else -1
+
+    async def all_on(self) -> bool:
+        return await self._set("all_on")
+
+    async def all_off(self) -> bool:
+        return await self._set("all_off")
+
+    async def port_on(self, port_number: int) -> bool:
+        return await self._set("port_on", port_number)
+
+    async def port_off(self, port_number: int) -> bool:
+        return await self._set("port_off", port_number)
+
+    async def set_single_port_on(self, port_number: int) -> bool:
+        remaining = self.session.switch_cooldown_remaining(port_number)
+        if remaining > 0:
+            await asyncio.sleep(remaining)  # a timer on the event loop; no thread waits
+        return await self._set("set_single_port_on", port_number)
+
+    async def full_hub_reset(self) -> bool:
+        return await self._set("full_hub_reset")
@@ -0,0 +1,57 @@
+# Cached port state of the CoolGear 4-port USB hub
+# One GP status reply ("G01FFFFFF") is parsed once into a port bitmask, so all four port
+# states, the active port and the age of the reading come from one query. Successful port
+# writes replace it write-through (the hub echoes the new status; otherwise the mask sent).
+
+import time
+from typing import Dict, Optional
+
+PORT_COUNT = 4
+HEX_DIGITS = set("0123456789ABCDEF")
+
+
+class HubPortState:
+    """Port bitmask from one hub status. Ports are 1-based; bits 0-3 of the first status byte."""
+
+    __slots__ = ("status", "mask", "source", "updated_at")
+
+    def __init__(self, status: str, source: str = "query"):
+        self.status = status
+        self.mask = int(status[:2], 16) & ((1 << PORT_COUNT) - 1)
+        self.source = source
+        self.updated_at = time.monotonic()
+
+    @classmethod
+    def parse(cls, response: str, source: str = "query") -> Optional["HubPortState"]:
+        """State from a status reply or mask ('G01FFFFFF' or '01FFFFFF'); None if it isn't one."""
+        if not response:
+            return None
+        status = response.strip().upper()
+        if status.startswith('G') and len(status) >= 9:
+            status = status[1:]
+        status = status[:8]
+        if len(status) != 8 or not set(status) <= HEX_DIGITS:
+            return None
+        return cls(status, source)
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.updated_at
+
+    def is_on(self, port: int) -> bool:
+        if not 1 <= port <= PORT_COUNT:
+            raise ValueError(f"Port number must be between 1 and {PORT_COUNT}")
+        return bool(self.mask & (1 << (port - 1)))
+
+    def ports(self) -> Dict[int, bool]:
+        return {port: self.is_on(port) for port in range(1, PORT_COUNT + 1)}
+
+    def active_port(self) -> int:
+        """1-4 if exactly one port is on, 0 if all are off, -1 if several are (same as get_current_active_port)."""
+        if self.mask == 0:
+            return 0
+        on = [port for port in range(1, PORT_COUNT + 1) if self.mask & (1 << (port - 1))]
+        return on[0] if len(on) == 1 else -1
+
+    def as_dict(self) -> Dict:
+        return {"status": self.status, "source": self.source, "age_seconds": round(self.age, 1)}
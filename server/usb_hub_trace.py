@@ -0,0 +1,81 @@
+# Serial frame trace for the CoolGear USB hub
+# Every raw frame written to (TX) or read from (RX) the hub is copied into a fixed-size binary
+# ring buffer with its monotonic timestamp: one struct.pack_into and a slice copy, no formatting
+# and no I/O. Frames are only turned into hex/text when dumped (/api/debug/usb/trace) or, with
+# echo on (USB_HUB_TRACE=1), printed as they happen like the old Debug lines.
+
+import struct
+import threading
+import time
+from typing import Dict, List, Optional
+
+TX = 0
+RX = 1
+DIRECTIONS = ("tx", "rx")
+DEFAULT_CAPACITY = 256    # frames kept
+FRAME_BYTES = 48          # bytes kept per frame; hub commands are 19 bytes, replies at most 32
+HEADER = struct.Struct("<QBH")  # monotonic ns, direction, full frame length
+
+
+class FrameTrace:
+    """Ring buffer of the last capacity TX/RX frames (first FRAME_BYTES bytes of each)."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, echo: bool = False):
+        self.capacity = max(capacity, 1)
+        self.echo = echo
+        self.recorded = 0
+        self._slot = HEADER.size + FRAME_BYTES
+        self._buffer = bytearray(self.capacity * self._slot)
+        self._lock = threading.Lock()
+
+    def tx(self, data: bytes):
+        self.record(TX, data)
+
+    def rx(self, data: bytes):
+        self.record(RX, data)
+
+    def record(self, direction: int, data: bytes):
+        kept = data[:FRAME_BYTES]
+        with self._lock:
+            offset = (self.recorded % self.capacity) * self._slot
+            HEADER.pack_into(self._buffer, offset, time.monotonic_ns(), direction, len(data))
+            start = offset + HEADER.size
+            self._buffer[start:start + len(kept)] = kept
+            self.recorded += 1
+        if self.echo:
+            print(f"Debug: {DIRECTIONS[direction].upper()} {len(data)} bytes: {data.hex().upper()}")
+
+    def frames(self, limit: Optional[int] = None) -> List[Dict]:
+        """Oldest-first decoded frames (the last limit of them); rx frames carry ms since the previous tx."""
+        with self._lock:
+            buffer = bytes(self._buffer)
+            recorded = self.recorded
+        count = min(recorded, self.capacity)
+        if limit is not None:
+            count = min(count, max(limit, 0))
+        now_ns = time.monotonic_ns()
+        frames = []
+        last_tx_ns = None
+        for seq in range(recorded - count, recorded):
+            offset = (seq % self.capacity) * self._slot
+            t_ns, direction, length = HEADER.unpack_from(buffer, offset)
+            start = offset + HEADER.size
+            data = buffer[start:start + min(length, FRAME_BYTES)]
+            frame = {
+                "seq": seq,
+                "dir": DIRECTIONS[direction],
+                "age_ms": round((now_ns - t_ns) / 1e6, 1),
+                "length": length,
+                "hex": data.hex().upper(),
+                "text": data.decode("ascii", errors="replace").replace("\r", "\\r").replace("\x00", "\\0"),
+            }
+            if direction == TX:
+                last_tx_ns = t_ns
+            elif last_tx_ns is not None:
+                frame["reply_ms"] = round((t_ns - last_tx_ns) / 1e6, 2)
+            frames.append(frame)
+        return frames
+
+    def clear(self):
+        with self._lock:
+            self.recorded = 0
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Fake CoolGear 4-port USB hub on a pseudo-terminal, for tests and benchmarks without hardware.
+
+Opens a pty pair and answers the hub's ASCII protocol on the master side;
+CoolGearUSBHub (pyserial) talks to the slave path like it would to
+/dev/ttyUSB0. Supported commands (CR terminated):
+  ?Q                   - device query, answers 'G<model>'
+  GP                   - port status, answers 'G<8 hex digits>', e.g. G02FFFFFF
+  SPpass    <8 hex>    - set the port mask, answers with the new status
+Bits 0-3 of the first status byte are ports 1-4 (01FFFFFF = only port 1 on,
+E0FFFFFF = all off). Replies are delayed by latency plus the wire time of
+request and response at baud (8N1, 10 bits per byte; baud=0 disables it).
+
+Line faults, each drawn per reply from a seeded random generator:
+  drop_rate   - probability that each reply byte (CR included) is lost
+  glitch_rate - probability that a NUL-only frame (three NULs and a CR) arrives
+                ahead of the reply, like the hub's null-byte responses
+
+Usage:
+    python usbhub_fake_coolgear.py [--latency 0.005] [--baud 9600] [--drop-rate 0.01] [--glitch-rate 0.05]
+    # then start the server with the printed USB_HUB_PORT=/dev/pts/N
+"""
+
+import argparse
+import os
+import random
+import select
+import threading
+import time
+import tty
+
+MODEL = "CoolGear USB4 FAKE"
+ALL_OFF = "E0FFFFFF"
+SET_PREFIX = "SPpass    "
+NUL_FRAME = b"\x00\x00\x00\r"
+
+
+class FakeCoolGearHub:
+    """pty-backed hub simulator; port is the slave device path to open with pyserial."""
+
+    def __init__(self, latency=0.0, baud=9600, status=ALL_OFF, drop_rate=0.0, glitch_rate=0.0, seed=None):
+        self.latency = latency
+        self.baud = baud
+        self.status = status
+        self.drop_rate = drop_rate
+        self.glitch_rate = glitch_rate
+        self.random = random.Random(seed)
+        self.commands = 0
+        self.dropped_bytes = 0
+        self.glitches = 0
+        self.lock = threading.Lock()
+        self._master = None
+        self._slave = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.port = None
+
+    def start(self):
+        """Open the pty, serve in a background daemon thread and return self."""
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="fake-coolgear", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self._master = self._slave = None
+
+    def active_port(self):
+        """1-4 if exactly one port is on, 0 if all are off, -1 otherwise."""
+        with self.lock:
+            mask = int(self.status[:2], 16) & 0x0F
+        if mask == 0:
+            return 0
+        ports = [port for port in range(1, 5) if mask & (1 << (port - 1))]
+        return ports[0] if len(ports) == 1 else -1
+
+    def handle(self, command):
+        """Response text (without the CR) for one command, or None if the hub stays silent."""
+        with self.lock:
+            self.commands += 1
+            if command == "?Q":
+                return f"G{MODEL}"
+            if command == "GP":
+                return f"G{self.status}"
+            if command.startswith(SET_PREFIX):
+                mask = command[len(SET_PREFIX):].upper()
+                if len(mask) == 8 and all(c in "0123456789ABCDEF" for c in mask):
+                    self.status = mask
+                    return f"G{self.status}"
+            return None
+
+    def _apply_faults(self, reply):
+        """The bytes actually put on the line for reply, after drops and glitches."""
+        if self.drop_rate:
+            kept = bytes(b for b in reply if self.random.random() >= self.drop_rate)
+            self.dropped_bytes += len(reply) - len(kept)
+            reply = kept
+        if self.glitch_rate and self.random.random() < self.glitch_rate:
+            self.glitches += 1
+            reply = NUL_FRAME + reply
+        return reply
+
+    def _wire_time(self, byte_count):
+        return byte_count * 10.0 / self.baud if self.baud else 0.0
+
+    def _run(self):
+        buffer = b""
+        while not self._stop.is_set():
+            readable, _, _ = select.select([self._master], [], [], 0.1)
+            if not readable:
+                continue
+            try:
+                data = os.read(self._master, 256)
+            except OSError:
+                return
+            buffer += data
+            while b"\r" in buffer:
+                raw, buffer = buffer.split(b"\r", 1)
+                command = raw.decode("ascii", errors="ignore").strip("\x00\n ")
+                response = self.handle(command)
+                if response is None:
+                    continue
+                reply = self._apply_faults(response.encode("ascii") + b"\r")
+                delay = self.latency + self._wire_time(len(raw) + 1 + len(reply))
+                if delay:
+                    time.sleep(delay)
+                try:
+                    os.write(self._master, reply)
+                except OSError:
+                    return
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake CoolGear USB hub on a pty")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated hub processing time in seconds")
+    parser.add_argument("--baud", type=int, default=9600, help="Simulated line speed for wire time (0 = none)")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Probability that a reply byte is lost")
+    parser.add_argument("--glitch-rate", type=float, default=0.0, help="Probability of a NUL frame before a reply")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for the line faults")
+    args = parser.parse_args()
+
+    hub = FakeCoolGearHub(args.latency, args.baud, drop_rate=args.drop_rate,
+                          glitch_rate=args.glitch_rate, seed=args.seed).start()
+    print(f"Fake CoolGear hub on {hub.port}")
+    print(f"Point the server at it with: USB_HUB_PORT={hub.port}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        hub.stop()
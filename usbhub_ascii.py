@@ -1,3 +1,4 @@
+import os
 import serial
 import time
 import sys
@@ -12,19 +13,26 @@ class CoolGearUSBHub:
 
     PROGRAM_VERSION = "20.1 (ASCII-ONLY - 9600 baud)"
     FIXED_BAUDRATE = 9600  
-    READ_TIMEOUT = 1.0   
+    READ_TIMEOUT = 0.15  # reply deadline; reads end at the CR terminator (~10 ms for a reply at 9600 baud)
     WRITE_TIMEOUT = 1.0
     COMMAND_DELAY = 0.1  
     HANDSHAKE_DELAY = 0.1
+    SWITCH_COOLDOWN = 2.0  # power sequencing: minimum time between port changes when selecting another port
     
     MAX_RESPONSE_LENGTH = 32  
 
-    def __init__(self, port):
+    def __init__(self, port, trace=None):
         self.port = port
+        self.trace = trace             # frame recorder with tx(bytes)/rx(bytes), e.g. usb_hub_trace.FrameTrace
         self.baudrate = self.FIXED_BAUDRATE
         self.timeout = self.READ_TIMEOUT
         self.ser = None
         self.last_active_port = None  # Track the last active port for proper switching delays
+        self.modem_lines = True        # False on ports without RTS/DTR control (ptys, some adapters)
+        self.last_serial_error = None  # Set by a SerialException during a command; see is_healthy()
+        self.last_sent_status = None   # Port mask of the last SPpass command that went out
+        self.last_response = ""        # Hub reply to that command ('G' + new status on most firmware)
+        self.last_switch_at = time.monotonic()  # last port change (unknown before opening: count from now)
 
         self.BASE_COMMAND = "SPpass    "
         self.TERMINATOR = "\r"
@@ -71,18 +79,14 @@ class CoolGearUSBHub:
             print("Debug: Applying Windows driver initialization sequence...")
             
             # Windows trace shows: CLR_RTS, CLR_DTR, SET_LINE_CONTROL, SET_CHARS, SET_HANDFLOW
-            self.ser.setRTS(False)  # CLR_RTS
-            time.sleep(0.001)
-            self.ser.setDTR(False)  # CLR_DTR  
-            time.sleep(0.001)
+            self._clear_modem_lines()  # CLR_RTS, CLR_DTR
             
             # Clear buffers like Windows driver does with PURGE operations
             self.ser.reset_input_buffer()   # Similar to PURGE input
             self.ser.reset_output_buffer()  # Similar to PURGE output
             
             # Another CLR_DTR like Windows does
-            self.ser.setDTR(False)
-            time.sleep(0.001)
+            self._clear_modem_lines()
             
             print(f"[OK] Successfully connected to {self.port} at {self.ser.baudrate} baud (8N1, No Flow).")
             
@@ -94,123 +98,127 @@ class CoolGearUSBHub:
             print(f"[ERROR] An unexpected critical error occurred during connection: {e}")
             self.ser = None
 
+    def _clear_modem_lines(self):
+        """Drop RTS and DTR (the hub expects both low). Skipped on ports without modem lines."""
+        if not self.modem_lines:
+            return
+        try:
+            self.ser.setRTS(False)
+            self.ser.setDTR(False)
+        except OSError as e:
+            # ptys (the hub simulator) and some USB-serial adapters have no RTS/DTR
+            print(f"[INFO] {self.port} has no RTS/DTR control ({e}); continuing without it")
+            self.modem_lines = False
+            return
+        time.sleep(0.001)  # Very short delay like Windows
+
+    @property
+    def echo(self):
+        """Per-command log lines only while frame tracing echoes (USB_HUB_TRACE=1)."""
+        return self.trace is not None and self.trace.echo
+
     def _apply_initial_handshake_state(self):
         if not self.ser or not self.ser.is_open: 
             return
 
         # Exact Windows sequence: CLR_RTS, CLR_DTR (already done in connect)
         # But do it again before each command like Windows does
-        self.ser.setRTS(False)
-        self.ser.setDTR(False)
-        time.sleep(0.001)  # Very short delay like Windows
+        self._clear_modem_lines()
+
+    def _read_frame(self):
+        """Read one reply frame: up to the CR terminator, MAX_RESPONSE_LENGTH bytes, or the deadline.
+
+        Blocks in read_until() (the port timeout is the deadline) instead of
+        sleeping and polling in_waiting, so it returns as soon as the hub's
+        CR arrives. Stray NULs and empty frames ahead of the reply are skipped.
+        """
+        terminator = self.TERMINATOR.encode('ascii')
+        deadline = time.monotonic() + self.READ_TIMEOUT
+        frame = self.ser.read_until(terminator, self.MAX_RESPONSE_LENGTH)
+        if not frame.endswith(terminator) or frame.strip(b'\x00' + terminator):
+            return frame  # complete reply, length limit or deadline (the common case: one read)
+        try:
+            while frame.endswith(terminator) and not frame.strip(b'\x00' + terminator):
+                # Only NULs / a bare CR so far: read on for the real reply within the same deadline
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or len(frame) >= self.MAX_RESPONSE_LENGTH:
+                    break
+                self.ser.timeout = remaining
+                frame += self.ser.read_until(terminator, self.MAX_RESPONSE_LENGTH - len(frame))
+        finally:
+            self.ser.timeout = self.READ_TIMEOUT
+        return frame
+
+    def _decode_frame(self, raw_response):
+        """Decoded reply text ('' for none), or NULL_RESPONSE if the hub sent only NUL bytes."""
+        body = raw_response.replace(self.TERMINATOR.encode('ascii'), b'')
+        if not body:
+            return ""
+        if body == b'\x00' * len(body):
+            if self.echo:
+                print(f"Debug: All {len(body)} bytes are null - protocol mismatch!")
+            # The hub is responding but with wrong data format
+            return "NULL_RESPONSE"  # Return indicator that we got a null response
+        return raw_response.replace(b'\x00', b'').decode('ascii', errors='ignore').strip()
 
     def _read_response(self):
-        """Helper to wait, and read the response. Enhanced with longer waits."""
-        # Wait longer for response - the null bytes suggest timing issues
-        time.sleep(0.2) 
-        
-        raw_response = b''
-        
+        """Read one reply frame and strip the 'G' command-response prefix."""
         try:
-            # Check for immediate data
-            bytes_waiting = self.ser.in_waiting
-            if bytes_waiting > 0:
-                print(f"Debug: {bytes_waiting} bytes waiting immediately")
-                raw_response = self.ser.read(bytes_waiting)
-            
-            # If no immediate data, wait and try multiple times
-            for attempt in range(3):
-                if not raw_response:
-                    time.sleep(0.1)
-                    bytes_waiting = self.ser.in_waiting
-                    if bytes_waiting > 0:
-                        print(f"Debug: Attempt {attempt+1}: {bytes_waiting} bytes waiting")
-                        raw_response = self.ser.read(bytes_waiting)
-                        break
-                
-        except serial.SerialTimeoutException:
-            pass
-        except Exception as e:
+            response = self._decode_frame(self._read_frame())
+        except serial.SerialException as e:
             print(f"[WARNING] Read error: {e}")
-        
-        if raw_response:
-            print(f"Debug: Raw response bytes: {raw_response.hex().upper()}")
-            
-            # Check if we got null bytes (suggests timing/protocol issue)
-            if raw_response == b'\x00' * len(raw_response):
-                print("Debug: Received all null bytes - possible timing or protocol issue")
-                return ""
-            
-            # Try to decode
-            response = raw_response.decode('ascii', errors='ignore').strip()
-            print(f"Debug: Decoded response: '{response}'")
-            
-            # Handle empty response after decoding
-            if not response or response.isspace():
-                print("Debug: Empty response after decoding")
-                return ""
-            
-            # Windows trace shows command responses start with 'G'
-            if response.startswith('G') and len(response) > 1:
-                actual_status = response[1:]
-                print(f"Debug: Parsed command response - Status: '{actual_status}'")
-                return actual_status
-            else:
-                print(f"Debug: Non-command response: '{response}'")
-                return response
-        else:
-            print("Debug: No response data received")
             return ""
+        if response == "NULL_RESPONSE":
+            return ""
+        # Windows trace shows command responses start with 'G'
+        if response.startswith('G') and len(response) > 1:
+            return response[1:]
+        return response
 
     def _execute_command(self, raw_command):
         if not self.ser or not self.ser.is_open:
             return ""
 
         try:
-            # Windows trace shows GET_COMMSTATUS before write
-            print(f"Debug: Input buffer has {self.ser.in_waiting} bytes before command")
-            
             # Clear buffers before sending (Windows does PURGE operations)
             self.ser.reset_input_buffer()
             self.ser.reset_output_buffer()
             
-            # Write the command
-            bytes_written = self.ser.write(raw_command.encode('ascii'))
-            print(f"Debug: Wrote {bytes_written} bytes: {raw_command.encode('ascii').hex().upper()}")
-            
-            # Force the data out immediately
+            # Write the command and force it out (flush returns once it is on the wire)
+            raw_bytes = raw_command.encode('ascii')
+            bytes_written = self.ser.write(raw_bytes)
             self.ser.flush()
+            if self.trace is not None:
+                self.trace.tx(raw_bytes[:bytes_written])
             
-            # Windows trace shows it waits for WAIT_ON_MASK events - we'll simulate with delays
-            time.sleep(0.03)  # Initial wait
-            
-            # Check for response multiple times like Windows does
-            response = ""
-            raw_response = b''
-            for attempt in range(5):  # Windows shows multiple WAIT_ON_MASK calls
-                time.sleep(0.016)  # ~16ms like Windows trace intervals
-                bytes_waiting = self.ser.in_waiting
-                if bytes_waiting > 0:
-                    print(f"Debug: Attempt {attempt+1}: {bytes_waiting} bytes available")
-                    raw_response = self.ser.read(bytes_waiting)
-                    if raw_response:
-                        print(f"Debug: Raw response: {raw_response.hex().upper()}")
-                        
-                        # Check if it's all null bytes (indicates timing/protocol issue)
-                        if raw_response == b'\x00' * len(raw_response):
-                            print(f"Debug: All {len(raw_response)} bytes are null - protocol mismatch!")
-                            # The hub is responding but with wrong data format
-                            return "NULL_RESPONSE"  # Return indicator that we got a null response
-                        
-                        response = raw_response.decode('ascii', errors='ignore').strip()
-                        break
+            # The reply is framed by its CR; no fixed wait for it
+            raw_response = self._read_frame()
+            if self.trace is not None:
+                self.trace.rx(raw_response)  # empty if the hub didn't answer before the deadline
+            response = self._decode_frame(raw_response)
             
+            self.last_serial_error = None
             return response
             
         except serial.SerialException as e:
             print(f"[ERROR] Error during command execution: {e}")
+            self.last_serial_error = e
             return ""
 
+    def is_healthy(self):
+        """Cheap check (no I/O): port open, device node still present, last command had no serial error."""
+        return (self.ser is not None and self.ser.is_open and self.last_serial_error is None
+                and os.path.exists(self.port))
+
+    def close(self):
+        """Close the serial port (the hub keeps its port state)."""
+        ser, self.ser = self.ser, None
+        if ser is not None:
+            try:
+                ser.close()
+            except Exception as e:
+                print(f"[WARNING] Error closing {self.port}: {e}")
+
     def _send_command(self, status_string):
         if not self.ser or not self.ser.is_open:
             print("[ERROR] Serial connection is not open. Cannot send command.")
@@ -220,18 +228,20 @@ class CoolGearUSBHub:
         
         self._apply_initial_handshake_state()
         
-        print(f"Debug: Sending command: '{full_command.strip()}'")
-        print(f"Debug: Command bytes: {full_command.encode('ascii').hex().upper()}")
-        
         response = self._execute_command(full_command)
+        if self.last_serial_error is not None:
+            print(f"[ERROR] Command not sent: {full_command.strip()}")
+            return False
+        self.last_sent_status = status_string
+        self.last_response = response
+        self.last_switch_at = time.monotonic()
         
         # Some USB hubs don't send responses but still execute commands
-        # Let's verify the command was sent successfully
-        if response:
-            print(f"[OK] Sent: {full_command.strip()} | Hub Response: {response}")
-        else:
-            print(f"[OK] Sent: {full_command.strip()} | No response (normal for some hubs)")
-            print("[INFO] Command should have been executed. Check if connected USB devices turned on/off.")
+        if self.echo:
+            if response:
+                print(f"[OK] Sent: {full_command.strip()} | Hub Response: {response}")
+            else:
+                print(f"[OK] Sent: {full_command.strip()} | No response (normal for some hubs)")
         return True
             
     def _initialize_hub(self):
@@ -307,11 +317,13 @@ class CoolGearUSBHub:
 
     # --- Public Control Methods ---
     def all_on(self):
-        print("[INFO] Command: All ports ON")
+        if self.echo:
+            print("[INFO] Command: All ports ON")
         return self._send_command("FFFFFFFF")
 
     def all_off(self):
-        print("[INFO] Command: All ports OFF")
+        if self.echo:
+            print("[INFO] Command: All ports OFF")
         # Based on individual port patterns: FE & FD & FB & F7 = E0
         result = self._send_command("E0FFFFFF")
         if result:
@@ -357,6 +369,7 @@ class CoolGearUSBHub:
             print("  Step 5: Testing each port after reset...")
             for port in [1, 2, 3, 4]:
                 print(f"    Testing port {port}...")
+                time.sleep(self.switch_cooldown_remaining(port))
                 result = self.set_single_port_on(port)
                 time.sleep(0.5)
                 if not result:
@@ -381,7 +394,8 @@ class CoolGearUSBHub:
             print("[ERROR] Port number must be between 1 and 4.")
             return False
         status_string = self.PORT_ON_CMDS.get(port_number, "FFFFFFFF")
-        print(f"[INFO] Command: Port {port_number} ON")
+        if self.echo:
+            print(f"[INFO] Command: Port {port_number} ON")
         return self._send_command(status_string)
 
     def port_off(self, port_number):
@@ -389,28 +403,26 @@ class CoolGearUSBHub:
             print("[ERROR] Port number must be between 1 and 4.")
             return False
         status_string = self.PORT_OFF_CMDS.get(port_number, "EEEEEEEE")
-        print(f"[INFO] Command: Port {port_number} OFF")
+        if self.echo:
+            print(f"[INFO] Command: Port {port_number} OFF")
         return self._send_command(status_string)
     
     def set_single_port_on(self, port_number):
         """
         Turn on only the specified port, ensuring all other ports are off.
         This is an atomic operation that avoids brief multi-port states.
-        Includes 2-second delay when switching between different ports.
+        Sends at once: when switching from a different port the caller waits
+        out switch_cooldown_remaining() first (the server's hub session holds
+        the command until the 2-second power-sequencing cooldown has passed).
         """
         if not 1 <= port_number <= 4:
             print("[ERROR] Port number must be between 1 and 4.")
             return False
         
-        # Check if we need a delay (switching from different port)
-        if hasattr(self, 'last_active_port') and self.last_active_port != port_number and self.last_active_port != 0:
-            print(f"[INFO] Switching from port {self.last_active_port} to port {port_number}")
-            print("[INFO] Applying 2-second delay for proper power sequencing...")
-            time.sleep(2.0)  # 2-second delay between different port selections
-        
         # Use the individual PORT_ON_CMDS which already ensures only one port is on
         status_string = self.PORT_ON_CMDS.get(port_number, "FFFFFFFF")
-        print(f"[INFO] Command: Set ONLY Port {port_number} ON (all others OFF)")
+        if self.echo:
+            print(f"[INFO] Command: Set ONLY Port {port_number} ON (all others OFF)")
         result = self._send_command(status_string)
         
         # Track the last active port
@@ -419,6 +431,12 @@ class CoolGearUSBHub:
         
         return result
     
+    def switch_cooldown_remaining(self, port_number):
+        """Seconds set_single_port_on(port_number) would wait now (0.0 if it can switch at once)."""
+        if self.last_active_port in (port_number, 0):
+            return 0.0
+        return max(0.0, self.SWITCH_COOLDOWN - (time.monotonic() - self.last_switch_at))
+
     def get_current_active_port(self):
         """
         Get the currently active USB hub port by querying hub status.
@@ -433,10 +451,13 @@ class CoolGearUSBHub:
                 print("[WARNING] No response from hub status query")
                 return -1
             
-            # Parse the response (should be like "01FFFFFF", "02FFFFFF", etc.)
+            # Parse the response (should be like "G01FFFFFF" or "01FFFFFF")
+            if response.startswith('G') and len(response) >= 9:
+                response = response[1:]
             if len(response) >= 8:
                 status_hex = response[:8].upper()
-                print(f"[DEBUG] Hub status response: {status_hex}")
+                if self.echo:
+                    print(f"[DEBUG] Hub status response: {status_hex}")
                 
                 # Map status responses to port numbers
                 status_to_port = {
@@ -450,7 +471,8 @@ class CoolGearUSBHub:
                 
                 active_port = status_to_port.get(status_hex, -1)
                 if active_port >= 0:
-                    print(f"[INFO] Current active port: {active_port if active_port > 0 else 'None (all off)'}")
+                    if self.echo:
+                        print(f"[INFO] Current active port: {active_port if active_port > 0 else 'None (all off)'}")
                     # Update tracking
                     self.last_active_port = active_port
                     return active_port